@@ -35,6 +35,7 @@ class YoloTRT():
         self.LEN_ALL_RESULT = 38001
         self.LEN_ONE_RESULT = 38
         self.yolo_version = yolo_ver
+        self.last_tile_count = 0
 
         #Categories will be obtained from human-readable label text files
         classes = []
@@ -101,7 +102,84 @@ class YoloTRT():
 
     def Inference(self, img):
         input_image, image_raw, origin_h, origin_w = self.PreProcessImg(img)
-        np.copyto(host_inputs[0], input_image.ravel())
+        output, t = self.Execute([input_image])
+
+        #Only the first slot of the batch holds this image
+        result_boxes, result_scores, result_classid = self.PostProcess(output[0: self.LEN_ALL_RESULT], origin_h, origin_w)
+
+        return self.BuildDetections(img, result_boxes, result_scores, result_classid), t
+
+    def InferenceTiled(self, img, tile_size=640, overlap=0.2, roi=None):
+        """
+        Tiled (slicing) inference for small, distant objects. The full-resolution frame (or only the `roi` of it) is cut
+        into overlapping tiles which are run through the engine in batches of `batch_size`. Boxes are shifted back to
+        frame coordinates and merged with class-aware NMS.
+
+        :param img: Full-resolution BGR frame. Boxes are drawn on it like in `Inference`
+        :param tile_size: Width and height of each square tile in pixels
+        :param overlap: Fraction of a tile shared with its neighbour (0 <= overlap < 1)
+        :param roi: Optional region [x1, y1, x2, y2] to tile instead of the full frame (e.g. the motion ROI)
+        :return: Tuple of (detections, engine time in seconds summed over all batches)
+        """
+        tiles = self.MakeTiles(img.shape[0], img.shape[1], tile_size, overlap, roi)
+        self.last_tile_count = len(tiles)
+
+        engine_time = 0.0
+        frame_boxes = []
+        for start in range(0, len(tiles), self.batch_size):
+            chunk = tiles[start:start + self.batch_size]
+            preprocessed = [self.PreProcessImg(img[y1:y2, x1:x2]) for x1, y1, x2, y2 in chunk]
+            output, t = self.Execute([item[0] for item in preprocessed])
+            engine_time += t
+
+            for i, ((x1, y1, _, _), (_, _, tile_h, tile_w)) in enumerate(zip(chunk, preprocessed)):
+                boxes = self.DecodeOutput(output[i * self.LEN_ALL_RESULT: (i + 1) * self.LEN_ALL_RESULT], tile_h, tile_w)
+                if len(boxes):
+                    #Shift the boxes from tile coordinates back to frame coordinates
+                    boxes[:, [0, 2]] += x1
+                    boxes[:, [1, 3]] += y1
+                    frame_boxes.append(boxes)
+
+        merged = self.MergeBoxes(np.concatenate(frame_boxes, 0)) if frame_boxes else np.array([])
+        result_boxes   = merged[:, :4] if len(merged) else np.array([])
+        result_scores  = merged[:, 4] if len(merged) else np.array([])
+        result_classid = merged[:, 5] if len(merged) else np.array([])
+        return self.BuildDetections(img, result_boxes, result_scores, result_classid), engine_time
+
+    def MakeTiles(self, frame_h, frame_w, tile_size, overlap, roi=None):
+        """
+        Split a frame (or a region of it) into overlapping square tiles. Tiles are spread evenly so neighbours overlap
+        by at least `overlap` and the last row and column are aligned to the region edge.
+
+        :return: List of tiles as [x1, y1, x2, y2] in frame coordinates
+        """
+        rx1, ry1, rx2, ry2 = roi if roi is not None else (0, 0, frame_w, frame_h)
+        rx1, ry1 = max(0, int(rx1)), max(0, int(ry1))
+        rx2, ry2 = min(frame_w, int(rx2)), min(frame_h, int(ry2))
+        stride = max(1, int(tile_size * (1.0 - overlap)))
+
+        def starts(low, high):
+            span = high - low - tile_size
+            if span <= 0:
+                return [low]
+            count = -(-span // stride) + 1
+            return [low + round(i * span / (count - 1)) for i in range(count)]
+
+        tiles = []
+        for y in starts(ry1, ry2):
+            for x in starts(rx1, rx2):
+                tiles.append([x, y, min(x + tile_size, rx2), min(y + tile_size, ry2)])
+        return tiles
+
+    def Execute(self, input_images):
+        """
+        Run up to `batch_size` preprocessed images through the engine.
+
+        :param input_images: List of images returned by `PreProcessImg`
+        :return: Tuple of (raw host output buffer, engine time in seconds)
+        """
+        batch = np.concatenate(input_images, 0).ravel()
+        np.copyto(host_inputs[0][:batch.size], batch)
         stream = cuda.Stream()
         self.context = self.engine.create_execution_context()
         cuda.memcpy_htod_async(cuda_inputs[0], host_inputs[0], stream)
@@ -110,11 +188,9 @@ class YoloTRT():
         cuda.memcpy_dtoh_async(host_outputs[0], cuda_outputs[0], stream)
         stream.synchronize()
         t2 = time.time()
-        output = host_outputs[0]
-                
-        for i in range(self.batch_size):
-            result_boxes, result_scores, result_classid = self.PostProcess(output[i * self.LEN_ALL_RESULT: (i + 1) * self.LEN_ALL_RESULT], origin_h, origin_w)
-            
+        return host_outputs[0], t2-t1
+
+    def BuildDetections(self, img, result_boxes, result_scores, result_classid):
         det_res = []
         for j in range(len(result_boxes)):
             box = result_boxes[j]
@@ -124,22 +200,41 @@ class YoloTRT():
             det["box"] = box 
             det_res.append(det)
             self.PlotBbox(box, img, label="{}:{:.2f}".format(self.categories[int(result_classid[j])], result_scores[j]),)
-        return det_res, t2-t1
+        return det_res
 
     def PostProcess(self, output, origin_h, origin_w):
+        boxes = self.DecodeOutput(output, origin_h, origin_w)
+        result_boxes = boxes[:, :4] if len(boxes) else np.array([])
+        result_scores = boxes[:, 4] if len(boxes) else np.array([])
+        result_classid = boxes[:, 5] if len(boxes) else np.array([])
+        return result_boxes, result_scores, result_classid
+    
+    def DecodeOutput(self, output, origin_h, origin_w):
+        """Same as `PostProcess` but returns the kept boxes as one (N, 6) array of x1, y1, x2, y2, score, class."""
         num = int(output[0])
         if self.yolo_version == "v5":
             pred = np.reshape(output[1:], (-1, self.LEN_ONE_RESULT))[:num, :]
             pred = pred[:, :6]
         elif self.yolo_version == "v7":
             pred = np.reshape(output[1:], (-1, 6))[:num, :]
-        
-        boxes = self.NonMaxSuppression(pred, origin_h, origin_w, conf_thres=self.CONF_THRESH, nms_thres=self.IOU_THRESHOLD)
-        result_boxes = boxes[:, :4] if len(boxes) else np.array([])
-        result_scores = boxes[:, 4] if len(boxes) else np.array([])
-        result_classid = boxes[:, 5] if len(boxes) else np.array([])
-        return result_boxes, result_scores, result_classid
-    
+        return self.NonMaxSuppression(pred, origin_h, origin_w, conf_thres=self.CONF_THRESH, nms_thres=self.IOU_THRESHOLD)
+
+    def MergeBoxes(self, boxes, nms_thres=None):
+        """
+        Class-aware NMS over boxes already in frame coordinates (x1, y1, x2, y2, score, class).
+        Used to merge the duplicates found in the overlap of neighbouring tiles.
+        """
+        nms_thres = nms_thres if nms_thres is not None else self.IOU_THRESHOLD
+        boxes = boxes[np.argsort(-boxes[:, 4])]
+        keep_boxes = []
+        while boxes.shape[0]:
+            large_overlap = self.bbox_iou(np.expand_dims(boxes[0, :4], 0), boxes[:, :4]) > nms_thres
+            label_match = boxes[0, -1] == boxes[:, -1]
+            invalid = large_overlap & label_match
+            keep_boxes += [boxes[0]]
+            boxes = boxes[~invalid]
+        return np.stack(keep_boxes, 0) if len(keep_boxes) else np.array([])
+
     def NonMaxSuppression(self, prediction, origin_h, origin_w, conf_thres=0.5, nms_thres=0.4):
         boxes = prediction[prediction[:, 4] >= conf_thres]
         boxes[:, :4] = self.xywh2xyxy(origin_h, origin_w, boxes[:, :4])
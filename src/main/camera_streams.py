@@ -0,0 +1,265 @@
+#This module lets several cameras share a single detector.
+#Every camera gets its own capture thread that keeps only the latest frame, and the FrameScheduler decides which
+#camera's frame is fed to the detector next.
+import time
+import threading
+from collections import deque
+
+import cv2
+
+from frame_source import create_frame_source
+from perf_stats import percentile
+
+class MotionRoi:
+    """
+    Cheap frame-differencing motion detector used to limit tiled inference to the part of the frame that changed.
+
+    :param scale: Downscale factor applied before differencing
+    :param threshold: Minimum grey-level change for a pixel to count as motion
+    :param padding: Pixels added around the motion bounding box (in full-resolution coordinates)
+    """
+    def __init__(self, scale=8, threshold=25, padding=32):
+        self.scale = scale
+        self.threshold = threshold
+        self.padding = padding
+        self.previous = None
+
+    def update(self, frame):
+        """
+        Compare the frame with the previous one.
+
+        :return: Motion region [x1, y1, x2, y2] in frame pixels, or None when there is no previous frame or no motion
+        """
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (max(1, w // self.scale), max(1, h // self.scale)))
+        small = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        previous, self.previous = self.previous, small
+        if previous is None or previous.shape != small.shape:
+            return None
+
+        _, mask = cv2.threshold(cv2.absdiff(small, previous), self.threshold, 255, cv2.THRESH_BINARY)
+        points = cv2.findNonZero(mask)
+        if points is None:
+            return None
+
+        x, y, bw, bh = cv2.boundingRect(points)
+        return [
+            max(0, x * self.scale - self.padding),
+            max(0, y * self.scale - self.padding),
+            min(w, (x + bw) * self.scale + self.padding),
+            min(h, (y + bh) * self.scale + self.padding)
+        ]
+
+class CameraStream:
+    """
+    Capture thread with a single latest-frame slot for one camera.
+
+    :param name: Name of the camera, used in reports
+    :param source_config: Frame source dictionary (read json_config.py to see format)
+    :param condition: Condition shared with the scheduler, notified on every new frame
+    :param side: Side of the gate the camera is watching (e.g. "approach" or "exit"), matched against the rules
+    :param roi: Optional region of interest [x1, y1, x2, y2] in frame pixels, cropped before detection
+    :param tiling: Optional tiled inference configuration for this camera (read json_config.py to see format)
+    """
+    def __init__(self, name : str, source_config : dict, condition : threading.Condition, side=None, roi=None, tiling=None):
+        self.name = name
+        self.side = side
+        self.roi  = roi
+        self.tiling = tiling if tiling and tiling.get('enabled', True) else None
+        self.motion = MotionRoi() if self.tiling and self.tiling.get('motion_roi', True) else None
+        self.source = create_frame_source(source_config)
+        self.condition = condition
+
+        #Latest-frame slot. Sequence numbers tell the scheduler whether the slot holds a frame it has not seen yet
+        self.frame = None
+        self.frame_seq = 0
+        self.frame_time = None
+        self.consumed_seq = 0
+
+        #Statistics
+        self.captured = 0
+        self.inferred = 0
+        self.dropped  = 0
+        self.frame_ages = deque(maxlen=1000)
+        self.tiled_frames = 0
+        self.tiles_total  = 0
+        self.tiled_time   = 0.0
+        self.start_time = time.monotonic()
+
+        self.running  = False
+        self.finished = False
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=2)
+        self.source.release()
+
+    def _capture_loop(self):
+        while self.running:
+            ret_val, frame = self.source.read()
+            if not ret_val:
+                break
+            with self.condition:
+                self.frame = frame
+                self.frame_seq += 1
+                self.frame_time = time.monotonic()
+                self.captured += 1
+                self.condition.notify_all()
+
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def has_new_frame(self) -> bool:
+        """Must be called while holding the shared condition."""
+        return self.frame_seq > self.consumed_seq
+
+    def take(self):
+        """
+        Take the latest frame out of the slot. Must be called while holding the shared condition.
+
+        :return: The latest frame, cropped to the ROI, or None if no new frame is available
+        """
+        if not self.has_new_frame():
+            return None
+        self.dropped += self.frame_seq - self.consumed_seq - 1
+        self.consumed_seq = self.frame_seq
+        self.inferred += 1
+        self.frame_ages.append(time.monotonic() - self.frame_time)
+        return self.apply_roi(self.frame)
+
+    def apply_roi(self, frame):
+        if self.roi is None:
+            return frame
+        x1, y1, x2, y2 = self.roi
+        return frame[y1:y2, x1:x2]
+
+    def motion_roi(self, frame):
+        """Motion region of the frame used to limit tiled inference, or None to tile the full frame."""
+        return self.motion.update(frame) if self.motion else None
+
+    def record_tiles(self, tile_count : int, seconds : float):
+        """Record the cost of one tiled inference."""
+        self.tiled_frames += 1
+        self.tiles_total  += tile_count
+        self.tiled_time   += seconds
+
+    def report(self) -> dict:
+        elapsed = max(time.monotonic() - self.start_time, 1e-9)
+        ages = list(self.frame_ages)
+        tiling = {}
+        if self.tiled_frames:
+            tiling = {
+                "tiles_per_frame": self.tiles_total / self.tiled_frames,
+                "tiled_inference_ms": (self.tiled_time / self.tiled_frames) * 1000.0,
+                "ms_per_tile": (self.tiled_time / self.tiles_total) * 1000.0 if self.tiles_total else 0.0
+            }
+        return {
+            "side": self.side,
+            "capture_fps": self.captured / elapsed,
+            "inference_fps": self.inferred / elapsed,
+            "frames_captured": self.captured,
+            "frames_inferred": self.inferred,
+            "frames_dropped": self.dropped,
+            "frame_age_p50_ms": percentile(ages, 50) * 1000.0,
+            "frame_age_p95_ms": percentile(ages, 95) * 1000.0,
+            "finished": self.finished,
+            "tiling": tiling
+        }
+
+class FrameScheduler:
+    """
+    Feeds frames from several CameraStreams to a single detector.
+
+    Modes:
+        'round_robin': one frame per call, rotating across cameras that have a new frame
+        'batched':     one frame from every camera that has a new frame, in a single call
+
+    :param sources_config: List of source dictionaries, each with an optional 'name', 'side' and 'roi'
+    :param mode: Scheduling mode, 'round_robin' (default) or 'batched'
+    """
+    def __init__(self, sources_config : list, mode : str = 'round_robin'):
+        if mode not in ('round_robin', 'batched'):
+            raise ValueError(f"Unknown scheduler mode: {mode}")
+
+        self.mode = mode
+        self.condition = threading.Condition()
+        self.streams = [
+            CameraStream(
+                source.get('name', f"camera{index}"),
+                source,
+                self.condition,
+                side=source.get('side'),
+                roi=source.get('roi'),
+                tiling=source.get('tiling')
+            )
+            for index, source in enumerate(sources_config)
+        ]
+        self.next_index = 0
+
+    def start(self):
+        for stream in self.streams:
+            stream.start()
+
+    def stop(self):
+        for stream in self.streams:
+            stream.stop()
+
+    def all_finished(self) -> bool:
+        with self.condition:
+            return all(stream.finished and not stream.has_new_frame() for stream in self.streams)
+
+    def next_frames(self, timeout : float = 1.0) -> list:
+        """
+        Wait for at least one camera to have a new frame and take frames according to the scheduling mode.
+
+        :param timeout: Maximum time to wait for a new frame in seconds
+        :return: List of (CameraStream, frame) tuples, empty on timeout or when every source is exhausted
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                ready = [stream for stream in self.streams if stream.has_new_frame()]
+                if ready:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or all(stream.finished for stream in self.streams):
+                    return []
+                self.condition.wait(remaining)
+
+            if self.mode == 'round_robin':
+                count = len(self.streams)
+                for offset in range(count):
+                    index = (self.next_index + offset) % count
+                    if self.streams[index] in ready:
+                        ready = [self.streams[index]]
+                        self.next_index = (index + 1) % count
+                        break
+
+            return [(stream, stream.take()) for stream in ready]
+
+    def fairness(self) -> float:
+        """
+        Jain's fairness index over the number of frames each camera got through the detector.
+        1.0 means every camera was served equally, 1/N means a single camera got everything.
+        """
+        served = [stream.inferred for stream in self.streams]
+        total = sum(served)
+        squares = sum(value * value for value in served)
+        if not squares:
+            return 1.0
+        return (total * total) / (len(served) * squares)
+
+    def report(self) -> dict:
+        """Per-camera FPS and the fairness of the scheduler."""
+        with self.condition:
+            return {
+                "mode": self.mode,
+                "fairness": self.fairness(),
+                "cameras": {stream.name: stream.report() for stream in self.streams}
+            }
@@ -0,0 +1,139 @@
+#This module reduces the number of detection messages sent over MQTT.
+#Detections of every DETECT cycle are buffered over a window and published as one summary with per-class counts,
+#confidences and first/last seen times. A class that was not seen recently, or a gate action, closes the window early
+#so the web-app still hears about new animals and door movements straight away.
+import time
+import threading
+from collections import defaultdict
+
+class DetectionAggregator:
+    """
+    Buffers detections over a time window and builds one summary message per window.
+
+    :param config: Dictionary that contains the 'aggregation' configuration
+    """
+    def __init__(self, config : dict):
+        self.window  = config.get('window', 10.0)
+        self.enabled = config.get('enabled', True)
+        self.lock = threading.Lock()
+
+        self.classes = {}          #{class: {"count", "conf_sum", "max_conf", "first_seen", "last_seen"}} of the open window
+        self.window_start = None
+        self.frames = 0
+        self.best_capture = (None, -1.0)  #(capture_id, confidence) of the most confident detection in the window
+        self.last_seen = {}        #{class: time} across windows, used to tell new classes apart
+
+        #Statistics
+        self.detections_in = 0
+        self.summaries_out = 0
+        self.flush_reasons = defaultdict(int)
+
+    def add(self, detections : list, capture_id=None, now=None):
+        """
+        Add the detections of one DETECT cycle.
+
+        :param detections: Detections returned by `YoloTRT.Inference` (dictionaries with 'class' and 'conf')
+        :param capture_id: Capture ID of the frame the detections come from
+        :return: A summary to publish now (new class or aggregation disabled), otherwise None
+        """
+        now = now if now is not None else time.time()
+        with self.lock:
+            #Every cycle used to be one message, empty or not
+            self.detections_in += 1
+            if not detections:
+                return None
+
+            new_class = False
+            if self.window_start is None:
+                self.window_start = now
+            self.frames += 1
+            for det in detections:
+                name = det['class']
+                conf = float(det.get('conf', 0.0))
+                if name not in self.last_seen or now - self.last_seen[name] > self.window:
+                    new_class = True
+                self.last_seen[name] = now
+
+                entry = self.classes.setdefault(name, {"count": 0, "conf_sum": 0.0, "max_conf": 0.0, "first_seen": now, "last_seen": now})
+                entry["count"] += 1
+                entry["conf_sum"] += conf
+                entry["max_conf"] = max(entry["max_conf"], conf)
+                entry["last_seen"] = now
+                if conf > self.best_capture[1]:
+                    self.best_capture = (capture_id, conf)
+
+            if not self.enabled:
+                return self._flush("disabled", now)
+            if new_class:
+                return self._flush("new_class", now)
+            return None
+
+    def poll(self, now=None):
+        """
+        Close the window once it has run for `window` seconds. Called on every main loop iteration.
+
+        :return: A summary to publish, or None
+        """
+        now = now if now is not None else time.time()
+        with self.lock:
+            if self.window_start is None or now - self.window_start < self.window:
+                return None
+            return self._flush("window", now)
+
+    def flush(self, reason="gate_action", now=None):
+        """
+        Close the window straight away (e.g. before the door moves).
+
+        :return: A summary to publish, or None if nothing was buffered
+        """
+        now = now if now is not None else time.time()
+        with self.lock:
+            return self._flush(reason, now)
+
+    def _flush(self, reason : str, now : float):
+        if self.window_start is None:
+            return None
+
+        #Most seen classes first. 'objects' and 'confidence' keep the layout of single detection messages
+        names = sorted(self.classes, key=lambda name: self.classes[name]["count"], reverse=True)
+        summary = {
+            "objects": names,
+            "confidence": [self.classes[name]["max_conf"] for name in names],
+            "timestamp": now,
+            "capture_id": self.best_capture[0],
+            "first_seen": min(entry["first_seen"] for entry in self.classes.values()),
+            "last_seen": max(entry["last_seen"] for entry in self.classes.values()),
+            "frames": self.frames,
+            "reason": reason,
+            "classes": {
+                name: {
+                    "count": entry["count"],
+                    "max_conf": entry["max_conf"],
+                    "mean_conf": entry["conf_sum"] / entry["count"],
+                    "first_seen": entry["first_seen"],
+                    "last_seen": entry["last_seen"]
+                }
+                for name, entry in self.classes.items()
+            }
+        }
+
+        self.classes = {}
+        self.window_start = None
+        self.frames = 0
+        self.best_capture = (None, -1.0)
+        self.summaries_out += 1
+        self.flush_reasons[reason] += 1
+        return summary
+
+    def report(self) -> dict:
+        """Number of detection cycles in and summaries out, and the resulting message reduction ratio."""
+        with self.lock:
+            return {
+                "window_s": self.window,
+                "enabled": self.enabled,
+                "detections_in": self.detections_in,
+                "summaries_out": self.summaries_out,
+                "reduction_ratio": self.detections_in / self.summaries_out if self.summaries_out else 0.0,
+                "flush_reasons": dict(self.flush_reasons),
+                "buffered_frames": self.frames
+            }
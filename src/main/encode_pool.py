@@ -0,0 +1,131 @@
+#This module moves JPEG encoding of detection frames off the state-machine thread.
+#Frames are handed to a small pool of worker threads which produce a full-quality JPEG and a thumbnail, both base64
+#encoded, and deliver them through a Future. When the pool falls behind, the oldest pending jobs are dropped.
+import time
+import base64
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import cv2
+
+class EncodePool:
+    """
+    Worker pool that encodes frames to JPEG and thumbnail without blocking the caller.
+
+    :param workers: Number of encoding threads
+    :param max_pending: Maximum number of jobs waiting for a worker. Older jobs are dropped beyond this
+    :param jpeg_quality: JPEG quality of the full-size image
+    :param thumbnail_width: Width of the thumbnail in pixels (height keeps the aspect ratio)
+    :param thumbnail_quality: JPEG quality of the thumbnail
+    """
+    def __init__(self, workers=1, max_pending=2, jpeg_quality=90, thumbnail_width=160, thumbnail_quality=70):
+        self.max_pending = max_pending
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_quality = thumbnail_quality
+
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.running = True
+
+        #Statistics
+        self.submitted = 0
+        self.completed = 0
+        self.dropped   = 0
+        self.failed    = 0
+        self.encode_time = 0.0
+
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, frame, callback=None) -> Future:
+        """
+        Queue a frame for encoding. Never blocks.
+
+        The frame is used by reference, so the caller must not modify it afterwards.
+
+        :param frame: BGR image to encode
+        :param callback: Optional function called with the finished Future (also called when the job is dropped)
+        :return: Future resolving to a dictionary with 'image_base64', 'thumbnail_base64' and 'encode_ms'
+        """
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+
+        stale = []
+        with self.condition:
+            self.submitted += 1
+            self.pending.append((frame, future))
+            #Drop the oldest jobs rather than letting alerts fall further behind the live frames
+            while len(self.pending) > self.max_pending:
+                stale.append(self.pending.popleft()[1])
+                self.dropped += 1
+            self.condition.notify()
+
+        #Cancel outside the lock, cancelling runs the done callbacks
+        for stale_future in stale:
+            stale_future.cancel()
+        return future
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running and not self.pending:
+                    return
+                frame, future = self.pending.popleft()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                result = self._encode(frame)
+            except Exception as e:
+                with self.condition:
+                    self.failed += 1
+                future.set_exception(e)
+                continue
+
+            with self.condition:
+                self.completed += 1
+                self.encode_time += result['encode_ms'] / 1000.0
+            future.set_result(result)
+
+    def _encode(self, frame) -> dict:
+        t0 = time.perf_counter()
+        _, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+
+        h, w = frame.shape[:2]
+        thumb_h = max(1, int(h * self.thumbnail_width / w))
+        thumbnail = cv2.resize(frame, (self.thumbnail_width, thumb_h), interpolation=cv2.INTER_AREA)
+        _, thumb_jpeg = cv2.imencode('.jpg', thumbnail, [int(cv2.IMWRITE_JPEG_QUALITY), self.thumbnail_quality])
+
+        return {
+            "image_base64": base64.b64encode(jpeg).decode('utf-8'),
+            "thumbnail_base64": base64.b64encode(thumb_jpeg).decode('utf-8'),
+            "encode_ms": (time.perf_counter() - t0) * 1000.0
+        }
+
+    def stats(self) -> dict:
+        """Counters of the pool, including the number of stale jobs dropped."""
+        with self.condition:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": len(self.pending),
+                "mean_encode_ms": (self.encode_time / self.completed) * 1000.0 if self.completed else 0.0
+            }
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the pending jobs are finished."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join(timeout=2)
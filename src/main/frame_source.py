@@ -0,0 +1,186 @@
+#This module abstracts where the frames of the SmartGate come from.
+#The CSI camera is used by default, but recorded footage (video files, image directories or RTSP-like streams) can be
+#used in its place to measure model and pipeline performance offline.
+import os
+import time
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def gstreamer_pipeline(
+    sensor_id=0,
+    capture_width=1280,
+    capture_height=720,
+    display_width=1280,
+    display_height=720,
+    framerate=5,
+    flip_method=0
+):
+    return (
+        f"nvarguscamerasrc sensor-id={sensor_id} ! "
+        f"video/x-raw(memory:NVMM), "
+        f"width=(int){capture_width}, height=(int){capture_height}, "
+        f"format=(string)NV12, framerate=(fraction){framerate}/1 ! "
+        f"nvvidconv flip-method={flip_method} ! "
+        f"video/x-raw, width=(int){display_width}, height=(int){display_height}, format=(string)BGRx ! "
+        f"videoconvert ! "
+        f"video/x-raw, format=(string)BGR ! appsink"
+    )
+
+class FrameSource:
+    """
+    Base class for every frame source. Mirrors the `cv2.VideoCapture` API used by the main loop.
+    """
+    def read(self):
+        """
+        Read the next frame.
+
+        :return: Tuple of (ret_val, frame). `ret_val` is False once the source is exhausted or failed
+        """
+        raise NotImplementedError
+
+    def release(self):
+        """Release any resources held by the source."""
+        pass
+
+class CameraSource(FrameSource):
+    """
+    CSI camera on the Jetson Nano, opened through the GStreamer pipeline.
+
+    :param sensor_id: CSI port of the camera (0 or 1 on the Jetson Nano B01)
+    :param framerate: Camera framerate passed to `nvarguscamerasrc`
+    :param flip_method: Flip method passed to `nvvidconv`
+    """
+    def __init__(self, sensor_id=0, framerate=5, flip_method=0):
+        self.cap = cv2.VideoCapture(gstreamer_pipeline(sensor_id=sensor_id, framerate=framerate, flip_method=flip_method), cv2.CAP_GSTREAMER)
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+class VideoFileSource(FrameSource):
+    """
+    Video file or RTSP-like URL, read with OpenCV's default backend.
+
+    :param path: Path to the video file (or stream URL)
+    :param loop: Restart from the first frame once the end of the file is reached
+    :param realtime: Pace reads to the file's native framerate instead of reading as fast as possible
+    """
+    def __init__(self, path, loop=False, realtime=False):
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source: {path}")
+
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if fps and fps > 0 else 0.0
+        self.last_read = None
+
+    def read(self):
+        ret_val, frame = self.cap.read()
+        if not ret_val and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret_val, frame = self.cap.read()
+
+        if ret_val and self.realtime and self.frame_interval:
+            now = time.monotonic()
+            if self.last_read is not None:
+                wait = self.frame_interval - (now - self.last_read)
+                if wait > 0:
+                    time.sleep(wait)
+            self.last_read = time.monotonic()
+
+        return ret_val, frame
+
+    def release(self):
+        self.cap.release()
+
+class ImageDirectorySource(FrameSource):
+    """
+    Directory of still images (e.g. trail-camera captures), read in filename order.
+
+    :param path: Directory containing the images
+    :param loop: Restart from the first image once every image has been read
+    :param realtime: Pace reads to `framerate` instead of reading as fast as possible
+    :param framerate: Framerate used when `realtime` is set
+    """
+    def __init__(self, path, loop=False, realtime=False, framerate=5):
+        self.files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.files:
+            raise IOError(f"No images found in directory: {path}")
+
+        self.loop = loop
+        self.realtime = realtime
+        self.frame_interval = 1.0 / framerate if framerate else 0.0
+        self.index = 0
+        self.last_read = None
+
+    def read(self):
+        while True:
+            if self.index >= len(self.files):
+                if not self.loop:
+                    return False, None
+                self.index = 0
+
+            frame = cv2.imread(self.files[self.index])
+            self.index += 1
+            #Skip unreadable files rather than ending the run
+            if frame is not None:
+                break
+
+        if self.realtime and self.frame_interval:
+            now = time.monotonic()
+            if self.last_read is not None:
+                wait = self.frame_interval - (now - self.last_read)
+                if wait > 0:
+                    time.sleep(wait)
+            self.last_read = time.monotonic()
+
+        return True, frame
+
+def create_frame_source(source_config: dict, realtime=None) -> FrameSource:
+    """
+    Create the frame source described by the 'source' configuration.
+
+    :param source_config: Source dictionary (read json_config.py to see format)
+    :param realtime: Override the 'realtime' setting of file sources (the benchmark forces False)
+    :return: A `FrameSource` instance
+    """
+    source_type = source_config.get('type', 'csi')
+    framerate   = source_config.get('framerate', 5)
+    loop        = source_config.get('loop', False)
+    if realtime is None:
+        realtime = source_config.get('realtime', True)
+
+    if source_type == 'csi':
+        return CameraSource(
+            sensor_id=source_config.get('sensor_id', 0),
+            framerate=framerate,
+            flip_method=source_config.get('flip_method', 0)
+        )
+    elif source_type in ('file', 'rtsp'):
+        return VideoFileSource(source_config['path'], loop=loop, realtime=realtime)
+    elif source_type == 'directory':
+        return ImageDirectorySource(source_config['path'], loop=loop, realtime=realtime, framerate=framerate)
+
+    raise ValueError(f"Unknown frame source type: {source_type}")
+
+def source_config_from_path(path: str) -> dict:
+    """
+    Build a 'source' configuration from a path given on the command line.
+
+    :param path: Video file, image directory or stream URL
+    :return: Source dictionary usable by `create_frame_source`
+    """
+    if os.path.isdir(path):
+        return {"type": "directory", "path": path}
+    if "://" in path:
+        return {"type": "rtsp", "path": path}
+    return {"type": "file", "path": path}
@@ -6,6 +6,7 @@ import io as python_io
 from PIL import Image
 import threading
 from queue import Queue
+from collections import OrderedDict
 import json
 import psutil
 import time
@@ -20,9 +21,23 @@ latest_frame = None
 door_controller = None
 gate_status  = None
 
+#Global variable to store the camera scheduler reference (multi-camera gates)
+camera_scheduler = None
+
+#Global variable to store the inference rate scheduler reference
+rate_scheduler = None
+
+#Global variable to store the detection aggregator reference
+detection_aggregator = None
+
 # Global queue to communicate between HTTP server and main thread
 command_queue = Queue()
 
+# Recently queued command IDs, used to drop duplicate remote commands (e.g. MQTT redeliveries)
+recent_command_ids = OrderedDict()
+recent_command_lock = threading.Lock()
+MAX_RECENT_COMMAND_IDS = 1000
+
 #This class is to create a multi-threaded server that can handle multiple client requests concurrently
 class ThreadedHTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     allow_reuse_address = True
@@ -67,6 +82,45 @@ class HTTPHandler(http.server.BaseHTTPRequestHandler):
             status = get_jetson_status()
             self.wfile.write(json.dumps(status).encode('utf-8'))
 
+        #--- Per-camera FPS and scheduler fairness request. ---
+        elif self.path == '/cameras':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            report = camera_scheduler.report() if camera_scheduler else {}
+            self.wfile.write(json.dumps(report).encode('utf-8'))
+
+        #--- Inference rate and fan decisions request. ---
+        elif self.path == '/inference-rate':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            report = rate_scheduler.report() if rate_scheduler else {}
+            self.wfile.write(json.dumps(report).encode('utf-8'))
+
+        #--- Detection aggregation and message reduction request. ---
+        elif self.path == '/detection-aggregation':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            report = detection_aggregator.report() if detection_aggregator else {}
+            self.wfile.write(json.dumps(report).encode('utf-8'))
+
+        #--- Outbound MQTT queue counters request. ---
+        elif self.path == '/mqtt-stats':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            try:
+                from mqtt_jetson_client import mqtt_client
+                if mqtt_client is None:
+                    raise RuntimeError("MQTT client not started")
+                stats = mqtt_client.get_publish_stats()
+                stats["connection"] = mqtt_client.get_connection_stats()
+            except Exception as e:
+                stats = {"error": str(e)}
+            self.wfile.write(json.dumps(stats).encode('utf-8'))
+
         # --------------S10 LATEST CAPTURE--------------
         #--- Latest detection capture request. ---
         elif self.path == '/latest-capture':
@@ -83,7 +137,9 @@ class HTTPHandler(http.server.BaseHTTPRequestHandler):
                             "objects": latest_detection.get("objects", []),
                             "confidence": latest_detection.get("confidence", []),
                             "timestamp": latest_detection.get("timestamp", 0),
+                            "capture_id": latest_detection.get("capture_id"),
                             "image_base64": latest_detection.get("image_base64", ""),
+                            "thumbnail_base64": latest_detection.get("thumbnail_base64", ""),
                             "detections": latest_detection.get("detections", [])
                         }
                     }
@@ -94,6 +150,7 @@ class HTTPHandler(http.server.BaseHTTPRequestHandler):
                             "confidence": [],
                             "timestamp": 0,
                             "image_base64": "",
+                            "thumbnail_base64": "",
                             "detections": []
                         }
                     }
@@ -171,7 +228,7 @@ class HTTPHandler(http.server.BaseHTTPRequestHandler):
             command = data.get('command')
 
             if command in ['OPEN_DOOR', 'CLOSE_DOOR']:
-                command_queue.put(command)
+                Queue_Command(command, data.get('command_id'), source='http')
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
                 self.end_headers()
@@ -197,6 +254,20 @@ def set_door_controller_reference(door_controller_ref : DoorControl):
     global door_controller
     door_controller = door_controller_ref
 
+#Set the camera scheduler reference to report per-camera statistics
+def set_camera_scheduler_reference(scheduler_ref):
+    global camera_scheduler
+    camera_scheduler = scheduler_ref
+
+#Set the inference rate scheduler reference to report its decisions
+def set_rate_scheduler_reference(scheduler_ref):
+    global rate_scheduler
+    rate_scheduler = scheduler_ref
+
+def set_detection_aggregator_reference(aggregator_ref):
+    global detection_aggregator
+    detection_aggregator = aggregator_ref
+
 #Obtain the statistics from the SmartGate (Jetson Nano and board)
 def get_jetson_status():
     cpu_temp = psutil.sensors_temperatures()['thermal-fan-est'][0].current
@@ -249,7 +320,37 @@ def Shutdown_Server(server):
     server.shutdown()
     server.server_close()
 
+def Queue_Command(action, command_id=None, source='http', received=None):
+    """
+    Queue a door command for the main loop. Used by the HTTP server and the MQTT client, so every command is carried
+    out by the state machine's own DoorControl.
+
+    :param action: 'OPEN_DOOR' or 'CLOSE_DOOR'
+    :param command_id: Optional ID of the command. A command whose ID was already queued is dropped
+    :param source: Where the command came from ('http' or 'mqtt')
+    :param received: Time the command was received (defaults to now)
+    :return: True if the command was queued, False if it was a duplicate
+    """
+    if command_id:
+        with recent_command_lock:
+            if command_id in recent_command_ids:
+                return False
+            recent_command_ids[command_id] = True
+            while len(recent_command_ids) > MAX_RECENT_COMMAND_IDS:
+                recent_command_ids.popitem(last=False)
+
+    command_queue.put({
+        "action": action,
+        "command_id": command_id,
+        "source": source,
+        "received": received if received is not None else time.time()
+    })
+    return True
+
 def Fetch_Queued_Command():
+    """
+    :return: The next queued command as a dictionary with 'action', 'command_id', 'source' and 'received', or None
+    """
     if not command_queue.empty():
         return command_queue.get()
     return None
@@ -21,6 +21,24 @@ class JsonConfig:
         self.rules_config  = self.config['rules']
         self.server_config = self.config['server']
 
+        #The frame source is optional and defaults to the CSI camera
+        self.source_config = self.config.get('source', {"type": "csi"})
+        if self.source_config.get('type') in ('file', 'directory'):
+            self.source_config['path'] = self._make_path_absolute(self.source_config['path'])
+
+        #Multi-camera gates list several sources. A single 'source' is treated as a list of one camera
+        self.sources_config = self.config.get('sources', [dict(self.source_config, name='camera0')])
+        for source in self.sources_config:
+            if source.get('type') in ('file', 'directory'):
+                source['path'] = self._make_path_absolute(source['path'])
+        self.scheduler_config = self.config.get('scheduler', {"mode": "round_robin"})
+
+        #Inference rate scheduling is optional, every value has a default
+        self.inference_rate_config = self.config.get('inference_rate', {})
+
+        #Detection aggregation is optional, every value has a default
+        self.aggregation_config = self.config.get('aggregation', {})
+
         #Ensure that the paths defined within the model configuration is relative to the config_path
         self.model_config['path']    = self._make_path_absolute(self.model_config['path'])
         self.model_config['classes'] = self._make_path_absolute(self.model_config['classes'])
@@ -48,9 +66,11 @@ class JsonConfig:
             },
             {
                 "objects": [...],
-                "action": "CLOSE"
+                "action": "CLOSE",
+                "sides": ["exit"]
             }
         ]
+        The optional "sides" list restricts a rule to cameras watching those sides of the gate.
         """
         return self.rules_config
 
@@ -64,6 +84,84 @@ class JsonConfig:
         """
         return self.server_config
 
+    def get_source_config(self):
+        """
+        Get the frame source configuration. Defaults to the CSI camera when not defined.
+        Example format in JSON:
+        "source": {
+            "type": "csi" | "file" | "directory" | "rtsp",
+            "path": "...",
+            "framerate": ...,
+            "loop": false,
+            "realtime": true
+        }
+        """
+        return self.source_config
+
+    def get_sources_config(self):
+        """
+        Get the list of frame sources for multi-camera gates. Falls back to the single 'source' configuration.
+        Each entry uses the 'source' format plus an optional name, gate side, region of interest and tiled inference
+        settings (full-resolution overlapping tiles for small, distant animals).
+        Example format in JSON:
+        "sources": [
+            {
+                "name": "approach",
+                "type": "csi",
+                "sensor_id": 0,
+                "side": "approach",
+                "roi": [x1, y1, x2, y2],
+                "tiling": {
+                    "enabled": true,
+                    "tile_size": 640,
+                    "overlap": 0.2,
+                    "motion_roi": true
+                }
+            },
+            ...
+        ]
+        """
+        return self.sources_config
+
+    def get_scheduler_config(self):
+        """
+        Get the configuration of the scheduler feeding camera frames to the detector.
+        Example format in JSON:
+        "scheduler": {
+            "mode": "round_robin" | "batched"
+        }
+        """
+        return self.scheduler_config
+
+    def get_inference_rate_config(self):
+        """
+        Get the thermal- and activity-aware inference rate configuration.
+        Example format in JSON:
+        "inference_rate": {
+            "max_hz": 5,
+            "min_hz": 1,
+            "burst_hz": 10,
+            "hot_temp": 70,
+            "fan_on_temp": 55,
+            "fan_off_temp": 50,
+            "empty_frames": 10,
+            "uncertain_margin": 0.15,
+            "log_path": "..."
+        }
+        """
+        return self.inference_rate_config
+
+    def get_aggregation_config(self):
+        """
+        Get the configuration of the window detections are summarised over before they are published.
+        Example format in JSON:
+        "aggregation": {
+            "enabled": true,
+            "window": 10
+        }
+        """
+        return self.aggregation_config
+
     def update_config(self, new_config, save_to_file=False):
         """Updates the current configuration with new values."""
         self.config.update(new_config)
@@ -9,72 +9,134 @@ import io_control as io
 from enum import Enum, auto
 import threading
 
-from http_server import Initialize_Server, Shutdown_Server, set_latest_frame, set_door_controller_reference, Fetch_Queued_Command
+from http_server import Initialize_Server, Shutdown_Server, set_latest_frame, set_door_controller_reference, set_camera_scheduler_reference, set_rate_scheduler_reference, set_detection_aggregator_reference, Fetch_Queued_Command, Queue_Command
 from ruleset_decider import RulesetDecider
 from gate_states import State
 from json_config import JsonConfig
+from frame_source import create_frame_source, source_config_from_path
+from camera_streams import FrameScheduler, MotionRoi
+from rate_scheduler import InferenceRateScheduler
+from perf_stats import LatencyRecorder
+from encode_pool import EncodePool
+from detection_aggregator import DetectionAggregator
 
 import signal
 import sys
 import json
 import requests
 import time
-import base64
+import math
+import argparse
 import cv2
 
-def gstreamer_pipeline(
-    capture_width=1280,
-    capture_height=720,
-    display_width=1280,
-    display_height=720,
-    framerate=5,
-    flip_method=0
-):
-    return (
-        f"nvarguscamerasrc ! "
-        f"video/x-raw(memory:NVMM), "
-        f"width=(int){capture_width}, height=(int){capture_height}, "
-        f"format=(string)NV12, framerate=(fraction){framerate}/1 ! "
-        f"nvvidconv flip-method={flip_method} ! "
-        f"video/x-raw, width=(int){display_width}, height=(int){display_height}, format=(string)BGRx ! "
-        f"videoconvert ! "
-        f"video/x-raw, format=(string)BGR ! appsink"
-    )
-
 # ----- S10 Group Added
 # --------------S10 MQTT DETECTION--------------
+# The MQTT client is created by main() and passed to the functions below (None when it is unavailable);
+# publishing only queues the message
 # Global variable to store latest detection data
 latest_detection_data = None
+latest_detection_seq  = 0
+detection_seq = 0
 
-def send_detection_alert(objects_detected, detections=None, detection_image=None):
-    """Send detection info to EC2 via MQTT and store latest detection"""
-    global latest_detection_data
+#JPEG and thumbnail encoding of detection frames runs on its own thread so the DECISION state never waits on it
+encode_pool = EncodePool()
+detection_lock = threading.Lock()
+
+#Detections are summarised over a window before they are published, configured in main()
+detection_aggregator = None
+
+class NullPublisher:
+    """
+    Stands in for the MQTT client in the benchmark: takes the same calls and only counts them, so recorded footage
+    never reaches the broker and the alert stage is timed without it
+    """
+    def __init__(self):
+        self.published = {}
+
+    def _count(self, kind):
+        self.published[kind] = self.published.get(kind, 0) + 1
+
+    def publish_detection(self, objects, confidence=None, capture_id=None):
+        self._count("detection")
+
+    def publish_detection_summary(self, summary):
+        self._count("detection_summary")
+
+    def publish_ack(self, command_id, action, result, received, applied=None, completed=None):
+        self._count("acks")
+
+def send_detection_alert(mqtt_client, objects_detected, detections=None, detection_image=None):
+    """Send detection info to EC2 via MQTT and queue the detection image for encoding"""
+    global detection_seq
     try:
-        from mqtt_jetson_client import mqtt_client
-        mqtt_client.publish_detection(objects_detected)
+        detection_seq += 1
+        confidence = [float(obj.get('conf', 0)) for obj in detections] if detections else []
+
+        # Only a capture reference is published; the image is served on /latest-capture
+        if detection_aggregator:
+            publish_detection_summary(mqtt_client, detection_aggregator.add(detections or [], detection_seq))
+        elif mqtt_client:
+            mqtt_client.publish_detection(objects_detected, confidence, detection_seq)
         
-        # Store latest detection data with image
+        # Store latest detection data with image once the encoding pool has finished it
         if detection_image is not None and detections is not None:
-            # Encode image to base64 for storage
-            _, buffer = cv2.imencode('.jpg', detection_image)
-            image_base64 = base64.b64encode(buffer).decode('utf-8')
-            
-            latest_detection_data = {
+            detection = {
                 "objects": objects_detected,
                 "detections": detections,
-                "confidence": [obj.get('confidence', 0) for obj in detections] if detections else [],
+                "confidence": confidence,
                 "timestamp": time.time(),
-                "image_base64": image_base64
+                "capture_id": detection_seq
             }
+            encode_pool.submit(detection_image, _detection_encoded_callback(detection_seq, detection))
     except:
         pass  # Fail silently to not interrupt main loop
 
+def publish_detection_summary(mqtt_client, summary):
+    """Publish a closed aggregation window, if any"""
+    if summary and mqtt_client:
+        mqtt_client.publish_detection_summary(summary)
+
+def _detection_encoded_callback(seq, detection):
+    def store(future):
+        global latest_detection_data, latest_detection_seq
+        #Dropped (stale) or failed jobs are skipped, and an older frame never replaces a newer one
+        if future.cancelled() or future.exception() is not None:
+            return
+        detection.update(future.result())
+        with detection_lock:
+            if seq > latest_detection_seq:
+                latest_detection_seq  = seq
+                latest_detection_data = detection
+    return store
+
 def get_latest_detection():
     """Get latest detection data"""
     global latest_detection_data
     return latest_detection_data
     # --------------S10 MQTT DETECTION END--------------
 
+def acknowledge_command(mqtt_client, command, result):
+    """Publish the ack of a remote command, with its receive, apply and complete times, once it has been carried out"""
+    if not command or not command.get('command_id') or not mqtt_client:
+        return
+    mqtt_client.publish_ack(command['command_id'], command['action'], result, command['received'], command.get('applied'), time.time())
+
+def detect_objects(model : YoloTRT, img, tiling=None, roi=None):
+    """
+    Run the detector on a camera frame. Cameras with tiling configured are inferred tile by tile at full resolution,
+    the others are resized to 600px wide first.
+
+    :return: Tuple of (detections, engine time, frame resized for streaming and alerts, number of tiles used)
+    """
+    if tiling:
+        detections, t = model.InferenceTiled(img, tiling.get('tile_size', 640), tiling.get('overlap', 0.2), roi)
+        return detections, t, imutils.resize(img, width=600), model.last_tile_count
+
+    #Resize the frame for YOLOv5
+    img = imutils.resize(img, width=600)
+    detections, t = model.Inference(img)
+    return detections, t, img, 1
+
 def cleanup():
     print("[+] Cleaning up resources...")
     io.all_pins_off()
@@ -86,20 +148,123 @@ def signal_handler(sig, frame):
     cleanup()
     sys.exit(0)
 
-def main():
+def run_benchmark(config : JsonConfig, source_config : dict = None, max_frames=None, report_path=None):
+    """
+    Run the DETECT -> DECISION path (no GPIO, web server or MQTT client, see NullPublisher) and print the FPS,
+    per-stage p50/p95/p99 latencies and decision counts.
+
+    A single frame source is read as fast as possible (no real-time pacing). Without one, the configured 'sources'
+    go through the FrameScheduler like in main(), every camera at its own pace, and the per-camera FPS and the
+    fairness of the scheduler are reported as well.
+
+    :param config: Loaded SmartGate configuration
+    :param source_config: Frame source dictionary (read json_config.py to see format), None for the configured sources
+    :param max_frames: Stop after this many decisions (default: until the sources are exhausted)
+    :param report_path: Optional path to write the summary as JSON for regression checks
+    """
+    global detection_aggregator
+    detection_aggregator = DetectionAggregator(config.get_aggregation_config())
+    publisher = NullPublisher()
+
+    model   = YoloTRT(config.get_model_config())
+    decider = RulesetDecider(config.get_rules_config())
+
+    if source_config is not None:
+        scheduler = None
+        source = create_frame_source(source_config, realtime=False)
+        tiling = source_config.get('tiling')
+        tiling = tiling if tiling and tiling.get('enabled', True) else None
+        motion = MotionRoi() if tiling and tiling.get('motion_roi', True) else None
+    else:
+        scheduler = FrameScheduler(config.get_sources_config(), mode=config.get_scheduler_config().get('mode', 'round_robin'))
+        scheduler.start()
+
+    recorder = LatencyRecorder()
+    try:
+        while max_frames is None or recorder.frames < max_frames:
+            if scheduler:
+                frames = scheduler.next_frames()
+                if not frames:
+                    if scheduler.all_finished():
+                        break
+                    continue
+            else:
+                ret_val, img = source.read()
+                if not ret_val:
+                    break
+                frames = [(None, img)]
+
+            frame_start = time.perf_counter()
+            camera_results = []
+            alerts = []
+            for stream, img in frames:
+                with recorder.measure('inference'):
+                    if stream:
+                        tiling = stream.tiling
+                        roi = stream.motion_roi(img) if tiling else None
+                    else:
+                        roi = motion.update(img) if motion else None
+                    inference_start = time.perf_counter()
+                    detections, t, img, tiles = detect_objects(model, img, tiling, roi)
+                    if stream and tiling:
+                        stream.record_tiles(tiles, time.perf_counter() - inference_start)
+                recorder.record('engine', t)
+                recorder.count('tiles', tiles)
+
+                object_list = [obj['class'] for obj in detections]
+                camera_results.append((stream.side if stream else None, object_list))
+                alerts.append((object_list, detections, img))
+
+            with recorder.measure('alert'):
+                for object_list, detections, img in alerts:
+                    send_detection_alert(publisher, object_list, detections, img)
+                publish_detection_summary(publisher, detection_aggregator.poll())
+
+            with recorder.measure('decision'):
+                next_state = decider.decide_cameras(camera_results)
+
+            recorder.record('total', time.perf_counter() - frame_start)
+            recorder.count(next_state.name)
+            recorder.frame_done()
+    except KeyboardInterrupt:
+        print('[+] Benchmark interrupted...')
+    finally:
+        if scheduler:
+            scheduler.stop()
+        else:
+            source.release()
+
+    recorder.print_summary("DETECT -> DECISION benchmark")
+    cameras = scheduler.report() if scheduler else None
+    if cameras:
+        print(f"    scheduler: {cameras['mode']}, Jain fairness {cameras['fairness']:.3f}")
+        for name, camera in cameras['cameras'].items():
+            print(f"    {name}: {camera['capture_fps']:.2f} FPS captured, {camera['inference_fps']:.2f} FPS inferred, "
+                  f"{camera['frames_dropped']} frames dropped, frame age p95 {camera['frame_age_p95_ms']:.1f} ms")
+    print(f"    encode pool: {encode_pool.stats()}")
+    publish_detection_summary(publisher, detection_aggregator.flush("end"))
+    print(f"    detection aggregation: {detection_aggregator.report()}")
+    print(f"    MQTT messages (not sent): {publisher.published}")
+    if report_path:
+        recorder.save_summary(report_path, {"cameras": cameras} if cameras else None)
+        print(f"[+] Benchmark report written to {report_path}")
+
+def main(config_path='../../config/config.json', source_override=None):
     #Global HTTP server for resource allocation and deallocation
-    global web_server
+    global web_server, detection_aggregator
 
     #Set up signal handler keyboard interrupt
     signal.signal(signal.SIGINT, signal_handler)
 
     #Initialize configuration settings for the SmartGate
-    config = JsonConfig()
+    config = JsonConfig(config_path)
 
     #Grab respective configurations from config.json file
     model_config  = config.get_model_config() 
     rules_config  = config.get_rules_config() 
     server_config = config.get_server_config()
+    sources_config   = [dict(source_override, name='camera0')] if source_override else config.get_sources_config()
+    scheduler_config = config.get_scheduler_config()
 
     #Initialize YOLOv5 model via TensorRT engine
     model = YoloTRT(model_config)
@@ -125,22 +290,65 @@ def main():
     #Initialize State Machine
     current_state = State.IDLE
 
-    #Initialize object detection class list
-    object_list = []
+    #Initialize per-camera detection results as a list of (side, object list)
+    camera_results = []
+
+    #The inference rate scheduler throttles DETECT from temperature, PIR activity and detection confidence
+    #and drives the FAN pin
+    rate_scheduler = InferenceRateScheduler(config.get_inference_rate_config(), model_config['confidence'])
+    set_rate_scheduler_reference(rate_scheduler)
+
+    #CSI cameras capture at the burst rate so an uncertain track gets new frames to look at. Outside a burst the
+    #rate scheduler infers fewer of them and the latest-frame slot drops the rest
+    sources_config = [
+        dict(source, framerate=math.ceil(max(source.get('framerate', 5), rate_scheduler.peak_hz))) if source.get('type', 'csi') == 'csi' else source
+        for source in sources_config
+    ]
+
+    #Open every frame source (CSI camera through GStreamer by default, or recorded footage) on its own capture thread.
+    #The scheduler feeds their latest frames to the single detector
+    scheduler = FrameScheduler(sources_config, mode=scheduler_config.get('mode', 'round_robin'))
+    scheduler.start()
+    set_camera_scheduler_reference(scheduler)
+
+    #Detections are published as one summary per aggregation window instead of one message per DETECT cycle
+    detection_aggregator = DetectionAggregator(config.get_aggregation_config())
+    set_detection_aggregator_reference(detection_aggregator)
+
+    #Connect to the broker. Remote MQTT commands are routed into the same command queue as the HTTP server, so only
+    #this loop drives the door
+    try:
+        from mqtt_jetson_client import get_mqtt_client
+        mqtt_client = get_mqtt_client()
+    except Exception as e:
+        print(f"[-] MQTT client unavailable: {e}")
+        mqtt_client = None
+    if mqtt_client:
+        mqtt_client.set_command_handler(lambda action, command_id, received: Queue_Command(action, command_id, 'mqtt', received))
 
-    #Open the camera using GStreamer pipeline
-    cap = cv2.VideoCapture(gstreamer_pipeline(), cv2.CAP_GSTREAMER)
+    #Command being carried out by the door states, acknowledged once they have run
+    pending_command = None
 
     #Our main loop
     while True:
         #----------Check for commands from POST requests coming from HTTP server------------
         command = Fetch_Queued_Command()
         if command:
-            if command == 'OPEN_DOOR':
+            #A newer command replaces one that has not been carried out yet
+            acknowledge_command(mqtt_client, pending_command, "superseded")
+            command['applied'] = time.time()
+            pending_command = command
+            if command['action'] == 'OPEN_DOOR':
                 current_state = State.DOOR_OPEN
-            elif command == 'CLOSE_DOOR':
+            elif command['action'] == 'CLOSE_DOOR':
                 current_state = State.DOOR_CLOSE
 
+        #Refresh the temperature, fan and thermal limit of the inference rate
+        rate_scheduler.tick()
+
+        #Close the aggregation window once it has run its course
+        publish_detection_summary(mqtt_client, detection_aggregator.poll())
+
         #------------IDLE State ------------------------------------------------------------
         if current_state == State.IDLE:
             print("System is idle.")
@@ -153,8 +361,11 @@ def main():
                 door_controller.stop_door()
                 print("Door fully open, stopping motor.")
 
-            #On any movement, set to DETECT state which will start capturing from the camera
-            if io.get_val('PIR'):
+            #On any movement, set to DETECT state which will start capturing from the camera.
+            #The inference rate scheduler decides whether it is time for the next inference
+            pir_active = bool(io.get_val('PIR'))
+            rate_scheduler.note_pir(pir_active)
+            if pir_active and rate_scheduler.should_infer():
                 current_state = State.DETECT
             else:
                 current_state = State.IDLE #Put back to IDLE state
@@ -162,29 +373,40 @@ def main():
         #------------DETECT State ----------------------------------------------------------
         elif current_state == State.DETECT:
             print("Detecting objects.")
-            ret_val, img = cap.read()
-            if not ret_val:
-                break
-
-            #Resize the frame for YOLOv5
-            img = imutils.resize(img, width=600)
-
-            #Perform inference
-            detections, t = model.Inference(img)
-
-            #Update the latest_frame for streaming
-            set_latest_frame(img.copy())
-
-            object_list = [obj['class'] for obj in detections]
-            send_detection_alert(object_list, detections, img)  # S10 CODE MQTT
+            frames = scheduler.next_frames()
+            if not frames:
+                if scheduler.all_finished():
+                    break
+                continue #No new frame yet, stay in DETECT
+
+            camera_results = []
+            all_detections = []
+            for stream, img in frames:
+                #Perform inference, tiled and limited to the motion ROI on cameras configured for it
+                roi = stream.motion_roi(img) if stream.tiling else None
+                inference_start = time.perf_counter()
+                detections, t, img, tiles = detect_objects(model, img, stream.tiling, roi)
+                if stream.tiling:
+                    stream.record_tiles(tiles, time.perf_counter() - inference_start)
+
+                #Update the latest_frame for streaming from the first camera
+                if stream is scheduler.streams[0]:
+                    set_latest_frame(img.copy())
+
+                object_list = [obj['class'] for obj in detections]
+                camera_results.append((stream.side, object_list))
+                all_detections.extend(detections)
+                send_detection_alert(mqtt_client, object_list, detections, img)  # S10 CODE MQTT
+
+            rate_scheduler.record_inference(all_detections)
             current_state = State.DECISION
 
         #------------DECISION State --------------------------------------------------------
         elif current_state == State.DECISION:
             print("Decision making door.")
             
-            #Decide on ruleset
-            current_state = decider.decide(object_list)
+            #Decide on ruleset, combining the results of every camera
+            current_state = decider.decide_cameras(camera_results)
 
         #------------DOOR OPEN State -------------------------------------------------------
         elif current_state == State.DOOR_OPEN:
@@ -192,14 +414,18 @@ def main():
 
             if not door_controller.is_door_fully_open():
                 door_controller.open_door()
-                # Send status with detection context
-                from door_control import send_mqtt_command
-                send_mqtt_command("door_opening", get_latest_detection())
+                door_status = "door_opening"
             else:
                 print('Door stopped on opening')
                 door_controller.stop_door()
-                from door_control import send_mqtt_command
-                send_mqtt_command("door_opened", get_latest_detection())
+                door_status = "door_opened"
+
+            # Flush the detections that led to this door action, then send status with detection context
+            publish_detection_summary(mqtt_client, detection_aggregator.flush("gate_action"))
+            from door_control import send_mqtt_command
+            send_mqtt_command(door_status, get_latest_detection())
+            acknowledge_command(mqtt_client, pending_command, door_status)
+            pending_command = None
             
             current_state = State.IDLE
 
@@ -210,14 +436,18 @@ def main():
             #Read Hall Effect sensor of Door Closed. Keep closing if the Hall effect sensor is 0
             if not door_controller.is_door_fully_closed():
                 door_controller.close_door()
-                # Send status with detection context
-                from door_control import send_mqtt_command
-                send_mqtt_command("door_closing", get_latest_detection())
+                door_status = "door_closing"
             else:
                 print('Door stopped on closing')
                 door_controller.stop_door()
-                from door_control import send_mqtt_command
-                send_mqtt_command("door_closed", get_latest_detection())
+                door_status = "door_closed"
+
+            # Flush the detections that led to this door action, then send status with detection context
+            publish_detection_summary(mqtt_client, detection_aggregator.flush("gate_action"))
+            from door_control import send_mqtt_command
+            send_mqtt_command(door_status, get_latest_detection())
+            acknowledge_command(mqtt_client, pending_command, door_status)
+            pending_command = None
                 
             current_state = State.IDLE
 
@@ -225,9 +455,28 @@ def main():
         elif current_state == State.DELAY:
             print("Delaying operation.")
     
-    #Sets all pins to LOW
+    #Stop the capture threads and sets all pins to LOW
+    scheduler.stop()
     io.all_pins_off()
 
 #Main logic
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="SmartGate live detection")
+    parser.add_argument('--config', default='../../config/config.json', help="Path to the SmartGate JSON config")
+    parser.add_argument('--source', help="Video file, image directory or stream URL to use instead of the configured source")
+    parser.add_argument('--benchmark', action='store_true', help="Run DETECT -> DECISION as fast as possible and report FPS and latencies")
+    parser.add_argument('--max-frames', type=int, default=None, help="Stop the benchmark after this many frames")
+    parser.add_argument('--report', default=None, help="Write the benchmark summary to this JSON file")
+    args = parser.parse_args()
+
+    source_override = source_config_from_path(args.source) if args.source else None
+
+    if args.benchmark:
+        config = JsonConfig(args.config)
+        #Several configured cameras are benchmarked through the frame scheduler, a single source as fast as possible
+        if source_override or 'sources' not in config.config:
+            run_benchmark(config, source_override or config.get_source_config(), args.max_frames, args.report)
+        else:
+            run_benchmark(config, None, args.max_frames, args.report)
+    else:
+        main(args.config, source_override)
@@ -0,0 +1,106 @@
+#Small helpers for measuring the throughput and latency of the SmartGate pipeline
+import time
+import json
+from collections import defaultdict
+
+def percentile(samples: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of samples.
+
+    :param samples: List of numeric samples (does not need to be sorted)
+    :param pct: Percentile to compute, between 0 and 100
+    :return: The percentile value, or 0.0 if there are no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = int(round((pct / 100.0) * (len(ordered) - 1)))
+    return ordered[max(0, min(rank, len(ordered) - 1))]
+
+class LatencyRecorder:
+    """
+    Records per-stage latencies (in seconds) and named counters, and summarises them as p50/p95/p99.
+
+    Usage:
+        recorder = LatencyRecorder()
+        with recorder.measure('inference'):
+            model.Inference(img)
+        recorder.count('DOOR_OPEN')
+    """
+    def __init__(self):
+        self.samples  = defaultdict(list)
+        self.counters = defaultdict(int)
+        self.start_time = time.perf_counter()
+        self.frames = 0
+
+    def record(self, stage: str, seconds: float):
+        """Add a single latency sample for a stage."""
+        self.samples[stage].append(seconds)
+
+    def measure(self, stage: str):
+        """Context manager that records the time spent inside the block under `stage`."""
+        return _StageTimer(self, stage)
+
+    def count(self, name: str, amount: int = 1):
+        """Increment a named counter (e.g. decision outcomes)."""
+        self.counters[name] += amount
+
+    def frame_done(self):
+        """Mark one frame as fully processed (used for the FPS figure)."""
+        self.frames += 1
+
+    def summary(self) -> dict:
+        """
+        Summarise everything recorded so far.
+
+        :return: Dictionary with elapsed time, FPS, per-stage percentiles in milliseconds and counters
+        """
+        elapsed = time.perf_counter() - self.start_time
+        stages = {}
+        for stage, values in self.samples.items():
+            stages[stage] = {
+                "count": len(values),
+                "mean_ms": (sum(values) / len(values)) * 1000.0 if values else 0.0,
+                "p50_ms": percentile(values, 50) * 1000.0,
+                "p95_ms": percentile(values, 95) * 1000.0,
+                "p99_ms": percentile(values, 99) * 1000.0
+            }
+        return {
+            "frames": self.frames,
+            "elapsed_s": elapsed,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "stages": stages,
+            "counters": dict(self.counters)
+        }
+
+    def print_summary(self, title: str = "Benchmark"):
+        """Print a human-readable report of the summary."""
+        report = self.summary()
+        print(f"[+] {title}: {report['frames']} frames in {report['elapsed_s']:.2f}s ({report['fps']:.2f} FPS)")
+        print(f"    {'stage':<12}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+        for stage, stats in report['stages'].items():
+            print(f"    {stage:<12}{stats['count']:>8}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+        for name, value in sorted(report['counters'].items()):
+            print(f"    {name}: {value}")
+
+    def save_summary(self, path: str, extra: dict = None):
+        """
+        Write the summary to a JSON file so runs can be compared across commits.
+
+        :param extra: Additional sections to write along with the summary (e.g. the camera scheduler's report)
+        """
+        with open(path, 'w') as file:
+            json.dump(dict(self.summary(), **(extra or {})), file, indent=4)
+
+class _StageTimer:
+    def __init__(self, recorder: LatencyRecorder, stage: str):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.record(self.stage, time.perf_counter() - self.t0)
+        return False
@@ -0,0 +1,202 @@
+#This module decides how often the DETECT state is allowed to run inference.
+#The rate depends on the Jetson temperature, recent PIR activity and the confidence of the latest detections,
+#and the same temperature readings drive the FAN output pin.
+import time
+import json
+import psutil
+from collections import defaultdict
+
+import io_control as io
+
+def read_cpu_temperature() -> float:
+    """
+    Read the Jetson Nano temperature from the 'thermal-fan-est' sensor.
+
+    :return: Temperature in degrees Celsius, or None if the sensor cannot be read
+    """
+    try:
+        return psutil.sensors_temperatures()['thermal-fan-est'][0].current
+    except (KeyError, IndexError, AttributeError):
+        return None
+
+class InferenceRateScheduler:
+    """
+    Sets the inference rate of the DETECT state from temperature, PIR activity and detection confidence.
+
+    - Too hot: drop to `min_hz`
+    - Detection confidence just above the threshold (uncertain track): burst at `burst_hz`
+    - `empty_frames` consecutive inferences without detections: drop to `min_hz`
+    - Otherwise (fresh PIR activity or confident detections): run at `max_hz`
+
+    :param config: Dictionary that contains the 'inference_rate' configuration
+    :param confidence: Detection confidence threshold of the model, used as the bottom of the uncertainty band
+
+    The cameras must capture at least `peak_hz` frames per second for a burst to see any new frames.
+    """
+    def __init__(self, config : dict, confidence : float = 0.5):
+        self.max_hz           = config.get('max_hz', 5.0)
+        self.min_hz           = config.get('min_hz', 1.0)
+        self.burst_hz         = config.get('burst_hz', 2 * self.max_hz)
+        self.hot_temp         = config.get('hot_temp', 70.0)
+        self.fan_on_temp      = config.get('fan_on_temp', 55.0)
+        self.fan_off_temp     = config.get('fan_off_temp', 50.0)
+        self.empty_frames     = config.get('empty_frames', 10)
+        self.uncertain_margin = config.get('uncertain_margin', 0.15)
+        self.temp_interval    = config.get('temp_interval', 2.0)
+        self.log_path         = config.get('log_path')
+        self.confidence       = confidence
+
+        self.rate_hz = self.max_hz
+        self.reason  = "active"
+        self.temperature = None
+        self.fan_on = False
+
+        self.empty_streak = 0
+        self.pir_active = False
+        self.last_inference = 0.0
+        self.last_temp_read = 0.0
+
+        #Exported statistics
+        self.start_time = time.monotonic()
+        self.last_change = self.start_time
+        self.time_per_reason = defaultdict(float)
+        self.inferences = 0
+        self.bursts = 0
+        self.fan_on_time = 0.0
+        self.fan_on_since = None
+        self.max_temperature = None
+
+    @property
+    def peak_hz(self) -> float:
+        """Highest rate the scheduler can ask for, which the camera capture framerate has to keep up with."""
+        return max(self.max_hz, self.burst_hz)
+
+    def tick(self, now=None):
+        """
+        Called on every main loop iteration. Refreshes the temperature (at most every `temp_interval` seconds),
+        drives the FAN pin and re-evaluates the thermal limit.
+        """
+        now = now if now is not None else time.monotonic()
+        if now - self.last_temp_read < self.temp_interval:
+            return
+        self.last_temp_read = now
+
+        temperature = read_cpu_temperature()
+        if temperature is None:
+            return
+        self.temperature = temperature
+        self.max_temperature = temperature if self.max_temperature is None else max(self.max_temperature, temperature)
+
+        #Fan with hysteresis so it does not chatter around the threshold
+        if not self.fan_on and temperature >= self.fan_on_temp:
+            self._set_fan(True, now)
+        elif self.fan_on and temperature <= self.fan_off_temp:
+            self._set_fan(False, now)
+
+        if temperature >= self.hot_temp:
+            self._set_rate(self.min_hz, "hot", now)
+        elif self.reason == "hot":
+            self._set_rate(self.max_hz, "active", now)
+
+    def note_pir(self, active : bool, now=None):
+        """
+        Record the PIR state. A new movement after a quiet period resets the empty-frame streak so the first
+        frames of an approaching animal are inspected at full rate.
+        """
+        now = now if now is not None else time.monotonic()
+        if active and not self.pir_active:
+            self.empty_streak = 0
+            if self.reason == "empty":
+                self._set_rate(self.max_hz, "active", now)
+        self.pir_active = active
+
+    def should_infer(self, now=None) -> bool:
+        """
+        :return: True if enough time has passed since the last inference for the current rate
+        """
+        now = now if now is not None else time.monotonic()
+        return now - self.last_inference >= 1.0 / self.rate_hz
+
+    def record_inference(self, detections : list, now=None):
+        """
+        Update the rate from the result of an inference.
+
+        :param detections: Detections returned by `YoloTRT.Inference`
+        """
+        now = now if now is not None else time.monotonic()
+        self.last_inference = now
+        self.inferences += 1
+
+        if detections:
+            self.empty_streak = 0
+        else:
+            self.empty_streak += 1
+
+        #Thermal limit always wins
+        if self.temperature is not None and self.temperature >= self.hot_temp:
+            self._set_rate(self.min_hz, "hot", now)
+        elif any(det['conf'] < self.confidence + self.uncertain_margin for det in detections):
+            self._set_rate(self.burst_hz, "uncertain", now, min(det['conf'] for det in detections))
+        elif self.empty_streak >= self.empty_frames:
+            self._set_rate(self.min_hz, "empty", now)
+        else:
+            self._set_rate(self.max_hz, "active", now)
+
+    def _set_rate(self, rate_hz : float, reason : str, now : float, confidence : float = None):
+        if rate_hz == self.rate_hz and reason == self.reason:
+            return
+        self.time_per_reason[self.reason] += now - self.last_change
+        self.last_change = now
+        self.rate_hz = rate_hz
+        self.reason  = reason
+        burst = reason == "uncertain"
+        if burst:
+            self.bursts += 1
+        print(f"[+] Inference rate set to {rate_hz} Hz ({reason})")
+        #A burst also records the lowest confidence that triggered it
+        record = {"event": "rate", "rate_hz": rate_hz, "reason": reason, "burst": burst}
+        if burst:
+            record["confidence"] = confidence
+        self._export(record)
+
+    def _set_fan(self, on : bool, now : float):
+        io.set_val('FAN', on)
+        if on:
+            self.fan_on_since = now
+        elif self.fan_on_since is not None:
+            self.fan_on_time += now - self.fan_on_since
+            self.fan_on_since = None
+        self.fan_on = on
+        self._export({"event": "fan", "fan_on": on})
+
+    def _export(self, record : dict):
+        #Every decision is appended as a JSON line so power and thermal gains can be analysed offline
+        if not self.log_path:
+            return
+        record.update({"time": time.time(), "temperature": self.temperature})
+        try:
+            with open(self.log_path, 'a') as file:
+                file.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"[-] Could not write inference rate log: {e}")
+
+    def report(self) -> dict:
+        """Current scheduler state and cumulative statistics."""
+        now = time.monotonic()
+        time_per_reason = dict(self.time_per_reason)
+        time_per_reason[self.reason] = time_per_reason.get(self.reason, 0.0) + now - self.last_change
+        fan_on_time = self.fan_on_time + (now - self.fan_on_since if self.fan_on_since is not None else 0.0)
+        elapsed = max(now - self.start_time, 1e-9)
+        return {
+            "rate_hz": self.rate_hz,
+            "reason": self.reason,
+            "temperature": self.temperature,
+            "max_temperature": self.max_temperature,
+            "fan_on": self.fan_on,
+            "fan_on_seconds": fan_on_time,
+            "inferences": self.inferences,
+            "burst_hz": self.burst_hz,
+            "bursts": self.bursts,
+            "average_rate_hz": self.inferences / elapsed,
+            "seconds_per_reason": time_per_reason
+        }
@@ -12,18 +12,46 @@ class RulesetDecider:
     def __init__(self, rules_config):
         self.rules = rules_config
 
-    def decide(self, object_list: list) -> State:
+    def decide(self, object_list: list, side: str = None) -> State:
         """
         Responsible for deciding and setting the appropriate state transition based on the detected objects.
 
         :param object_list: List of detected objects obtained from detection model
+        :param side: Side of the gate the objects were seen on. Rules restricted to other sides are ignored
         :return: The next state based on the detected objects of type `State` enum
         """
+        open_detected, close_detected = self._match_rules(object_list, side)
+        return self._resolve(open_detected, close_detected)
+
+    def decide_cameras(self, camera_results: list) -> State:
+        """
+        Shared gate decision for multi-camera gates. Every camera's detections are matched against the rules for its
+        side, and the outcomes are combined as if they came from a single camera.
+
+        :param camera_results: List of (side, object_list) tuples, one per camera frame
+        :return: The next state based on the detected objects of type `State` enum
+        """
+        open_detected  = False
+        close_detected = False
+
+        for side, object_list in camera_results:
+            camera_open, camera_close = self._match_rules(object_list, side)
+            open_detected  = open_detected or camera_open
+            close_detected = close_detected or camera_close
+
+        return self._resolve(open_detected, close_detected)
+
+    def _match_rules(self, object_list: list, side: str = None):
         #Check the rules accordingly and set the state
         open_detected  = False
         close_detected = False
 
         for rule in self.rules:
+            #Rules may be restricted to cameras on given sides of the gate (e.g. "approach" or "exit")
+            rule_sides = rule.get('sides')
+            if rule_sides and side not in rule_sides:
+                continue
+
             for obj in object_list:
                 if obj in rule['objects']:
                     if rule['action'] == 'OPEN':
@@ -31,6 +59,9 @@ class RulesetDecider:
                     elif rule['action'] == 'CLOSE':
                         close_detected = True
 
+        return open_detected, close_detected
+
+    def _resolve(self, open_detected: bool, close_detected: bool) -> State:
         #Decision Logic
         if close_detected and open_detected:
             return State.DOOR_CLOSE
@@ -9,84 +9,588 @@ import json
 import time
 import threading
 import logging
+import queue
+import os
+import struct
+import base64
+import random
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Default QoS per message kind (last topic level of jetson/<gate>/<kind>)
+DEFAULT_QOS = {"detection": 1, "status": 1, "heartbeat": 0, "acks": 1}
+
+# --------------COMPACT PAYLOAD ENCODING--------------
+# Binary payloads start with a magic byte that can never start a JSON document, followed by the schema version and
+# the message type. Receivers sniff the first byte, so JSON and binary gates can share the same topics.
+# All integers are big-endian; strings are a u8 length followed by UTF-8 bytes.
+#
+#   header      : u8 magic (0xA5), u8 version, u8 type
+#   heartbeat   : f64 timestamp
+#   detection   : f64 timestamp, objects, u32 capture_id
+#   status      : f64 timestamp, str status, u8 has_context [, f64 timestamp, objects, u32 capture_id]
+#   status batch: u8 count, count x status body
+#   command     : f64 timestamp, str action, str command_id
+#   ack         : f64 received, f64 applied, f64 completed, str command_id, str action, str result
+#   summary     : f64 timestamp, f64 first_seen, f64 last_seen, u16 frames, str reason, u32 capture_id,
+#                 u8 count, count x (str name, u16 count, u16 max_conf * 10000, u16 mean_conf * 10000,
+#                 f64 first_seen, f64 last_seen)
+#   objects     : u8 count, count x (str name, u16 confidence * 10000)
+#
+# Images are never embedded, only the capture_id of the frame served on /latest-capture.
+PAYLOAD_MAGIC    = 0xA5
+PAYLOAD_VERSION  = 1
+BINARY_ENCODING  = "sg1"
+MSG_HEARTBEAT    = 1
+MSG_DETECTION    = 2
+MSG_STATUS       = 3
+MSG_COMMAND      = 4
+MSG_STATUS_BATCH = 5
+MSG_ACK          = 6
+MSG_DETECTION_SUMMARY = 7
+
+def _pack_str(value):
+    data = str(value).encode('utf-8')[:255]
+    return struct.pack('>B', len(data)) + data
+
+def _pack_confidence(confidence):
+    return struct.pack('>H', int(round(min(max(float(confidence), 0.0), 1.0) * 10000)))
+
+def _pack_objects(objects, confidences=None):
+    objects = list(objects or [])[:255]
+    confidences = list(confidences or [])
+    out = struct.pack('>B', len(objects))
+    for index, name in enumerate(objects):
+        confidence = float(confidences[index]) if index < len(confidences) else 0.0
+        out += _pack_str(name) + _pack_confidence(confidence)
+    return out
+
+def _pack_summary(data):
+    names = list(data.get("objects", []))[:255]
+    out = (struct.pack('>BBBdddH', PAYLOAD_MAGIC, PAYLOAD_VERSION, MSG_DETECTION_SUMMARY, data.get("timestamp", time.time()),
+                       data.get("first_seen", 0.0), data.get("last_seen", 0.0), min(int(data.get("frames", 0)), 0xFFFF))
+           + _pack_str(data.get("reason", "")) + struct.pack('>IB', int(data.get("capture_id") or 0), len(names)))
+    for name in names:
+        entry = data["classes"][name]
+        out += (_pack_str(name) + struct.pack('>H', min(int(entry["count"]), 0xFFFF))
+                + _pack_confidence(entry["max_conf"]) + _pack_confidence(entry["mean_conf"])
+                + struct.pack('>dd', entry["first_seen"], entry["last_seen"]))
+    return out
+
+def _pack_status_body(data):
+    out = struct.pack('>d', data.get("timestamp", time.time())) + _pack_str(data.get("status", "unknown"))
+    context = data.get("detection_context")
+    if not context:
+        return out + struct.pack('>B', 0)
+    return (out + struct.pack('>B', 1) + struct.pack('>d', context.get("timestamp", 0.0))
+            + _pack_objects(context.get("objects"), context.get("confidence"))
+            + struct.pack('>I', int(context.get("capture_id") or 0)))
+
+def encode_binary(kind, data):
+    """
+    Encode a message in the compact binary layout (schema version 1).
+
+    :param kind: 'heartbeat', 'detection', 'status', 'status_batch' or 'acks'
+    :param data: Message dictionary (a list of status dictionaries for 'status_batch')
+    :return: Encoded payload bytes
+    """
+    if kind == "heartbeat":
+        return struct.pack('>BBBd', PAYLOAD_MAGIC, PAYLOAD_VERSION, MSG_HEARTBEAT, data.get("timestamp", time.time()))
+    if kind == "detection" and "classes" in data:
+        return _pack_summary(data)
+    if kind == "detection":
+        return (struct.pack('>BBBd', PAYLOAD_MAGIC, PAYLOAD_VERSION, MSG_DETECTION, data.get("timestamp", time.time()))
+                + _pack_objects(data.get("objects"), data.get("confidence"))
+                + struct.pack('>I', int(data.get("capture_id") or 0)))
+    if kind == "status":
+        return struct.pack('>BBB', PAYLOAD_MAGIC, PAYLOAD_VERSION, MSG_STATUS) + _pack_status_body(data)
+    if kind == "status_batch":
+        items = list(data)[:255]
+        return (struct.pack('>BBBB', PAYLOAD_MAGIC, PAYLOAD_VERSION, MSG_STATUS_BATCH, len(items))
+                + b"".join(_pack_status_body(item) for item in items))
+    if kind == "acks":
+        return (struct.pack('>BBBddd', PAYLOAD_MAGIC, PAYLOAD_VERSION, MSG_ACK,
+                            data.get("received") or 0.0, data.get("applied") or 0.0, data.get("completed") or 0.0)
+                + _pack_str(data.get("command_id", "")) + _pack_str(data.get("action", "")) + _pack_str(data.get("result", "")))
+    raise ValueError(f"Unknown message kind: {kind}")
+
+def encode_json(kind, data):
+    """Encode a message as JSON text (the format understood by every web-app version)."""
+    if kind == "status_batch":
+        data = {"batch": list(data)}
+    return json.dumps(data).encode('utf-8')
+
+def decode_command(payload):
+    """
+    Decode a command sent to jetson/<gate>/commands, either JSON or binary.
+
+    :return: Command dictionary with 'action' and optionally 'command_id' and 'timestamp'
+    """
+    if payload and payload[0] == PAYLOAD_MAGIC:
+        magic, version, msg_type = struct.unpack_from('>BBB', payload, 0)
+        if version > PAYLOAD_VERSION or msg_type != MSG_COMMAND:
+            raise ValueError(f"Unsupported command payload (version {version}, type {msg_type})")
+        offset = 3
+        timestamp, = struct.unpack_from('>d', payload, offset)
+        offset += 8
+        fields = []
+        for _ in range(2):
+            length = payload[offset]
+            fields.append(payload[offset + 1:offset + 1 + length].decode('utf-8'))
+            offset += 1 + length
+        return {"action": fields[0], "command_id": fields[1] or None, "timestamp": timestamp}
+    return json.loads(payload.decode())
+
+def detection_reference(detection):
+    """
+    Reference to a detection without its images, safe to send over MQTT.
+    The frame itself stays on the gate and is fetched through /latest-capture with the capture_id.
+    """
+    if not detection:
+        return None
+    return {
+        "objects": detection.get("objects", []),
+        "confidence": [float(value) for value in detection.get("confidence", [])],
+        "timestamp": detection.get("timestamp", 0.0),
+        "capture_id": detection.get("capture_id")
+    }
+# --------------COMPACT PAYLOAD ENCODING END--------------
+
+class OutboundPublisher:
+    """
+    Non-blocking outbound queue for the Jetson MQTT client.
+
+    Messages are put on a bounded in-memory queue and published by a background thread, so callers on the state
+    machine never wait on the network. Status messages within `batch_interval` are sent as one batch message and
+    heartbeats are coalesced to the latest one. While the broker is unreachable, messages spill to an append-only
+    disk spool which is drained in order on reconnect.
+    """
+    def __init__(self, mqtt_client, max_queue=1000, spool_path=None, max_spool=10000, qos=None, batch_interval=1.0):
+        self.mqtt_client = mqtt_client
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.spool_path = spool_path
+        self.max_spool = max_spool
+        self.qos = dict(DEFAULT_QOS, **(qos or {}))
+        self.batch_interval = batch_interval
+
+        self.batches = {}        # {topic: [payload, ...]} for status messages
+        self.heartbeats = {}     # {topic: payload} latest heartbeat only
+        self.batch_started = None
+        self.spool_pending = self._count_spool()
+
+        self.stats = {"queued": 0, "published": 0, "batched": 0, "coalesced": 0, "spooled": 0, "drained": 0, "dropped": 0}
+        self.lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def publish(self, kind, data):
+        """
+        Queue a message for jetson/<gate>/<kind>. Never blocks; the message is dropped if the queue is full.
+
+        :return: True if the message was queued
+        """
+        topic = f"jetson/{self.mqtt_client.gate_id}/{kind}"
+        try:
+            self.queue.put_nowait((kind, topic, data))
+            self._count("queued")
+            return True
+        except queue.Full:
+            self._count("dropped")
+            return False
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["spool_pending"] = self.spool_pending
+        return stats
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def _run(self):
+        while True:
+            try:
+                kind, topic, data = self.queue.get(timeout=self.batch_interval / 2)
+                if kind == "status":
+                    self.batches.setdefault(topic, []).append(data)
+                    self.batch_started = self.batch_started or time.monotonic()
+                elif kind == "heartbeat":
+                    if topic in self.heartbeats:
+                        self._count("coalesced")
+                    self.heartbeats[topic] = data
+                    self.batch_started = self.batch_started or time.monotonic()
+                else:
+                    self._send(topic, self.mqtt_client.encode_payload(kind, data), self.qos.get(kind, 0))
+            except queue.Empty:
+                pass
+            except Exception as e:
+                logger.error(f"Outbound publisher error: {e}")
+
+            if self.batch_started and time.monotonic() - self.batch_started >= self.batch_interval:
+                self._flush_batches()
+            elif self.spool_pending and self.mqtt_client.connected:
+                self._drain_spool()
+
+    def _flush_batches(self):
+        for topic, payloads in self.batches.items():
+            if len(payloads) == 1:
+                payload = self.mqtt_client.encode_payload("status", payloads[0])
+            else:
+                payload = self.mqtt_client.encode_payload("status_batch", payloads)
+                self._count("batched", len(payloads))
+            self._send(topic, payload, self.qos["status"])
+        for topic, payload in self.heartbeats.items():
+            self._send(topic, self.mqtt_client.encode_payload("heartbeat", payload), self.qos["heartbeat"])
+        self.batches = {}
+        self.heartbeats = {}
+        self.batch_started = None
+
+    def _send(self, topic, payload, qos):
+        #Older spooled messages go out first so the broker sees everything in order
+        if self.spool_pending and self.mqtt_client.connected:
+            self._drain_spool()
+
+        if not self.spool_pending and self.mqtt_client.connected:
+            result = self.mqtt_client.client.publish(topic, payload, qos=qos)
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                self._count("published")
+                return
+        self._spool(topic, payload, qos)
+
+    def _spool(self, topic, payload, qos):
+        if not self.spool_path or self.spool_pending >= self.max_spool:
+            self._count("dropped")
+            return
+        try:
+            with open(self.spool_path, 'a') as file:
+                record = {"topic": topic, "payload": base64.b64encode(payload).decode('ascii'), "qos": qos}
+                file.write(json.dumps(record) + "\n")
+            self.spool_pending += 1
+            self._count("spooled")
+        except OSError as e:
+            logger.error(f"Could not write MQTT spool: {e}")
+            self._count("dropped")
+
+    def _drain_spool(self):
+        try:
+            with open(self.spool_path, 'r') as file:
+                lines = file.readlines()
+        except OSError:
+            self.spool_pending = 0
+            return
+
+        sent = 0
+        for line in lines:
+            if not self.mqtt_client.connected:
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                sent += 1
+                continue
+            result = self.mqtt_client.client.publish(record["topic"], base64.b64decode(record["payload"]), qos=record["qos"])
+            if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                break
+            sent += 1
+
+        #Keep whatever could not be sent, in order
+        remaining = lines[sent:]
+        try:
+            if remaining:
+                with open(self.spool_path, 'w') as file:
+                    file.writelines(remaining)
+            else:
+                os.remove(self.spool_path)
+        except OSError as e:
+            logger.error(f"Could not rewrite MQTT spool: {e}")
+        self.spool_pending = len(remaining)
+        self._count("drained", sent)
+        if sent:
+            logger.info(f"Drained {sent} spooled MQTT messages")
+
+    def _count_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return 0
+        with open(self.spool_path, 'r') as file:
+            return sum(1 for _ in file)
+
 class JetsonMQTTClient:
-    def __init__(self, broker_host="54.252.172.171", broker_port=1883, gate_id="1"):
+    """
+    Jetson side of the S10 MQTT link.
+
+    The connection is owned by a single thread which reconnects forever with jittered exponential backoff, so a
+    broker restart does not make the whole fleet reconnect at the same instant. The session is persistent
+    (clean_session=False), so the broker keeps the command subscription and queues QoS 1 commands while the gate
+    is offline.
+    """
+    def __init__(self, broker_host="54.252.172.171", broker_port=1883, gate_id="1",
+                 backoff_base=1.0, backoff_max=60.0, keepalive=60, heartbeat_interval=10):
         self.gate_id = gate_id
-        self.client = mqtt.Client(f"jetson_gate_{gate_id}")
+        self.broker_host = broker_host
+        self.broker_port = broker_port
+        self.keepalive = keepalive
+        self.client = mqtt.Client(f"jetson_gate_{gate_id}", clean_session=False)
         self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
         self.client.on_message = self.on_message
         self.connected = False
-        
+        self.running = True
+
+        # Reconnect backoff: the n-th consecutive attempt waits uniform(0, min(backoff_max, backoff_base * 2^n))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.attempt = 0
+        self.stop_event = threading.Event()
+
+        # Connection state metrics
+        self.state = "connecting"
+        self.state_lock = threading.Lock()
+        self.connection_stats = {
+            "connects": 0,
+            "disconnects": 0,
+            "connect_failures": 0,
+            "session_resumed": 0,
+            "heartbeat_restarts": 0,
+            "backoff_seconds": 0.0
+        }
+        self.created = time.monotonic()
+        self.connected_since = None
+        self.connected_time = 0.0
+        self.last_backoff = 0.0
+        self.last_error = None
+
+        # Called with (action, command_id, received) for door commands; returns False for duplicates
+        self.command_handler = None
+
+        # Payload encoding: 'json', 'binary', or 'auto' to switch to binary once the web-app advertises support for it
+        self.payload_format = os.environ.get("MQTT_PAYLOAD_FORMAT", "auto")
+        self.use_binary = self.payload_format == "binary"
+
+        # Outbound messages go through a non-blocking queue with a disk spool for broker outages
+        self.outbound = OutboundPublisher(
+            self,
+            spool_path=os.environ.get("MQTT_SPOOL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "mqtt_spool.jsonl"))
+        )
+
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_thread = None
+
         # Start connection in background thread
-        def connect():
+        self.mqtt_thread = threading.Thread(target=self._connection_loop, daemon=True)
+        self.mqtt_thread.start()
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given consecutive attempt number (1-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _connection_loop(self):
+        while self.running:
             try:
-                self.client.connect(broker_host, broker_port, 60)
-                self.client.loop_forever()
+                self._set_state("connecting")
+                self.client.connect(self.broker_host, self.broker_port, self.keepalive)
+                # Service the network until the connection drops (or the broker refuses it)
+                while self.running:
+                    if self.client.loop(timeout=1.0) != mqtt.MQTT_ERR_SUCCESS:
+                        break
             except Exception as e:
+                with self.state_lock:
+                    self.connection_stats["connect_failures"] += 1
+                    self.last_error = str(e)
                 logger.error(f"MQTT connection failed: {e}")
-        
-        mqtt_thread = threading.Thread(target=connect, daemon=True)
-        mqtt_thread.start()
-    
+
+            if not self.running:
+                break
+
+            # Connection lost or never established: wait before the next attempt so gates spread out
+            self.attempt += 1
+            delay = self.backoff_delay(self.attempt)
+            with self.state_lock:
+                self.last_backoff = delay
+                self.connection_stats["backoff_seconds"] += delay
+            self._set_state("backoff")
+            logger.info(f"Reconnecting to MQTT broker in {delay:.1f}s (attempt {self.attempt})")
+            self.stop_event.wait(delay)
+
+        self._set_state("stopped")
+
+    def _set_state(self, state):
+        with self.state_lock:
+            self.state = state
+
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
+            now = time.monotonic()
+            with self.state_lock:
+                self.state = "connected"
+                self.connection_stats["connects"] += 1
+                self.connected_since = now
+                if flags.get("session present"):
+                    self.connection_stats["session_resumed"] += 1
             self.connected = True
-            # Subscribe to per-gate command topic
-            client.subscribe(f"jetson/{self.gate_id}/commands")
-            logger.info(f"Connected to MQTT broker as gate {self.gate_id}")
+            self.attempt = 0
+            # Subscribe to per-gate command topic. QoS 1 so the persistent session queues commands while offline
+            client.subscribe(f"jetson/{self.gate_id}/commands", qos=1)
+            # Retained capabilities of the web-app, used to negotiate the payload encoding
+            client.subscribe("webapp/capabilities", qos=1)
+            logger.info(f"Connected to MQTT broker as gate {self.gate_id} (session present: {bool(flags.get('session present'))})")
             
-            # Start heartbeat
+            # Start heartbeat (restarted if its thread died)
             self.start_heartbeat()
+        else:
+            with self.state_lock:
+                self.connection_stats["connect_failures"] += 1
+                self.last_error = mqtt.connack_string(rc)
+            logger.error(f"MQTT broker refused connection: {mqtt.connack_string(rc)}")
+
+    def on_disconnect(self, client, userdata, rc):
+        with self.state_lock:
+            if self.connected_since is not None:
+                self.connected_time += time.monotonic() - self.connected_since
+                self.connected_since = None
+            if rc != 0:
+                self.connection_stats["disconnects"] += 1
+                self.last_error = mqtt.error_string(rc)
+        self.connected = False
+        logger.warning(f"Disconnected from MQTT broker (rc={rc})")
+
+    def get_connection_stats(self):
+        """Connection state, counters and the fraction of time the gate has been connected"""
+        with self.state_lock:
+            now = time.monotonic()
+            connected_time = self.connected_time + (now - self.connected_since if self.connected_since is not None else 0.0)
+            return dict(
+                self.connection_stats,
+                state=self.state,
+                attempt=self.attempt,
+                last_backoff=self.last_backoff,
+                last_error=self.last_error,
+                connected_for=now - self.connected_since if self.connected_since is not None else 0.0,
+                uptime_ratio=connected_time / max(now - self.created, 1e-9)
+            )
+
+    def stop(self):
+        """Disconnect and stop reconnecting"""
+        self.running = False
+        self.stop_event.set()
+        self.client.disconnect()
+        self.mqtt_thread.join(timeout=2)
     
     def on_message(self, client, userdata, msg):
-        if msg.topic == f"jetson/{self.gate_id}/commands":
+        if msg.topic == "webapp/capabilities":
+            try:
+                encodings = json.loads(msg.payload.decode()).get("encodings", [])
+                if self.payload_format == "auto":
+                    self.use_binary = BINARY_ENCODING in encodings
+                    logger.info(f"Payload encoding negotiated: {'binary' if self.use_binary else 'json'}")
+            except Exception as e:
+                logger.error(f"Error reading web-app capabilities: {e}")
+        elif msg.topic == f"jetson/{self.gate_id}/commands":
             try:
-                command = json.loads(msg.payload.decode())
+                received = time.time()
+                command = decode_command(msg.payload)
                 action = command.get("action")
+                command_id = command.get("command_id")
                 if action in ["OPEN_DOOR", "CLOSE_DOOR"]:
-                    # Import here to avoid circular imports
-                    from main.door_control import DoorControl
-                    door = DoorControl()
-                    if action == "OPEN_DOOR":
-                        door.open_door()
-                    elif action == "CLOSE_DOOR":
-                        door.close_door()
+                    # The door is only driven by the main loop; hand the command to its queue
+                    if not self.command_handler:
+                        logger.warning(f"No command handler registered, dropping {action}")
+                        self.publish_ack(command_id, action, "rejected", received)
+                    elif not self.command_handler(action, command_id, received):
+                        self.publish_ack(command_id, action, "duplicate", received)
                 # Note: Stream commands (start_stream, stop_stream) are handled via reverse tunnel HTTP
             except Exception as e:
                 logger.error(f"Error handling command: {e}")
     
-    def publish_detection(self, objects):
-        if self.connected:
-            data = {"objects": objects, "timestamp": time.time()}
-            self.client.publish(f"jetson/{self.gate_id}/detection", json.dumps(data))
+    def encode_payload(self, kind, data):
+        """Encode an outbound message in the negotiated format"""
+        if self.use_binary:
+            return encode_binary(kind, data)
+        return encode_json(kind, data)
+
+    def publish_detection(self, objects, confidence=None, capture_id=None):
+        data = {"objects": objects, "timestamp": time.time()}
+        if confidence is not None:
+            data["confidence"] = [float(value) for value in confidence]
+        if capture_id is not None:
+            data["capture_id"] = capture_id
+        self.outbound.publish("detection", data)
+    
+    def publish_detection_summary(self, summary):
+        """Publish an aggregated detection window (see detection_aggregator.py) on the detection topic"""
+        self.outbound.publish("detection", summary)
     
     def publish_status(self, status):
-        if self.connected:
+        # Status dictionaries are sent flat, with the detection context reduced to a reference (no images)
+        if isinstance(status, dict):
+            data = {
+                "status": status.get("status", "unknown"),
+                "timestamp": status.get("timestamp", time.time()),
+                "detection_context": detection_reference(status.get("detection_context"))
+            }
+        else:
             data = {"status": status, "timestamp": time.time()}
-            self.client.publish(f"jetson/{self.gate_id}/status", json.dumps(data))
+        self.outbound.publish("status", data)
+
+    def set_command_handler(self, handler):
+        """Register the function that queues door commands for the main loop"""
+        self.command_handler = handler
+
+    def publish_ack(self, command_id, action, result, received, applied=None, completed=None):
+        """Acknowledge a command on jetson/<gate>/acks with its receive, apply and complete timestamps"""
+        if not command_id:
+            return
+        data = {
+            "command_id": command_id,
+            "action": action,
+            "result": result,
+            "received": received,
+            "applied": applied,
+            "completed": completed
+        }
+        self.outbound.publish("acks", data)
+
+    def get_publish_stats(self):
+        """Counters for queued, published, batched, spooled and dropped messages"""
+        return self.outbound.get_stats()
     
     def start_heartbeat(self):
-        """Start heartbeat thread to send periodic status updates"""
+        """Start the heartbeat thread, or restart it if it died. Heartbeats are only sent while connected"""
+        if self.heartbeat_thread and self.heartbeat_thread.is_alive():
+            return
+        if self.heartbeat_thread:
+            with self.state_lock:
+                self.connection_stats["heartbeat_restarts"] += 1
+            logger.warning("Heartbeat thread had stopped, restarting it")
+
         def heartbeat():
-            while self.connected:
-                try:
+            while self.running:
+                if self.connected:
                     heartbeat_data = {"gate_id": self.gate_id, "timestamp": time.time()}
-                    self.client.publish(f"jetson/{self.gate_id}/heartbeat", json.dumps(heartbeat_data))
-                    time.sleep(10)  # Send heartbeat every 10 seconds
-                except Exception as e:
-                    logger.error(f"Heartbeat error: {e}")
-                    break
+                    self.outbound.publish("heartbeat", heartbeat_data)
+                self.stop_event.wait(self.heartbeat_interval)
         
-        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
-        heartbeat_thread.start()
+        self.heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        self.heartbeat_thread.start()
 
 # Global instance - Gate ID should be configured per deployment
-# For now, default to gate 1, but this should be configurable
-import os
-gate_id = os.environ.get("GATE_ID", "1")
-mqtt_client = JetsonMQTTClient(gate_id=gate_id)
+# Created by the first get_mqtt_client() call (live_detection.main), so importing this module for its encoders,
+# the benchmark or the tests never connects to the broker
+mqtt_client = None
+
+def get_mqtt_client():
+    """Get the gate's MQTT client, connecting as GATE_ID (default 1) to MQTT_BROKER_HOST on the first call"""
+    global mqtt_client
+    if mqtt_client is None:
+        mqtt_client = JetsonMQTTClient(
+            broker_host=os.environ.get("MQTT_BROKER_HOST", "54.252.172.171"),
+            broker_port=int(os.environ.get("MQTT_BROKER_PORT", "1883")),
+            gate_id=os.environ.get("GATE_ID", "1"),
+            backoff_base=float(os.environ.get("MQTT_BACKOFF_BASE", "1.0")),
+            backoff_max=float(os.environ.get("MQTT_BACKOFF_MAX", "60.0"))
+        )
+    return mqtt_client
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import socket
+import subprocess
+
+# Helpers shared by the benchmarks and load tests in this directory: the percentile they report and starting the
+# web app under uvicorn on a free port.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_APP = os.path.join(HERE, '..', '..', 'web-app')
+# Appended, so the gate's modules never shadow the web app's
+sys.path.append(os.path.join(HERE, '..', 'main'))
+
+import httpx
+
+# The same percentile as the gate's pipeline statistics, so numbers from both sides compare
+from perf_stats import percentile
+
+STARTUP_TIMEOUT = 30.0
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_app(workers, port, env=None, log_path=None, ready=None, settle=1.0):
+    """
+    Start `uvicorn app:app --workers N` on 127.0.0.1:port and wait until /health answers.
+
+    :param env: Extra environment variables for the app
+    :param log_path: File the app's output goes to, otherwise its stdout is discarded and stderr is left on the console
+    :param ready: Optional function that must also return True before the app counts as started
+    :param settle: Seconds to wait once it has started, for the other workers to finish starting
+    :return: The uvicorn process, to pass to `stop_app`
+    """
+    command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    app_env = dict(os.environ, **(env or {}))
+    if log_path:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(command, cwd=WEB_APP, env=app_env, stdout=log, stderr=subprocess.STDOUT)
+    else:
+        process = subprocess.Popen(command, cwd=WEB_APP, env=app_env, stdout=subprocess.DEVNULL)
+
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0).status_code == 200 and (ready is None or ready()):
+                time.sleep(settle)
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    stop_app(process)
+    raise RuntimeError(f"the app did not start with {workers} workers" + (f", see {log_path}" if log_path else ""))
+
+def stop_app(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import sys
+import time
+import asyncio
+
+import httpx
+
+from bench_helpers import percentile
+
+# Load test of the database-backed web-app endpoints, showing request latency as concurrency grows
+#
+# Usage: python3 db_load_test.py [base url] [requests per level]
+#
+# The web-app must be running (e.g. docker compose up). After every concurrency level the connection pool
+# statistics from /db/pool-stats are printed, so pool waits can be told apart from query time.
+
+ENDPOINTS = ["/alerts/api", "/health", "/check-permission?username=Dummy&perm_name=view"]
+CONCURRENCY = [1, 10, 50, 100]
+
+async def run_level(client, concurrency, total):
+    latencies = []
+    errors = 0
+    next_request = 0
+
+    async def worker():
+        nonlocal next_request, errors
+        while next_request < total:
+            path = ENDPOINTS[next_request % len(ENDPOINTS)]
+            next_request += 1
+            t0 = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    return latencies, errors, elapsed
+
+async def main(base_url, total):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        print(f"{'concurrency':>12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'pool size':>11}{'waiting':>9}{'mean wait ms':>14}")
+        for concurrency in CONCURRENCY:
+            latencies, errors, elapsed = await run_level(client, concurrency, total)
+            pool = (await client.get("/db/pool-stats")).json().get("async", {})
+            print(f"{concurrency:>12}{len(latencies) / elapsed:>10.0f}"
+                  f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 95) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}"
+                  f"{errors:>8}{pool.get('pool_size', 0):>11}{pool.get('requests_waiting', 0):>9}{pool.get('mean_wait_ms', 0.0):>14.2f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        print("[*] Usage: python3 db_load_test.py [base url] [requests per level]")
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000",
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 1000))
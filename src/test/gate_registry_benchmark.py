@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import random
+import asyncio
+import threading
+import multiprocessing
+
+# /gates/api with fleets of thousands of gates while gate states keep changing: latency of first pages, cursor pages,
+# filtered pages and conditional requests, and a check that paging returns every gate once, in order
+#
+# Usage: python3 gate_registry_benchmark.py [requests] [fleet sizes...]
+#
+# The web app's router runs in-process on a free port and its gate registry is filled directly, the way the
+# notification listener fills it. A writer thread applies UPDATE_RATE gate_state updates per second meanwhile, like
+# the listener thread. No database or MQTT broker is needed.
+#
+# The load comes from a client process. Latencies are measured twice: by the client, and inside the server from the
+# request arriving to the response being sent. The target applies to the server's; on a small machine the client's
+# also include waiting for the CPU the client and the server share.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'web-app'))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from controllers.gate_registry import gate_registry, gate_sort_key, index_keys
+from controllers.main_controller import root_router
+
+from bench_helpers import percentile
+
+UPDATE_RATE = 200        # gate_state updates per second during the run
+# One request at a time: the client shares the machine with the server, more at once only measures their queueing
+# on a small one
+CONCURRENCY = 1
+P99_TARGET_MS = 5.0
+GATE_STATUSES = ["open", "closed", "unknown"]
+
+def fleet(size):
+    """
+    Numeric ids for the first half, named ones for the rest, to cover both orders. The last two numeric ids are
+    zero-padded copies of the first ('01', '001'), which paging must return as they are
+    """
+    numeric = size // 2
+    rows = []
+    for i in range(size):
+        if i < numeric - 2:
+            gate_id = str(i + 1)
+        elif i < numeric:
+            gate_id = "0" * (i - numeric + 3) + "1"
+        else:
+            gate_id = f"gate-{i:05d}"
+        rows.append((gate_id, random.choice(["online", "offline"]), random.choice(GATE_STATUSES), time.time(), None))
+    return rows
+
+def writer(gate_ids, stop):
+    while not stop.is_set():
+        gate_registry.update(random.choice(gate_ids), {
+            "status": random.choice(["online", "offline"]),
+            "gate_status": random.choice(GATE_STATUSES),
+            "last_seen": time.time()
+        })
+        time.sleep(1.0 / UPDATE_RATE)
+
+class ServerTimer:
+    """ASGI wrapper recording how long the app takes per request, by the kind the client puts in X-Bench-Kind"""
+    def __init__(self, app):
+        self.app = app
+        self.samples = {}
+
+    async def __call__(self, scope, receive, send):
+        started = time.perf_counter()
+        await self.app(scope, receive, send)
+        if scope["type"] == "http":
+            kind = dict(scope["headers"]).get(b"x-bench-kind", b"").decode()
+            self.samples.setdefault(kind, []).append(time.perf_counter() - started)
+
+def start_server():
+    app = FastAPI()
+    app.include_router(root_router)
+    timer = ServerTimer(app)
+    server = uvicorn.Server(uvicorn.Config(timer, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, server.servers[0].sockets[0].getsockname()[1], timer
+
+async def check_paging(client, size):
+    """Walk every page while nothing changes: each gate once, in gate order, and filters matching the records"""
+    seen, after = [], None
+    while True:
+        data = (await client.get("/gates/api", params={"after": after} if after else None)).json()
+        seen.extend(gate["id"] for gate in data["gates"])
+        after = data["next"]
+        if after is None:
+            break
+    if len(seen) != size or set(seen) != set(gate_registry.snapshot().gates) or seen != sorted(seen, key=gate_sort_key):
+        print(f"[-] Paging returned {len(seen)} gates ({len(set(seen))} distinct) out of {size}, or out of order")
+        return False
+
+    snapshot = gate_registry.snapshot()
+    expected = sum(1 for record in snapshot.gates.values() if record["gate_status"] == "open" and record["status"] == "online")
+    data = (await client.get("/gates/api", params={"status": "open", "online_status": "online", "limit": 1000})).json()
+    if data["total"] != expected or any(gate["status"] != "open" or gate["online_status"] != "online" for gate in data["gates"]):
+        print(f"[-] Filter returned {data['total']} gates, expected {expected}")
+        return False
+
+    response = await client.get("/gates/api", headers={"If-None-Match": response_etag(await client.get("/gates/api"))})
+    if response.status_code != 304:
+        print(f"[-] Unchanged registry answered {response.status_code} to a conditional request")
+        return False
+    return True
+
+def check_indexes():
+    """The indexes kept up to date one update at a time match indexes built from scratch"""
+    snapshot = gate_registry.snapshot()
+    expected = {(None, None): []}
+    for gate_id in sorted(snapshot.gates, key=gate_sort_key):
+        expected[(None, None)].append(gate_sort_key(gate_id))
+        for index in index_keys(snapshot.gates[gate_id]):
+            expected.setdefault(index, []).append(gate_sort_key(gate_id))
+    stale = [index for index, keys in snapshot.indexes.items() if tuple(expected.get(index, ())) != tuple(keys)]
+    if stale or set(expected) - set(snapshot.indexes):
+        print(f"[-] Indexes out of date after the updates: {stale}")
+        return False
+    return True
+
+def response_etag(response):
+    return response.headers["etag"]
+
+async def load(client, requests, gate_ids):
+    latencies = {"first page": [], "cursor page": [], "filtered": [], "conditional": []}
+    etag = response_etag(await client.get("/gates/api"))
+    not_modified = 0
+
+    async def worker(count):
+        nonlocal etag, not_modified
+        for i in range(count):
+            kind = list(latencies)[i % len(latencies)]
+            params, headers = None, {"X-Bench-Kind": kind}
+            if kind == "cursor page":
+                params = {"after": random.choice(gate_ids)}
+            elif kind == "filtered":
+                params = {"status": random.choice(GATE_STATUSES), "online_status": "online"}
+            elif kind == "conditional":
+                headers["If-None-Match"] = etag
+            started = time.perf_counter()
+            response = await client.get("/gates/api", params=params, headers=headers)
+            latencies[kind].append(time.perf_counter() - started)
+            if response.status_code == 304:
+                not_modified += 1
+            elif kind == "conditional":
+                etag = response_etag(response)
+
+    await asyncio.gather(*(worker(requests // CONCURRENCY) for _ in range(CONCURRENCY)))
+    return latencies, not_modified
+
+async def client_load(port, requests, gate_ids):
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=10.0) as client:
+        return await load(client, requests, gate_ids)
+
+def client_process(port, requests, gate_ids, results):
+    results.put(asyncio.run(client_load(port, requests, gate_ids)))
+
+async def run(port, requests, size):
+    rows = fleet(size)
+    gate_registry.load(rows)
+    gate_ids = [row[0] for row in rows]
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=10.0) as client:
+        ok = await check_paging(client, size)
+
+        # Page sizes as the pages request them, while the writer keeps changing gates
+        stop = threading.Event()
+        thread = threading.Thread(target=writer, args=(gate_ids, stop), daemon=True)
+        version = gate_registry.version
+        thread.start()
+        started = time.perf_counter()
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=client_process, args=(port, requests, gate_ids, results))
+        process.start()
+        latencies, not_modified = await asyncio.get_running_loop().run_in_executor(None, results.get)
+        process.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        thread.join()
+        updates = gate_registry.version - version
+        ok = check_indexes() and ok
+    return ok, latencies, not_modified, updates, elapsed
+
+def main(requests, sizes):
+    server, thread, port, timer = start_server()
+    ok = True
+    try:
+        print(f"[*] {requests} requests per fleet, {CONCURRENCY} at a time, {UPDATE_RATE} gate updates/s meanwhile")
+        print(f"{'':>22}{'client':>27}{'server':>27}")
+        print(f"{'gates':>8}{'request':>14}" + f"{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}" * 2)
+        for size in sizes:
+            timer.samples.clear()
+            paging_ok, latencies, not_modified, updates, elapsed = asyncio.run(run(port, requests, size))
+            ok = ok and paging_ok
+            for kind, samples in latencies.items():
+                served = timer.samples.get(kind, [])
+                p99 = percentile(served, 99) * 1000.0
+                print(f"{size:>8}{kind:>14}"
+                      f"{percentile(samples, 50) * 1000.0:>9.2f}{percentile(samples, 99) * 1000.0:>9.2f}{max(samples) * 1000.0:>9.2f}"
+                      f"{percentile(served, 50) * 1000.0:>9.2f}{p99:>9.2f}{max(served, default=0) * 1000.0:>9.2f}")
+                if p99 > P99_TARGET_MS:
+                    print(f"[-] p99 of {kind} over {P99_TARGET_MS} ms with {size} gates")
+                    ok = False
+            print(f"[*] {updates} updates in {elapsed:.1f}s, {not_modified} conditional requests answered 304")
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    if ok:
+        print(f"[+] Paging, filters and indexes are consistent and every p99 is under {P99_TARGET_MS} ms")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print("[*] Usage: python3 gate_registry_benchmark.py [requests] [fleet sizes...]")
+        sys.exit(1)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4000,
+         [int(arg) for arg in sys.argv[2:]] or [1000, 5000, 10000])
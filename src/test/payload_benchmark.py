@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import json
+import base64
+
+# Compare the size and encode/decode time of the JSON and compact binary MQTT payloads
+#
+# Usage: python3 payload_benchmark.py [iterations]
+#
+# Runs locally; the Jetson client is pointed at localhost so nothing is sent to the real broker.
+
+os.environ.setdefault("MQTT_BROKER_HOST", "127.0.0.1")
+os.environ.setdefault("MQTT_SPOOL_PATH", "")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'web-app'))
+
+import mqtt_jetson_client as jetson
+from mqtt import mqtt_client as webapp
+
+def sample_messages():
+    now = time.time()
+    context = {"objects": ["kangaroo", "possum"], "confidence": [0.91, 0.64], "timestamp": now, "capture_id": 1234}
+    status = {"status": "door_closing", "timestamp": now, "detection_context": context}
+    # What publish_status used to send: the whole detection, base64 image included (~60 KB JPEG)
+    legacy_context = dict(context, image_base64=base64.b64encode(os.urandom(60000)).decode('ascii'))
+    return [
+        ("heartbeat", "heartbeat", {"gate_id": "1", "timestamp": now}),
+        ("detection", "detection", {"objects": ["kangaroo", "possum", "fox"], "confidence": [0.91, 0.64, 0.55], "timestamp": now, "capture_id": 1234}),
+        ("status", "status", status),
+        ("status_batch x5", "status_batch", [status] * 5),
+        ("legacy status (image)", None, {"status": {"status": "door_closing", "timestamp": now, "detection_context": legacy_context}, "timestamp": now}),
+    ]
+
+def time_call(func, iterations):
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - t0) / iterations * 1e6
+
+def main(iterations):
+    print(f"{'message':<24}{'json B':>10}{'binary B':>10}{'ratio':>8}{'json enc us':>13}{'bin enc us':>12}{'json dec us':>13}{'bin dec us':>12}")
+    for name, kind, data in sample_messages():
+        if kind is None:
+            json_payload = json.dumps(data).encode('utf-8')
+            json_enc = time_call(lambda: json.dumps(data).encode('utf-8'), iterations)
+            json_dec = time_call(lambda: webapp.decode_payload(json_payload), iterations)
+            print(f"{name:<24}{len(json_payload):>10}{'-':>10}{'-':>8}{json_enc:>13.1f}{'-':>12}{json_dec:>13.1f}{'-':>12}")
+            continue
+
+        json_payload = jetson.encode_json(kind, data)
+        binary_payload = jetson.encode_binary(kind, data)
+        json_enc = time_call(lambda: jetson.encode_json(kind, data), iterations)
+        bin_enc  = time_call(lambda: jetson.encode_binary(kind, data), iterations)
+        json_dec = time_call(lambda: webapp.decode_payload(json_payload), iterations)
+        bin_dec  = time_call(lambda: webapp.decode_payload(binary_payload), iterations)
+        ratio = len(json_payload) / len(binary_payload)
+        print(f"{name:<24}{len(json_payload):>10}{len(binary_payload):>10}{ratio:>8.1f}{json_enc:>13.1f}{bin_enc:>12.1f}{json_dec:>13.1f}{bin_dec:>12.1f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("[*] Usage: python3 payload_benchmark.py [iterations]")
+        sys.exit(1)
+    main(int(sys.argv[1]) if len(sys.argv) == 2 else 10000)
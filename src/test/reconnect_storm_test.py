@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import socket
+import struct
+import threading
+
+# Restart a local broker stand-in under a fleet of JetsonMQTTClients and measure how their reconnects spread out
+#
+# Usage: python3 reconnect_storm_test.py [gates] [downtime]
+#
+# The stand-in speaks just enough MQTT 3.1.1 (CONNECT, SUBSCRIBE, PUBLISH, PINGREQ, DISCONNECT) for the Jetson
+# client, and records the time of every CONNECT it accepts. The run is done twice, with and without jitter.
+
+HOST = "127.0.0.1"
+PORT = 18830
+BACKOFF_BASE = 0.25
+BACKOFF_MAX  = 4.0
+WINDOW = 0.1  # seconds, window used to count the peak reconnect rate
+
+os.environ.setdefault("MQTT_BROKER_HOST", HOST)
+os.environ.setdefault("MQTT_BROKER_PORT", str(PORT))
+os.environ.setdefault("MQTT_SPOOL_PATH", "")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import mqtt_jetson_client as jetson
+
+class BrokerStandIn:
+    """Minimal single-process MQTT broker that can be stopped and started on the same port"""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.sessions = set()  # client ids with a persistent session
+        self.connects = []     # (time, client_id, session_present)
+        self.lock = threading.Lock()
+        self.server = None
+        self.clients = []
+
+    def start(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen(1024)
+        threading.Thread(target=self._accept, args=(self.server,), daemon=True).start()
+
+    def stop(self):
+        #Shutdown wakes the thread blocked in accept() so the port is really released
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def _accept(self, server):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.clients.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _read_exact(self, conn, length):
+        data = b""
+        while len(data) < length:
+            chunk = conn.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("closed")
+            data += chunk
+        return data
+
+    def _read_packet(self, conn):
+        header = self._read_exact(conn, 1)[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = self._read_exact(conn, 1)[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        return header, self._read_exact(conn, length) if length else b""
+
+    def _serve(self, conn):
+        try:
+            while True:
+                header, body = self._read_packet(conn)
+                packet_type = header >> 4
+                if packet_type == 1:  # CONNECT
+                    name_length = struct.unpack('>H', body[0:2])[0]
+                    flags = body[2 + name_length + 1]
+                    id_offset = 2 + name_length + 4
+                    id_length = struct.unpack('>H', body[id_offset:id_offset + 2])[0]
+                    client_id = body[id_offset + 2:id_offset + 2 + id_length].decode()
+                    clean = bool(flags & 0x02)
+                    with self.lock:
+                        present = not clean and client_id in self.sessions
+                        if clean:
+                            self.sessions.discard(client_id)
+                        else:
+                            self.sessions.add(client_id)
+                        self.connects.append((time.monotonic(), client_id, present))
+                    conn.sendall(bytes([0x20, 2, 1 if present else 0, 0]))
+                elif packet_type == 8:  # SUBSCRIBE
+                    packet_id = body[0:2]
+                    count = 0
+                    offset = 2
+                    while offset < len(body):
+                        topic_length = struct.unpack('>H', body[offset:offset + 2])[0]
+                        offset += 2 + topic_length + 1
+                        count += 1
+                    conn.sendall(bytes([0x90, 2 + count]) + packet_id + bytes([1] * count))
+                elif packet_type == 3:  # PUBLISH
+                    qos = (header >> 1) & 0x03
+                    if qos:
+                        topic_length = struct.unpack('>H', body[0:2])[0]
+                        packet_id = body[2 + topic_length:4 + topic_length]
+                        conn.sendall(bytes([0x40, 2]) + packet_id)
+                elif packet_type == 12:  # PINGREQ
+                    conn.sendall(bytes([0xD0, 0]))
+                elif packet_type == 14:  # DISCONNECT
+                    break
+        except (ConnectionError, OSError, IndexError, struct.error):
+            pass
+        finally:
+            conn.close()
+
+def run(gates, downtime, jitter):
+    broker = BrokerStandIn(HOST, PORT)
+    broker.start()
+
+    clients = []
+    for index in range(gates):
+        client = jetson.JetsonMQTTClient(HOST, PORT, gate_id=f"storm{index}", backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX)
+        if not jitter:
+            client.backoff_delay = lambda attempt, client=client: min(client.backoff_max, client.backoff_base * (2 ** attempt))
+        clients.append(client)
+
+    deadline = time.monotonic() + 10
+    while not all(client.connected for client in clients) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    # Broker restart
+    broker.stop()
+    restarted = time.monotonic() + downtime
+    time.sleep(downtime)
+    broker.start()
+
+    deadline = time.monotonic() + BACKOFF_MAX * 3
+    while not all(client.connected for client in clients) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    reconnects = [(at, present) for at, client_id, present in broker.connects if at >= restarted and client_id.startswith("jetson_gate_storm")]
+    stats = [client.get_connection_stats() for client in clients]
+    for client in clients:
+        client.stop()
+    broker.stop()
+
+    times = sorted(at for at, _ in reconnects)
+    peak = max((sum(1 for other in times if start <= other < start + WINDOW) for start in times), default=0)
+    return {
+        "reconnected": sum(1 for s in stats if s["state"] == "connected"),
+        "spread_s": times[-1] - times[0] if times else 0.0,
+        "first_after_restart_s": times[0] - restarted if times else 0.0,
+        "peak_per_window": peak,
+        "sessions_resumed": sum(1 for _, present in reconnects if present),
+        "connect_failures": sum(s["connect_failures"] for s in stats)
+    }
+
+def main(gates, downtime):
+    print(f"[*] {gates} gates, broker down for {downtime}s, backoff base {BACKOFF_BASE}s max {BACKOFF_MAX}s")
+    for jitter in (False, True):
+        result = run(gates, downtime, jitter)
+        print(f"[+] {'jittered' if jitter else 'no jitter'}: {result['reconnected']}/{gates} reconnected, "
+              f"spread {result['spread_s']:.2f}s, first {result['first_after_restart_s']:.2f}s after restart, "
+              f"peak {result['peak_per_window']} connects per {int(WINDOW * 1000)} ms, "
+              f"{result['sessions_resumed']} sessions resumed, {result['connect_failures']} failed attempts")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        print("[*] Usage: python3 reconnect_storm_test.py [gates] [downtime]")
+        sys.exit(1)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 2.0)
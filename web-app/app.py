@@ -3,24 +3,74 @@ from fastapi.staticfiles import StaticFiles
 from controllers.main_controller import root_router
 from starlette.middleware.sessions import SessionMiddleware
 from contextlib import asynccontextmanager
+import os
 import asyncio
-import threading
+
+# Number of uvicorn worker processes. With more than one, auto-reload is off (uvicorn does not combine them)
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+
+# How often the detected_animals partitions are created ahead and expired, in seconds
+DETECTION_MAINTENANCE_INTERVAL = 3600
+
+async def detection_maintenance_loop():
+    from controllers.db_controller import run_detection_maintenance_async
+    while True:
+        result = await run_detection_maintenance_async()
+        if result and any(result):
+            print(f"[INFO] Detection partitions created: {result[0]}, dropped: {result[1]}")
+        await asyncio.sleep(DETECTION_MAINTENANCE_INTERVAL)
 
 @asynccontextmanager
 async def lifespan(app):
+    from controllers.db_controller import open_pools, close_pools
+    maintenance_task = None
     try:
-        # Start MQTT client in background thread
-        from mqtt.mqtt_client import get_mqtt_client
-        mqtt_client = get_mqtt_client()
-        
-        # Start MQTT connection in background thread
-        mqtt_thread = threading.Thread(target=mqtt_client.start_mqtt, daemon=True)
-        mqtt_thread.start()
+        # Open the database connection pools once for the whole app
+        await open_pools()
+
+        # Keep monthly partitions ready ahead of time and drop the expired ones
+        maintenance_task = asyncio.create_task(detection_maintenance_loop())
+
+        # Users page data is cached and reloaded when the database says it changed
+        from controllers.main_controller import user_overview_cache, handle_live_event, handle_gate_command
+        from controllers.db_notifications import get_notification_listener
+        from controllers.db_controller import LIVE_EVENTS_CHANNEL, GATE_COMMANDS_CHANNEL
+        listener = get_notification_listener()
+        user_overview_cache.attach(asyncio.get_running_loop())
+        listener.subscribe("user_overview_changed", user_overview_cache.invalidate)
+
+        # MQTT events reach every worker's dashboards through live_events, pushed from the listener thread
+        # through this event loop. Commands received by any worker are published by the ingestor.
+        from controllers.live_broadcast import live_broadcaster
+        live_broadcaster.attach(asyncio.get_running_loop())
+        listener.subscribe(LIVE_EVENTS_CHANNEL, handle_live_event)
+        listener.subscribe(GATE_COMMANDS_CHANNEL, handle_gate_command)
+
+        # /latest-capture fetches from the gates on this event loop, invalidated by the capture events
+        from controllers.gate_http import gate_fetcher
+        gate_fetcher.attach(asyncio.get_running_loop())
+
+        # Only the elected worker runs the MQTT client, however many workers there are
+        from controllers.shared_state import ingestor_election
+        ingestor_election.start()
         
         yield
     except asyncio.CancelledError:
         # Prevent ugly traceback on Ctrl+C
         pass
+    finally:
+        if maintenance_task:
+            maintenance_task.cancel()
+        # Releases the ingestor lock, another worker takes over
+        from controllers.shared_state import ingestor_election
+        ingestor_election.stop()
+        from controllers.db_notifications import get_notification_listener
+        get_notification_listener().stop()
+        from controllers.gate_http import gate_fetcher
+        from controllers.stream_relay import stream_relay
+        await gate_fetcher.close()
+        await stream_relay.close()
+        await close_pools()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -35,4 +85,7 @@ app.include_router(root_router)
 if __name__ == "__main__":
     # Running the uvicorn as a webserver
     import uvicorn
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True, reload_dirs=["wwwroot"])
+    if WEB_WORKERS > 1:
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=WEB_WORKERS)
+    else:
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True, reload_dirs=["wwwroot"])
@@ -1,388 +1,781 @@
 import os
+import json
 import psycopg
+from datetime import datetime
+from contextlib import asynccontextmanager
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Connect to the database
+# -------------------
+# Connection Pools
+# -------------------
+# Connections are opened once and shared. The sync pool serves the MQTT and ingestion threads, the async pool
+# serves the FastAPI request handlers so they never block the event loop.
+# Pooled connections commit when they are handed back (or roll back on an exception).
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT  = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+pool = ConnectionPool(
+    DATABASE_URL or "",
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    open=False,
+    name="smartgate-sync"
+)
+async_pool = AsyncConnectionPool(
+    DATABASE_URL or "",
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    open=False,
+    name="smartgate-async"
+)
+
+async def open_pools():
+    pool.open()
+    await async_pool.open()
+
+async def close_pools():
+    await async_pool.close()
+    pool.close()
+
+# Borrow a connection from the pool, use as 'with get_db_connection() as conn:'
 def get_db_connection():
-    conn = psycopg.connect(DATABASE_URL)
-    return conn
+    pool.open()  # no-op once open, lets scripts and the MQTT thread use the pool without the app lifespan
+    return pool.connection()
+
+# Async version, use as 'async with get_async_db_connection() as conn:'
+@asynccontextmanager
+async def get_async_db_connection():
+    await async_pool.open()
+    async with async_pool.connection() as conn:
+        yield conn
+
+def _pool_report(db_pool):
+    stats = db_pool.get_stats()
+    requests = stats.get("requests_num", 0)
+    stats["mean_wait_ms"] = stats.get("requests_wait_ms", 0) / requests if requests else 0.0
+    stats["mean_usage_ms"] = stats.get("usage_ms", 0) / requests if requests else 0.0
+    stats["closed"] = db_pool.closed
+    return stats
+
+# Pool size, waiting clients and cumulative wait/usage times of both pools
+def get_pool_stats():
+    return {
+        "sync": _pool_report(pool),
+        "async": _pool_report(async_pool)
+    }
 
 # Function to check database connection
 def check_db_connection():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1;")
-        result = cursor.fetchone()
-        if result[0] == 1:
-            print("Database connection is successful!")
-            return True
+        with get_db_connection() as conn:
+            cursor = conn.execute("SELECT 1;")
+            result = cursor.fetchone()
+            if result[0] == 1:
+                print("Database connection is successful!")
+                return True
     except Exception as e:
         print(f"Database connection failed: {e}")
         return False
-    finally:
-        cursor.close()
-        conn.close()
 
 def insert_user(user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
 
-        # Check if the user already exists based on user_id or username
-        cursor.execute("""
-            SELECT COUNT(*) FROM users WHERE user_id = %s OR username = %s;
-        """, (user['id'], user['login']))
+            # Check if the user already exists based on user_id or username
+            cursor.execute("""
+                SELECT COUNT(*) FROM users WHERE user_id = %s OR username = %s;
+            """, (user['id'], user['login']))
 
-        result = cursor.fetchone()
+            result = cursor.fetchone()
 
-        # If the count is 0, the user doesn't exist, so insert the user
-        if result[0] == 0:
-            cursor.execute("""
-                INSERT INTO users (user_id, username, role_id) 
-                VALUES (%s, %s, %s);
-            """, (user['id'], user['login'], user['role_id']))
+            # If the count is 0, the user doesn't exist, so insert the user
+            if result[0] == 0:
+                cursor.execute("""
+                    INSERT INTO users (user_id, username, role_id)
+                    VALUES (%s, %s, %s);
+                """, (user['id'], user['login'], user['role_id']))
+
+                conn.commit()
+                print("User Inserted Successfully!")
+            else:
+                print("User already exists. Skipping insert.")
 
-            conn.commit()
-            print("User Inserted Successfully!")
-        else:
-            print("User already exists. Skipping insert.")
-    
     except Exception as e:
         print(f"Error inserting user: {e}")
-    finally:
-        # Close the connection
-        cursor.close()
-        conn.close()
 
 def check_permission(username: str, perm_name: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT 1 
-            FROM user_perms 
-            WHERE username = %s 
-            AND permissions @> %s::jsonb 
-            LIMIT 1;
-        """, (username, f'["{perm_name}"]'))
-
-        # Fetch the result
-        result = cursor.fetchone()
-
-        # Check if the user has the permission
-        return result is not None
+        with get_db_connection() as conn:
+            cursor = conn.execute("""
+                SELECT 1
+                FROM user_perms
+                WHERE username = %s
+                AND permissions @> %s::jsonb
+                LIMIT 1;
+            """, (username, f'["{perm_name}"]'))
+
+            # Check if the user has the permission
+            return cursor.fetchone() is not None
 
     except Exception as e:
         print(f"Error checking permission: {e}")
         return False
-    finally:
-        # Close the connection
-        cursor.close()
-        conn.close()
 
 def change_role(username: str, role_name: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
 
-        # Fetch the role_id for the given role_name
-        cursor.execute("""
-            select role_id from roles where role_name = %s;
-        """, (role_name,))
-        role_id = cursor.fetchone()
+            # Fetch the role_id for the given role_name
+            cursor.execute("""
+                select role_id from roles where role_name = %s;
+            """, (role_name,))
+            role_id = cursor.fetchone()
 
-        if not role_id:
-            print(f"Error: Role '{role_name}' not found.")
-            return
+            if not role_id:
+                print(f"Error: Role '{role_name}' not found.")
+                return
 
-        role_id = role_id[0]  # Get the first column value which is the role_id
+            role_id = role_id[0]  # Get the first column value which is the role_id
 
-        # Update the user's role with the fetched role_id
-        cursor.execute("""
-            UPDATE users SET role_id = %s WHERE username = %s;
-        """, (role_id, username,))
+            # Update the user's role with the fetched role_id
+            cursor.execute("""
+                UPDATE users SET role_id = %s WHERE username = %s;
+            """, (role_id, username,))
 
-        conn.commit()
-        print(f"Role updated successfully for {username}!")
+            conn.commit()
+            print(f"Role updated successfully for {username}!")
 
     except Exception as e:
         print(f"Error changing role: {e}")
-    finally:
-        # Close the connection
-        cursor.close()
-        conn.close()
 
 def remove_permission(username: str, perm_name: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            UPDATE user_perms
-            SET permissions = permissions - %s
-            WHERE username = %s;
-        """, (perm_name, username))
+        with get_db_connection() as conn:
+            conn.execute("""
+                UPDATE user_perms
+                SET permissions = permissions - %s
+                WHERE username = %s;
+            """, (perm_name, username))
 
-        conn.commit()
-        print(f"Successfully removed '{perm_name}' from '{username}'.")
+            conn.commit()
+            print(f"Successfully removed '{perm_name}' from '{username}'.")
 
     except Exception as e:
         print(f"Error removing permission: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
 def add_permission(username: str, perm_name: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with get_db_connection() as conn:
+            conn.execute("""
+                UPDATE user_perms
+                SET permissions = permissions || %s::jsonb
+                WHERE username = %s;
+            """, (f'["{perm_name}"]', username))
 
-        cursor.execute("""
-            UPDATE user_perms
-            SET permissions = permissions || %s::jsonb
-            WHERE username = %s;
-        """, (f'["{perm_name}"]', username))
-
-        conn.commit()
-        print(f"Successfully added '{perm_name}' to '{username}'.")
+            conn.commit()
+            print(f"Successfully added '{perm_name}' to '{username}'.")
 
     except Exception as e:
         print(f"Error adding permission: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
 def remove_user(username: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with get_db_connection() as conn:
+            conn.execute("""
+                DELETE FROM users WHERE username = %s;
+            """, (username,))
 
-        cursor.execute("""
-            DELETE FROM users WHERE username = %s;
-        """, (username,))
-
-        conn.commit()
-        print(f"Successfully removed '{username}'.")
+            conn.commit()
+            print(f"Successfully removed '{username}'.")
     except Exception as e:
         print(f"Error removing username: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
 
 def mark_user_logged_in(username: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            update user_overview set user_status = 'Logged in' where username = %s;
-        """, (username,))
-        
-        conn.commit()
-        print(f"{username} is Logged in!")
+        with get_db_connection() as conn:
+            conn.execute("""
+                update user_overview set user_status = 'Logged in' where username = %s;
+            """, (username,))
+
+            conn.commit()
+            print(f"{username} is Logged in!")
     except Exception as e:
         print(f"Error marking user as logged in: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
 def mark_user_logged_out(username: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            update user_overview set user_status = 'Logged out' where username = %s;
-        """, (username,))
-        
-        conn.commit()
-        print(f"{username} is Logged out!")
+        with get_db_connection() as conn:
+            conn.execute("""
+                update user_overview set user_status = 'Logged out' where username = %s;
+            """, (username,))
+
+            conn.commit()
+            print(f"{username} is Logged out!")
     except Exception as e:
         print(f"Error marking user as logged out: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 def get_user_overview():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            select * from user_overview;
-        """)
-
-        return cursor.fetchall()
+        with get_db_connection() as conn:
+            return conn.execute("""
+                select * from user_overview;
+            """).fetchall()
     except Exception as e:
         print(f"Error fetching user overview: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+        return []
 
 # Function to clear the users table for all users
 def clear_all_users():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            DELETE FROM users;
-        """)
+        with get_db_connection() as conn:
+            conn.execute("""
+                DELETE FROM users;
+            """)
 
-        conn.commit()
-        print("All users cleared successfully!")
+            conn.commit()
+            print("All users cleared successfully!")
     except Exception as e:
         print(f"Error clearing users: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
 # check if user is in logged in set
 def is_user_logged_in(username: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT user_status = 'Logged in' FROM user_overview WHERE username = %s;
-        """, (username,))
-        result = cursor.fetchone()
-        return result[0] if result else False
+        with get_db_connection() as conn:
+            result = conn.execute("""
+                SELECT user_status = 'Logged in' FROM user_overview WHERE username = %s;
+            """, (username,)).fetchone()
+            return result[0] if result else False
     except Exception as e:
         print(f"Error checking if user is logged in: {e}")
         return False
-    finally:
-        cursor.close()
-        conn.close()
 
 # Get all roles from database
 def get_all_roles():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            select role_name from roles;
-        """)
-        roles = cursor.fetchall()
-        return [role[0] for role in roles] 
+        with get_db_connection() as conn:
+            roles = conn.execute("""
+                select role_name from roles;
+            """).fetchall()
+            return [role[0] for role in roles]
     except Exception as e:
         print(f"Failed to get all roles from db: {e}!")
-    finally:
-        cursor.close()
-        conn.close()
+        return []
 
-# Get all alerts from database
-def get_all_alerts():
+# Alert pages are read by keyset on alert_no (the primary key index), never by OFFSET:
+#   after=N  -> rows newer than N, oldest first (delta mode, for clients that already have everything up to N)
+#   before=N -> the page of rows older than N, newest first (scrolling back)
+#   neither  -> the newest page
+# One extra row is fetched to tell whether there is more beyond the page.
+ALERTS_PAGE_COLUMNS = "alert_no, alert_desc, alert_level, date_and_time"
+
+def _alerts_page_query(after, before, limit):
+    if after is not None:
+        return f"SELECT {ALERTS_PAGE_COLUMNS} FROM alerts WHERE alert_no > %s ORDER BY alert_no ASC LIMIT %s;", (after, limit + 1)
+    if before is not None:
+        return f"SELECT {ALERTS_PAGE_COLUMNS} FROM alerts WHERE alert_no < %s ORDER BY alert_no DESC LIMIT %s;", (before, limit + 1)
+    return f"SELECT {ALERTS_PAGE_COLUMNS} FROM alerts ORDER BY alert_no DESC LIMIT %s;", (limit + 1,)
+
+def _alerts_page_result(rows, after, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    # Pages are always handed back oldest first, like the full table used to be
+    if after is None:
+        rows.reverse()
+    return rows, has_more
+
+# Get a page of alerts from database, returns (rows, has_more)
+def get_alerts_page(after: int = None, before: int = None, limit: int = 100):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM alerts;")
-        return cursor.fetchall()
+        with get_db_connection() as conn:
+            rows = conn.execute(*_alerts_page_query(after, before, limit)).fetchall()
+            return _alerts_page_result(rows, after, limit)
     except Exception as e:
-        print(f"Failed to get all alerts from db: {e}!")
-        return []
-    finally:
-        cursor.close()
-        conn.close()
+        print(f"Failed to get alerts page from db: {e}!")
+        return [], False
 
 # Add Alerts to DB
 def add_alert(alert_desc: str, alert_level: str) -> bool:
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO alerts (alert_desc, alert_level)
-            VALUES (%s, %s);
-        """, (alert_desc, alert_level))
-        conn.commit()
-        print(f"Alert: {alert_desc} has been added sucessfully as {alert_level}")
-        return True
+        with get_db_connection() as conn:
+            conn.execute("""
+                INSERT INTO alerts (alert_desc, alert_level)
+                VALUES (%s, %s);
+            """, (alert_desc, alert_level))
+            conn.commit()
+            print(f"Alert: {alert_desc} has been added sucessfully as {alert_level}")
+            return True
     except Exception as e:
         print(f"[ERROR] Failed to add alert: {e}")
         return False
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+
+# Add a batch of alerts to DB with a single COPY, keeping the order of the rows
+def add_alerts(rows: list) -> bool:
+    """rows is a list of (alert_desc, alert_level, date_and_time) tuples"""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                with cursor.copy("COPY alerts (alert_desc, alert_level, date_and_time) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"[ERROR] Failed to add {len(rows)} alerts: {e}")
+        return False
+
+# Add a batch of detections to detected_animals with a single COPY, keeping the order of the rows
+def add_detections(rows: list) -> bool:
+    """rows is a list of (gate_no, animal_type, animal_name, is_endangered, is_threat, confidence, capture_id, time_stamp) tuples"""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                with cursor.copy("""
+                    COPY detected_animals (gate_no, animal_type, animal_name, is_endangered, is_threat, confidence, capture_id, time_stamp)
+                    FROM STDIN
+                """) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"[ERROR] Failed to add {len(rows)} detections: {e}")
+        return False
+
+# Every species with its metadata, or None if the table could not be read
+def get_all_species():
+    try:
+        with get_db_connection() as conn:
+            return conn.execute("""
+                SELECT animal_name, animal_type, is_endangered, is_threat FROM species;
+            """).fetchall()
+    except Exception as e:
+        print(f"Failed to get species from db: {e}!")
+        return None
+
+# ------------------------------------------------------------
+# State shared between web-app workers (see shared_state.py)
+# ------------------------------------------------------------
+# The elected ingestor sends the MQTT events to every worker on this channel, workers forward gate commands to it
+# on the other one. A NOTIFY payload is limited to 8000 bytes.
+LIVE_EVENTS_CHANNEL = "live_events"
+GATE_COMMANDS_CHANNEL = "gate_commands"
+NOTIFY_MAX_PAYLOAD = 7999
+
+def _notify_payload(event: str, data: dict):
+    payload = json.dumps({"event": event, "data": data}, default=str)
+    if len(payload.encode()) > NOTIFY_MAX_PAYLOAD:
+        print(f"[ERROR] {event} event too large to notify ({len(payload)} bytes), dropped")
+        return None
+    return payload
+
+# Send a batch of (event, data) live events to every worker in one transaction. Gate states are also stored in
+# gate_registry so workers that (re)connect later can load them.
+def publish_live_events(rows: list) -> bool:
+    try:
+        with get_db_connection() as conn:
+            for event, data in rows:
+                if event == "gate_state":
+                    conn.execute("""
+                        INSERT INTO gate_registry (gate_id, status, gate_status, last_seen, updated_at)
+                        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+                        ON CONFLICT (gate_id) DO UPDATE
+                        SET status = EXCLUDED.status, gate_status = EXCLUDED.gate_status,
+                            last_seen = EXCLUDED.last_seen, updated_at = EXCLUDED.updated_at;
+                    """, (data["gate_id"], data["status"], data["gate_status"], data["last_seen"]))
+                payload = _notify_payload(event, data)
+                if payload is not None:
+                    conn.execute("SELECT pg_notify(%s, %s);", (LIVE_EVENTS_CHANNEL, payload))
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"[ERROR] Failed to publish {len(rows)} live events: {e}")
+        return False
+
+# Every gate of the registry as (gate_id, status, gate_status, last_seen, http_url), or None if it could not be read
+def get_gate_registry():
+    try:
+        with get_db_connection() as conn:
+            return conn.execute("SELECT gate_id, status, gate_status, last_seen, http_url FROM gate_registry;").fetchall()
+    except Exception as e:
+        print(f"Failed to get the gate registry from db: {e}!")
+        return None
+
+# A newly elected ingestor has not heard from any gate yet: mark them all offline until they report again,
+# and tell the workers to reload the registry
+def reset_gate_registry() -> bool:
+    try:
+        with get_db_connection() as conn:
+            conn.execute("UPDATE gate_registry SET status = 'offline', updated_at = CURRENT_TIMESTAMP WHERE status <> 'offline';")
+            conn.execute("SELECT pg_notify(%s, %s);", (LIVE_EVENTS_CHANNEL, _notify_payload("gate_registry_reset", {})))
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"[ERROR] Failed to reset the gate registry: {e}")
+        return False
+
+# Set the address of a gate's HTTP server (None for the reverse tunnel) and tell every worker
+def set_gate_http_url(gate_id: str, http_url: str = None) -> bool:
+    try:
+        with get_db_connection() as conn:
+            conn.execute("""
+                INSERT INTO gate_registry (gate_id, http_url) VALUES (%s, %s)
+                ON CONFLICT (gate_id) DO UPDATE SET http_url = EXCLUDED.http_url;
+            """, (gate_id, http_url))
+            conn.execute("SELECT pg_notify(%s, %s);", (LIVE_EVENTS_CHANNEL, _notify_payload("gate_address", {"gate_id": gate_id, "http_url": http_url})))
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"[ERROR] Failed to set the address of gate {gate_id}: {e}")
+        return False
 
 # Delete alert from db
 def delete_alert(alert_no: int):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            DELETE FROM alerts WHERE alert_no = %s;
-        """, (alert_no,))
-        conn.commit()
-        print(f"Alert no: {alert_no} has been deleted!")
+        with get_db_connection() as conn:
+            conn.execute("""
+                DELETE FROM alerts WHERE alert_no = %s;
+            """, (alert_no,))
+            conn.commit()
+            print(f"Alert no: {alert_no} has been deleted!")
     except Exception as e:
         print(f"[ERROR] Failed to delete alert: {e}")
         return False
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 def add_gate(gate_no: int, gate_status: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO gates (gate_no, gate_status) 
-            VALUES (%s, %s);
-        """, (gate_no, gate_status,)) # gate_status is Open or Closed
-        conn.commit()
+        with get_db_connection() as conn:
+            conn.execute("""
+                INSERT INTO gates (gate_no, gate_status)
+                VALUES (%s, %s);
+            """, (gate_no, gate_status,)) # gate_status is Open or Closed
+            conn.commit()
 
     except Exception as e:
         print(f"[ERROR] Failed to add gate to db: {e}")
         return False
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 def update_gate_status(gate_no: int, new_status: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Get the current status
-        cursor.execute("SELECT gate_status FROM gates WHERE gate_no = %s;", (gate_no,))
-        current_status_row = cursor.fetchone()
-        if not current_status_row:
-            print(f"[ERROR] Gate {gate_no} not found.")
-            return
-
-        current_status = current_status_row[0]
-        if current_status.lower() == new_status.lower():
-            print(f"[INFO] Gate {gate_no} is already {new_status}. No update needed.")
-            return
-
-        # Determine which column to increment
-        increment_column = "gate_no_opens" if new_status.lower() == "open" else "gate_no_closes"
-
-        # Perform the update
-        cursor.execute(f"""
-            UPDATE gates
-            SET gate_status = %s,
-                {increment_column} = {increment_column} + 1
-            WHERE gate_no = %s;
-        """, (new_status, gate_no))
-        
-        conn.commit()
-        print(f"[INFO] Gate {gate_no} status updated to {new_status}.")
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            # Get the current status
+            cursor.execute("SELECT gate_status FROM gates WHERE gate_no = %s;", (gate_no,))
+            current_status_row = cursor.fetchone()
+            if not current_status_row:
+                print(f"[ERROR] Gate {gate_no} not found.")
+                return
+
+            current_status = current_status_row[0]
+            if current_status.lower() == new_status.lower():
+                print(f"[INFO] Gate {gate_no} is already {new_status}. No update needed.")
+                return
+
+            # Determine which column to increment
+            increment_column = "gate_no_opens" if new_status.lower() == "open" else "gate_no_closes"
+
+            # Perform the update
+            cursor.execute(f"""
+                UPDATE gates
+                SET gate_status = %s,
+                    {increment_column} = {increment_column} + 1
+                WHERE gate_no = %s;
+            """, (new_status, gate_no))
+
+            conn.commit()
+            print(f"[INFO] Gate {gate_no} status updated to {new_status}.")
+    except Exception as e:
+        print(f"[ERROR] Failed to update gate status in db: {e}")
+
+# Counters in animal_name_vs_count / var_stats that differ from a fresh count of detected_animals.
+# Returns a list of (stat, stored, actual), empty when the stats are consistent, or None if the check failed.
+def check_detection_stats():
+    try:
+        with get_db_connection() as conn:
+            return conn.execute("SELECT stat, stored, actual FROM check_detection_stats();").fetchall()
+    except Exception as e:
+        print(f"[ERROR] Failed to check detection stats: {e}")
+        return None
+
+# Rebuild animal_name_vs_count / var_stats from detected_animals (full scan, blocks writers while it runs)
+def backfill_detection_stats() -> bool:
+    try:
+        with get_db_connection() as conn:
+            conn.execute("SELECT backfill_detection_stats();")
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"[ERROR] Failed to backfill detection stats: {e}")
+        return False
+
+# Detection partitions: how far ahead monthly partitions are created and how long raw rows / hourly rollups are kept
+DETECTION_PARTITIONS_AHEAD = int(os.getenv("DETECTION_PARTITIONS_AHEAD", "3"))
+DETECTION_RETENTION_MONTHS = int(os.getenv("DETECTION_RETENTION_MONTHS", "12"))
+DETECTION_ROLLUP_RETENTION_MONTHS = int(os.getenv("DETECTION_ROLLUP_RETENTION_MONTHS", "60"))
+
+# ------------------------------------------------------------
+# Async versions of the queries used by the request handlers
+# ------------------------------------------------------------
+async def check_db_connection_async():
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("SELECT 1;")
+            result = await cursor.fetchone()
+            return result[0] == 1
+    except Exception as e:
+        print(f"Database connection failed: {e}")
+        return False
+
+async def insert_user_async(user: dict):
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("""
+                SELECT COUNT(*) FROM users WHERE user_id = %s OR username = %s;
+            """, (user['id'], user['login']))
+            result = await cursor.fetchone()
+
+            if result[0] == 0:
+                await conn.execute("""
+                    INSERT INTO users (user_id, username, role_id)
+                    VALUES (%s, %s, %s);
+                """, (user['id'], user['login'], user['role_id']))
+                await conn.commit()
+                print("User Inserted Successfully!")
+            else:
+                print("User already exists. Skipping insert.")
+    except Exception as e:
+        print(f"Error inserting user: {e}")
+
+async def check_permission_async(username: str, perm_name: str):
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("""
+                SELECT 1
+                FROM user_perms
+                WHERE username = %s
+                AND permissions @> %s::jsonb
+                LIMIT 1;
+            """, (username, f'["{perm_name}"]'))
+            return await cursor.fetchone() is not None
+    except Exception as e:
+        print(f"Error checking permission: {e}")
+        return False
+
+async def change_role_async(username: str, role_name: str):
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("""
+                select role_id from roles where role_name = %s;
+            """, (role_name,))
+            role_id = await cursor.fetchone()
+
+            if not role_id:
+                print(f"Error: Role '{role_name}' not found.")
+                return
+
+            await conn.execute("""
+                UPDATE users SET role_id = %s WHERE username = %s;
+            """, (role_id[0], username,))
+            await conn.commit()
+            print(f"Role updated successfully for {username}!")
+    except Exception as e:
+        print(f"Error changing role: {e}")
+
+async def remove_user_async(username: str):
+    try:
+        async with get_async_db_connection() as conn:
+            await conn.execute("""
+                DELETE FROM users WHERE username = %s;
+            """, (username,))
+            await conn.commit()
+            print(f"Successfully removed '{username}'.")
+    except Exception as e:
+        print(f"Error removing username: {e}")
+
+async def set_user_status_async(username: str, user_status: str):
+    """user_status is 'Logged in' or 'Logged out'"""
+    try:
+        async with get_async_db_connection() as conn:
+            await conn.execute("""
+                update user_overview set user_status = %s where username = %s;
+            """, (user_status, username))
+            await conn.commit()
+            print(f"{username} is {user_status}!")
+    except Exception as e:
+        print(f"Error marking user as {user_status}: {e}")
+
+async def mark_user_logged_in_async(username: str):
+    await set_user_status_async(username, 'Logged in')
+
+async def mark_user_logged_out_async(username: str):
+    await set_user_status_async(username, 'Logged out')
+
+async def get_user_overview_async():
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("""
+                select * from user_overview;
+            """)
+            return await cursor.fetchall()
+    except Exception as e:
+        print(f"Error fetching user overview: {e}")
+        return []
+
+async def clear_all_users_async():
+    try:
+        async with get_async_db_connection() as conn:
+            await conn.execute("""
+                DELETE FROM users;
+            """)
+            await conn.commit()
+            print("All users cleared successfully!")
+    except Exception as e:
+        print(f"Error clearing users: {e}")
+
+async def is_user_logged_in_async(username: str):
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("""
+                SELECT user_status = 'Logged in' FROM user_overview WHERE username = %s;
+            """, (username,))
+            result = await cursor.fetchone()
+            return result[0] if result else False
+    except Exception as e:
+        print(f"Error checking if user is logged in: {e}")
+        return False
+
+async def get_all_roles_async():
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("""
+                select role_name from roles;
+            """)
+            return [role[0] for role in await cursor.fetchall()]
+    except Exception as e:
+        print(f"Failed to get all roles from db: {e}!")
+        return []
+
+# User overview rows and role names read together, for the users page cache. None if the read failed
+async def get_user_overview_snapshot_async():
+    try:
+        async with get_async_db_connection() as conn:
+            overview = await (await conn.execute("select * from user_overview;")).fetchall()
+            roles = await (await conn.execute("select role_name from roles;")).fetchall()
+            return overview, [role[0] for role in roles]
+    except Exception as e:
+        print(f"Error fetching user overview: {e}")
+        return None
+
+async def get_alerts_page_async(after: int = None, before: int = None, limit: int = 100):
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute(*_alerts_page_query(after, before, limit))
+            return _alerts_page_result(await cursor.fetchall(), after, limit)
+    except Exception as e:
+        print(f"Failed to get alerts page from db: {e}!")
+        return [], False
+
+async def add_alert_async(alert_desc: str, alert_level: str) -> bool:
+    try:
+        async with get_async_db_connection() as conn:
+            await conn.execute("""
+                INSERT INTO alerts (alert_desc, alert_level)
+                VALUES (%s, %s);
+            """, (alert_desc, alert_level))
+            await conn.commit()
+            print(f"Alert: {alert_desc} has been added sucessfully as {alert_level}")
+            return True
+    except Exception as e:
+        print(f"[ERROR] Failed to add alert: {e}")
+        return False
+
+async def add_gate_async(gate_no: int, gate_status: str):
+    try:
+        async with get_async_db_connection() as conn:
+            await conn.execute("""
+                INSERT INTO gates (gate_no, gate_status)
+                VALUES (%s, %s);
+            """, (gate_no, gate_status,))
+            await conn.commit()
+    except Exception as e:
+        print(f"[ERROR] Failed to add gate to db: {e}")
+        return False
+
+async def update_gate_status_async(gate_no: int, new_status: str):
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("SELECT gate_status FROM gates WHERE gate_no = %s;", (gate_no,))
+            current_status_row = await cursor.fetchone()
+            if not current_status_row:
+                print(f"[ERROR] Gate {gate_no} not found.")
+                return
+
+            if current_status_row[0].lower() == new_status.lower():
+                print(f"[INFO] Gate {gate_no} is already {new_status}. No update needed.")
+                return
+
+            increment_column = "gate_no_opens" if new_status.lower() == "open" else "gate_no_closes"
+            await conn.execute(f"""
+                UPDATE gates
+                SET gate_status = %s,
+                    {increment_column} = {increment_column} + 1
+                WHERE gate_no = %s;
+            """, (new_status, gate_no))
+            await conn.commit()
+            print(f"[INFO] Gate {gate_no} status updated to {new_status}.")
     except Exception as e:
         print(f"[ERROR] Failed to update gate status in db: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+
+# Create the upcoming monthly partitions of detected_animals and drop the expired ones.
+# Returns (created, dropped), or None if the maintenance failed.
+async def run_detection_maintenance_async():
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("SELECT create_detection_partitions(%s);", (DETECTION_PARTITIONS_AHEAD,))
+            created = (await cursor.fetchone())[0]
+            cursor = await conn.execute("SELECT drop_expired_detection_partitions(%s, %s);",
+                                        (DETECTION_RETENTION_MONTHS, DETECTION_ROLLUP_RETENTION_MONTHS))
+            dropped = (await cursor.fetchone())[0]
+            await conn.commit()
+            return created, dropped
+    except Exception as e:
+        print(f"[ERROR] Failed to run detection partition maintenance: {e}")
+        return None
+
+# Hourly detections per gate and species since the given time, read from the rollups
+async def get_detection_rollups_async(since: datetime, gate_no: int = None):
+    try:
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute("""
+                SELECT bucket, gate_no, animal_name, detections, threats, endangered, threats_and_endangered
+                FROM detections_hourly
+                WHERE bucket >= date_trunc('hour', %s::TIMESTAMP)
+                  AND (%s::INTEGER IS NULL OR gate_no = %s::INTEGER)
+                ORDER BY bucket, gate_no, animal_name;
+            """, (since, gate_no, gate_no))
+            return await cursor.fetchall()
+    except Exception as e:
+        print(f"Failed to get detection rollups from db: {e}!")
+        return []
+
+# Send a notification to every worker listening on `channel`, e.g. a live event or a gate command for the ingestor
+async def notify_async(channel: str, event: str, data: dict) -> bool:
+    payload = _notify_payload(event, data)
+    if payload is None:
+        return False
+    try:
+        async with get_async_db_connection() as conn:
+            await conn.execute("SELECT pg_notify(%s, %s);", (channel, payload))
+            await conn.commit()
+            return True
+    except Exception as e:
+        print(f"[ERROR] Failed to notify {channel}: {e}")
+        return False
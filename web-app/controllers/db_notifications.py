@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Postgres notifications for the Web Application
+Keeps in-memory caches in sync with the database through LISTEN/NOTIFY instead of polling
+"""
+
+import threading
+import time
+import logging
+
+import psycopg
+from psycopg import sql
+
+from controllers.db_controller import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+class NotificationListener:
+    """
+    LISTENs on a dedicated connection (a pooled one would be handed to other users between notifications) and calls
+    the callbacks registered for a channel with the payload of every notification on it.
+
+    Notifications sent while the listener is disconnected are lost, so after every (re)connect each callback is
+    called once with None, which makes the caches reload.
+    """
+    def __init__(self, reconnect_delay=5.0, poll_interval=1.0):
+        self.reconnect_delay = reconnect_delay
+        self.poll_interval = poll_interval
+        self.callbacks = {}  # {channel: [callback]}
+        self.listening = set()
+        self.lock = threading.Lock()
+        self.stats = {"notifications": 0, "connects": 0, "errors": 0}
+
+        self.running = False
+        self.thread = None
+
+    def subscribe(self, channel, callback):
+        """Call `callback(payload)` for every notification on `channel`. Starts the listener if needed."""
+        with self.lock:
+            self.callbacks.setdefault(channel, []).append(callback)
+        self.start()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.poll_interval + 2)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, channels=sorted(self.callbacks))
+
+    def _dispatch(self, channel, payload):
+        with self.lock:
+            callbacks = list(self.callbacks.get(channel, []))
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Error in notification callback for {channel}: {e}")
+
+    def _listen_new_channels(self, conn):
+        """LISTEN to channels subscribed since the last check, returns the newly listened ones"""
+        with self.lock:
+            channels = [channel for channel in self.callbacks if channel not in self.listening]
+        for channel in channels:
+            conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+            self.listening.add(channel)
+        return channels
+
+    def _run(self):
+        while self.running:
+            try:
+                with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+                    self.listening = set()
+                    with self.lock:
+                        self.stats["connects"] += 1
+                    while self.running:
+                        # Anything could have changed while the channel was not listened to
+                        for channel in self._listen_new_channels(conn):
+                            self._dispatch(channel, None)
+                        for notify in conn.notifies(timeout=self.poll_interval):
+                            with self.lock:
+                                self.stats["notifications"] += 1
+                            self._dispatch(notify.channel, notify.payload)
+            except Exception as e:
+                with self.lock:
+                    self.stats["errors"] += 1
+                logger.warning(f"Notification listener disconnected: {e}")
+                time.sleep(self.reconnect_delay)
+
+# Global instance
+notification_listener = None
+
+def get_notification_listener():
+    """Get the global notification listener instance"""
+    global notification_listener
+    if notification_listener is None:
+        notification_listener = NotificationListener()
+    return notification_listener
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Gate HTTP access for the Web Application
+Fetches from the gates' HTTP servers without blocking the event loop, one upstream request at a time per gate
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+
+import httpx
+
+from controllers.gate_registry import gate_registry
+
+logger = logging.getLogger(__name__)
+
+# Reverse tunnel to the gates' HTTP servers, used for every gate without an http_url of its own in gate_registry
+GATE_HTTP_URL = os.getenv("GATE_HTTP_URL", "http://54.252.172.171:8080")
+
+# What /latest-capture returns while a gate cannot be reached
+PLACEHOLDER_CAPTURE = json.dumps({
+    "capture": {
+        "objects": [],
+        "confidence": [],
+        "timestamp": 0,
+        "image_base64": "",
+        "detections": []
+    }
+}).encode()
+
+def gate_http_url(gate_id=None):
+    """Base URL of a gate's HTTP server, of the gate heard from most recently if none is given"""
+    gate_id = gate_id or gate_registry.latest()
+    record = gate_registry.get(gate_id) if gate_id else None
+    return (record or {}).get("http_url") or GATE_HTTP_URL
+
+class _Entry:
+    def __init__(self, content, expires):
+        self.content = content
+        self.expires = expires
+
+class GateFetcher:
+    """
+    Short-lived cache in front of GET requests to the gates, shared by every request of this worker.
+
+    Requests for a URL that arrive while it is being fetched wait for that fetch instead of starting their own
+    (single-flight), and its response is then served to everyone for `ttl` seconds. Failures are cached the same
+    way, so an unreachable gate costs one upstream attempt per `ttl` rather than one per browser. Responses are
+    kept as the raw bytes, never decoded and encoded again per request.
+
+    `invalidate` drops a URL before its TTL is up, e.g. when the gate announces a new capture; a fetch already
+    running at that point still answers its own waiters but is not cached.
+
+    All of this runs on the event loop with a pooled async client, other threads go through `invalidate_threadsafe`.
+
+    :param ttl: Seconds a response is served from the cache
+    :param timeout: Upstream timeout in seconds
+    :param max_connections: Upstream connections kept by the pool
+    :param fallback: Content served when the upstream fails or does not answer 200
+    """
+    def __init__(self, ttl=2.0, timeout=5.0, max_connections=20, fallback=PLACEHOLDER_CAPTURE):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.fallback = fallback
+        self.client = None   # created on the event loop
+        self.loop = None
+        self.cache = {}      # {url: _Entry}
+        self.inflight = {}   # {url: asyncio.Task}
+        self.stats = {
+            "requests": 0,
+            "hits": 0,
+            "coalesced": 0,
+            "upstream_fetches": 0,
+            "upstream_errors": 0,
+            "invalidations": 0,
+            "last_fetch_ms": 0.0
+        }
+
+    def attach(self, loop):
+        """Event loop `invalidate_threadsafe` hands the invalidations to, set when the app starts"""
+        self.loop = loop
+
+    async def get(self, url):
+        """Response body for a URL: cached, shared with a running fetch, or fetched"""
+        self.stats["requests"] += 1
+        entry = self.cache.get(url)
+        if entry and entry.expires > time.monotonic():
+            self.stats["hits"] += 1
+            return entry.content
+
+        task = self.inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._fetch(url))
+            self.inflight[url] = task
+        else:
+            self.stats["coalesced"] += 1
+        # A browser going away must not cancel the fetch the others are waiting for
+        return await asyncio.shield(task)
+
+    def invalidate(self, url):
+        """Forget a URL, the next request fetches it again"""
+        self.stats["invalidations"] += 1
+        self.cache.pop(url, None)
+        self.inflight.pop(url, None)
+
+    def invalidate_threadsafe(self, url):
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.invalidate, url)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def get_stats(self):
+        return dict(self.stats, cached=len(self.cache), inflight=len(self.inflight), ttl=self.ttl)
+
+    async def _fetch(self, url):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            )
+        started = time.perf_counter()
+        self.stats["upstream_fetches"] += 1
+        try:
+            response = await self.client.get(url)
+            if response.status_code == 200:
+                content = response.content
+                # Checked once here instead of by every browser
+                json.loads(content)
+            else:
+                logger.warning(f"{url} answered {response.status_code}")
+                self.stats["upstream_errors"] += 1
+                content = self.fallback
+        except Exception as e:
+            logger.warning(f"Error fetching {url}: {e!r}")
+            self.stats["upstream_errors"] += 1
+            content = self.fallback
+        self.stats["last_fetch_ms"] = (time.perf_counter() - started) * 1000.0
+
+        # Only cached if nobody invalidated the URL while it was being fetched
+        if self.inflight.get(url) is asyncio.current_task():
+            del self.inflight[url]
+            self.cache[url] = _Entry(content, time.monotonic() + self.ttl)
+        return content
+
+# Global instance
+gate_fetcher = GateFetcher()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Gate registry for the Web Application
+This worker's copy of the gate_registry table, so /gates/api never needs the MQTT client or a query
+"""
+
+import uuid
+import bisect
+import threading
+from types import MappingProxyType
+
+def gate_sort_key(gate_id):
+    """
+    Order of the gates everywhere they are listed: numeric ids by value, then the others by name. The id itself
+    breaks ties, so '1' and '01' stay two gates
+    """
+    return (0, int(gate_id), gate_id) if gate_id.isascii() and gate_id.isdigit() else (1, 0, gate_id)
+
+def gate_id_of(key):
+    """Inverse of gate_sort_key"""
+    return key[2]
+
+def index_keys(record):
+    """Indexes a gate is listed in, (gate_status, status) with None standing for any value"""
+    return ((record["gate_status"], None), (None, record["status"]), (record["gate_status"], record["status"]))
+
+def recency(record):
+    """How recently a gate was heard from, online ones first"""
+    return (record["status"] == "online", record["last_seen"])
+
+class GateSnapshot:
+    """
+    Immutable view of the registry at one version, with its indexes. Nothing in it changes once it is built, so
+    any number of requests can read it without a lock while the registry moves on.
+
+    Every index is a tuple of gate sort keys in order, the whole fleet being the (None, None) one. A cursor (the
+    last gate id of a page) is found in any of them with one bisect.
+    """
+    __slots__ = ("version", "etag", "gates", "indexes", "latest")
+
+    def __init__(self, version, epoch, gates, indexes, latest):
+        self.version = version
+        # With several workers a version number alone would match another worker's different registry
+        self.etag = f'"{epoch}-{version}"'
+        self.gates = MappingProxyType(gates)
+        self.indexes = indexes
+        self.latest = latest
+
+    def __len__(self):
+        return len(self.gates)
+
+    def page(self, limit, after=None, gate_status=None, status=None):
+        """
+        Gate ids of one page, in order.
+
+        :param after: Gate id the previous page ended with, None for the first page
+        :param gate_status: Only the gates in this state (open, closed, ...)
+        :param status: Only the online or the offline gates
+        :return: (gate ids, gate id to pass as `after` for the next page or None, number of matching gates)
+        """
+        keys = self.indexes.get((gate_status, status), ())
+        start = bisect.bisect_right(keys, gate_sort_key(after)) if after is not None else 0
+        gate_ids = [gate_id_of(key) for key in keys[start:start + limit]]
+        more = start + limit < len(keys)
+        return gate_ids, gate_ids[-1] if more and gate_ids else None, len(keys)
+
+class GateRegistry:
+    """
+    Every gate by id, with the same record layout as GateLivenessTracker ("status", "gate_status", "last_seen")
+    plus "http_url", the address of the gate's HTTP server if it is not behind the shared reverse tunnel.
+
+    Loaded from gate_registry when the notification listener (re)connects and updated from the gate_state
+    events on live_events, which the elected ingestor sends to every worker.
+
+    Writes take the lock, keep the sorted indexes up to date one gate at a time and bump the version. Reads go
+    through `snapshot()`, which returns the current GateSnapshot without taking the lock; the first read after a
+    change copies the indexes into the next one, so a burst of updates costs one copy and no sort. Records are
+    replaced, never modified in place.
+    """
+    def __init__(self):
+        self.gates = {}    # {gate_id: {"status", "gate_status", "last_seen", "http_url"}}
+        self.indexes = {}  # {(gate_status, status): sorted gate sort keys}, see index_keys
+        self.latest_id = None  # None also when it must be found again
+        self.lock = threading.Lock()
+        self.version = 0
+        self.epoch = uuid.uuid4().hex[:8]
+        self.current = GateSnapshot(0, self.epoch, {}, {(None, None): ()}, None)
+
+    def load(self, rows):
+        """Replace every gate with the rows of gate_registry, (gate_id, status, gate_status, last_seen, http_url)"""
+        gates = {
+            gate_id: {"status": status, "gate_status": gate_status, "last_seen": last_seen, "http_url": http_url}
+            for gate_id, status, gate_status, last_seen, http_url in rows
+        }
+        indexes = {(None, None): []}
+        for gate_id in sorted(gates, key=gate_sort_key):
+            key = gate_sort_key(gate_id)
+            indexes[(None, None)].append(key)
+            for index in index_keys(gates[gate_id]):
+                indexes.setdefault(index, []).append(key)
+        with self.lock:
+            self.gates = gates
+            self.indexes = indexes
+            self.latest_id = None
+            self.version += 1
+
+    def update(self, gate_id, record):
+        """Replace the record of one gate, from a gate_state event"""
+        with self.lock:
+            previous = self.gates.get(gate_id) or {}
+            self._replace(gate_id, {
+                "status": record.get("status", "offline"),
+                "gate_status": record.get("gate_status", "unknown"),
+                "last_seen": record.get("last_seen", 0),
+                "http_url": previous.get("http_url")
+            })
+
+    def set_http_url(self, gate_id, http_url):
+        """Replace the address of one gate, from a gate_address event"""
+        with self.lock:
+            previous = self.gates.get(gate_id) or {"status": "offline", "gate_status": "unknown", "last_seen": 0}
+            self._replace(gate_id, dict(previous, http_url=http_url))
+
+    def get(self, gate_id):
+        return self.gates.get(gate_id)
+
+    def latest(self):
+        """Id of the gate heard from most recently, preferring online ones, or None if there are none"""
+        return self.snapshot().latest
+
+    def snapshot(self):
+        """The registry as of now, copied only when something changed since the previous snapshot"""
+        current = self.current
+        if current.version == self.version:
+            return current
+        with self.lock:
+            if self.current.version != self.version:
+                if self.latest_id is None and self.gates:
+                    # After a load or when the latest gate went quiet, the only times a scan is needed
+                    self.latest_id = max(self.gates, key=lambda gate_id: recency(self.gates[gate_id]))
+                self.current = GateSnapshot(
+                    self.version, self.epoch, dict(self.gates),
+                    {index: tuple(keys) for index, keys in self.indexes.items()}, self.latest_id
+                )
+            return self.current
+
+    def _replace(self, gate_id, record):
+        """Store a gate's new record and move it between indexes. Called with the lock held."""
+        previous = self.gates.get(gate_id)
+        key = gate_sort_key(gate_id)
+        if previous is None:
+            bisect.insort(self.indexes.setdefault((None, None), []), key)
+        old = set(index_keys(previous)) if previous else set()
+        new = set(index_keys(record))
+        for index in old - new:
+            keys = self.indexes[index]
+            del keys[bisect.bisect_left(keys, key)]
+        for index in new - old:
+            bisect.insort(self.indexes.setdefault(index, []), key)
+        self.gates[gate_id] = record
+
+        if gate_id == self.latest_id:
+            if recency(record) < recency(previous):
+                self.latest_id = None
+        elif self.latest_id is not None and recency(record) > recency(self.gates[self.latest_id]):
+            self.latest_id = gate_id
+        self.version += 1
+
+# Global instance
+gate_registry = GateRegistry()
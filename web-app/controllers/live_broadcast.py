@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Live data fan-out for the Web Application
+Pushes events to the /ws/live-data sockets, from the event loop or from other threads (MQTT)
+"""
+
+import asyncio
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to clients that cannot keep up ("Try Again Later"), the page reconnects and reloads
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class _Client:
+    def __init__(self, websocket, max_queue):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.task = None
+        self.closing = False
+        self.sent = 0
+
+class LiveBroadcaster:
+    """
+    Every socket gets a bounded queue drained by its own sender task. A broadcast serializes the message once and
+    only enqueues it, so it never waits on a socket and one slow browser cannot hold up the others.
+
+    Everything sent to a socket, broadcasts and direct replies alike, goes through its queue: the sends to a
+    socket stay ordered and never overlap.
+
+    A client whose queue is full, or whose send does not finish within `send_timeout`, is closed with
+    SLOW_CONSUMER_CLOSE_CODE. The page reconnects and starts again from a fresh snapshot, which is cheaper than
+    buffering an unbounded backlog for it.
+
+    Must be used from the event loop, other threads go through `publish_threadsafe`.
+
+    :param max_queue: Messages waiting for a client before it is considered too slow
+    :param send_timeout: Maximum time a single send may take, in seconds
+    """
+    def __init__(self, max_queue=100, send_timeout=5.0):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.clients = {}  # {websocket: _Client}
+        self.loop = None
+        self.stats = {
+            "broadcasts": 0,
+            "enqueued": 0,
+            "sent": 0,
+            "slow_consumers_closed": 0,
+            "send_timeouts": 0,
+            "threadsafe_publishes": 0,
+            "unattached_publishes": 0,
+            "max_queue_depth": 0,
+            "last_fanout_ms": 0.0
+        }
+
+    def attach(self, loop):
+        """Event loop `publish_threadsafe` hands the events to, set when the app starts"""
+        self.loop = loop
+
+    def register(self, websocket):
+        """Start pushing to an accepted websocket"""
+        client = _Client(websocket, self.max_queue)
+        client.task = asyncio.create_task(self._sender(client))
+        self.clients[websocket] = client
+
+    async def unregister(self, websocket):
+        """Stop pushing to a websocket, dropping what is still queued for it"""
+        client = self.clients.pop(websocket, None)
+        if client and client.task:
+            client.task.cancel()
+            try:
+                await client.task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def send(self, websocket, message):
+        """
+        Queue a message for one socket.
+
+        :return: False if the socket is not registered, is closing or was too slow
+        """
+        client = self.clients.get(websocket)
+        if client is None or client.closing:
+            return False
+        return self._enqueue(client, json.dumps(message, default=str))
+
+    def close(self, websocket):
+        """Close a socket once the messages already queued for it have been sent"""
+        client = self.clients.get(websocket)
+        if client and not client.closing:
+            self._enqueue(client, None)
+
+    def broadcast(self, event, data):
+        """
+        Queue an event for every socket.
+
+        :return: Number of sockets it was queued for
+        """
+        started = time.perf_counter()
+        text = json.dumps({"event": event, "data": data}, default=str)
+        queued = 0
+        for client in list(self.clients.values()):
+            if not client.closing and self._enqueue(client, text):
+                queued += 1
+        self.stats["broadcasts"] += 1
+        self.stats["last_fanout_ms"] = (time.perf_counter() - started) * 1000.0
+        return queued
+
+    def publish_threadsafe(self, event, data):
+        """Broadcast from another thread. Returns immediately, the fan-out runs on the event loop."""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            self.stats["unattached_publishes"] += 1
+            return False
+        self.stats["threadsafe_publishes"] += 1
+        loop.call_soon_threadsafe(self.broadcast, event, data)
+        return True
+
+    def get_stats(self):
+        """Connected sockets, queue depths and drop counters"""
+        depths = [client.queue.qsize() for client in self.clients.values()]
+        return dict(
+            self.stats,
+            clients=len(self.clients),
+            queued=sum(depths),
+            deepest_queue=max(depths, default=0),
+            queue_capacity=self.max_queue
+        )
+
+    def _enqueue(self, client, text):
+        try:
+            client.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self._drop(client, "send queue full")
+            return False
+        self.stats["enqueued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], client.queue.qsize())
+        return True
+
+    def _drop(self, client, reason):
+        """Give up on a slow client: nothing more is queued for it and its socket is closed"""
+        if client.closing:
+            return
+        client.closing = True
+        self.stats["slow_consumers_closed"] += 1
+        logger.warning(f"Closing slow websocket client ({reason}, {client.sent} messages sent)")
+        if client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+        asyncio.create_task(self._close(client.websocket, SLOW_CONSUMER_CLOSE_CODE))
+
+    async def _close(self, websocket, code):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout)
+        except Exception:
+            # Already gone, or not even reading its close frame; the receive loop of the route cleans up
+            pass
+
+    async def _sender(self, client):
+        websocket = client.websocket
+        while True:
+            text = await client.queue.get()
+            if text is None:
+                client.closing = True
+                await self._close(websocket, 1000)
+                return
+            try:
+                await asyncio.wait_for(websocket.send_text(text), self.send_timeout)
+            except asyncio.TimeoutError:
+                self.stats["send_timeouts"] += 1
+                self._drop(client, "send timed out")
+                return
+            except Exception:
+                # Disconnected, the route unregisters it
+                client.closing = True
+                return
+            client.sent += 1
+            self.stats["sent"] += 1
+
+# Global instance
+live_broadcaster = LiveBroadcaster()
@@ -1,14 +1,23 @@
 from fastapi import APIRouter, Request, Depends, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response, StreamingResponse
 from authlib.integrations.starlette_client import OAuth
 from pathlib import Path
 from controllers.db_controller import *
+from controllers.live_broadcast import live_broadcaster
+from controllers.user_overview_cache import UserOverviewCache
+from controllers.gate_registry import gate_registry
+from controllers.gate_http import gate_fetcher, gate_http_url
+from controllers.stream_relay import stream_relay, STREAM_MEDIA_TYPE
+from controllers.shared_state import ingestor_election
 from starlette.websockets import WebSocketState
 from pydantic import BaseModel
+import os
 import json
+import uuid
+import zlib
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 import plotly.graph_objects as go
 
 # ------------------------
@@ -48,6 +57,14 @@ class updateGateData(BaseModel):
 session_initialised = False
 websocket_state = {}
 
+# Alerts are served in pages, the table can hold far more than a browser should render
+ALERTS_PAGE_SIZE = 100
+ALERTS_MAX_PAGE_SIZE = 500
+
+# Same for the gates, a fleet can have thousands
+GATES_PAGE_SIZE = 100
+GATES_MAX_PAGE_SIZE = 1000
+
 # ------------------------------------
 # Decorator Functions (if necessary)
 # ------------------------------------
@@ -64,35 +81,56 @@ websocket_state = {}
 async def get_user_from_session(request: Request):
     return request.session.get('user')
 
-def get_alert_data():
-    data = get_all_alerts()
-    return [
+async def get_alert_page(after: int = None, before: int = None, limit: int = ALERTS_PAGE_SIZE):
+    rows, has_more = await get_alerts_page_async(after, before, limit)
+    alerts = [
         {       
             "alert_no": row[0],
             "alert_desc": row[1],
             "alert_level": row[2],
             "date_and_time": row[3].isoformat() if isinstance(row[3], datetime) else row[3]
         }
-        for row in data
+        for row in rows
     ]
+    return {
+        "alerts": alerts,
+        "has_more": has_more,
+        # Cursors for the next delta request and for the page before this one
+        "last_alert_no": alerts[-1]["alert_no"] if alerts else (after or 0),
+        "first_alert_no": alerts[0]["alert_no"] if alerts else before
+    }
 
-def get_user_data():
-    data = get_user_overview()
-    return [
-        {
-            "username": row[0], 
-            "role_name": row[1], 
-            "status": row[2]
-        } 
-        for row in data
-    ]
+# Newest page of alerts, oldest first
+async def get_alert_data():
+    return (await get_alert_page())["alerts"]
+
+# Users page data straight from the database, only called by the cache
+async def load_user_overview():
+    snapshot = await get_user_overview_snapshot_async()
+    if snapshot is None:
+        return None
+    overview, roles = snapshot
+    return {
+        "user_data": [
+            {
+                "username": row[0], 
+                "role_name": row[1], 
+                "status": row[2]
+            } 
+            for row in overview
+        ],
+        "roles": roles
+    }
+
+async def get_user_data():
+    return (await user_overview_cache.get())["user_data"]
 
 async def render_page(template_name: str, title: str, request: Request, extra_context: dict = None):
     user = await get_user_from_session(request)
     context = {"request": request, "user": user, "title": title}
     if extra_context:
         context.update(extra_context)
-    return pages.TemplateResponse(template_name, context)
+    return pages.TemplateResponse(request, template_name, context)
 
 # -------------
 # Web Routes
@@ -102,7 +140,7 @@ async def dashboard(request: Request):
     global session_initialised
     if not session_initialised:
         request.session.clear()
-        clear_all_users()
+        await clear_all_users_async()
         session_initialised = True
     return await render_page("Index.html", "Dashboard", request)
 
@@ -120,12 +158,12 @@ async def about(request: Request):
 
 @root_router.get("/alerts")
 async def alerts(request: Request):
-    alert_data = get_alert_data()
+    alert_data = await get_alert_data()
     return await render_page("alerts.html", "Alerts", request, {"alert_data": alert_data})
 
 @root_router.get("/users")
 async def data(request: Request):
-    user_data = get_user_data()
+    user_data = await get_user_data()
     return await render_page("users.html", "Users", request, {"user_data": user_data})
 
 @root_router.get("/stats")
@@ -141,7 +179,7 @@ async def login(request: Request):
 async def health(request: Request):
     try:
         # Example: Check database connectivity
-        db_status = check_db_connection()  # Replace with your actual DB check logic
+        db_status = await check_db_connection_async()
         if not db_status:
             return JSONResponse(content={"status": "unhealthy", "reason": "Database unavailable"}, status_code=500)
         return JSONResponse(content={"web-status": "ok", "db-status": "ok"}, status_code=200)
@@ -159,9 +197,8 @@ async def auth(request: Request):
         "avatar_url": user["avatar_url"]
     }
 
-    insert_user({"id": user["id"], "login": user["login"], "role_id": 1})
-    mark_user_logged_in(user["login"])
-    await broadcast_user_overview()
+    await insert_user_async({"id": user["id"], "login": user["login"], "role_id": 1})
+    await mark_user_logged_in_async(user["login"])
     return RedirectResponse(url="/gates")
 
 @root_router.get("/dummy-login")
@@ -172,9 +209,8 @@ async def dummy_login(request: Request):
     }
 
     request.session['user'] = dummy_user
-    insert_user({"id": 9999, "login": dummy_user["username"], "role_id": 1})
-    mark_user_logged_in(dummy_user["username"])
-    await broadcast_user_overview()
+    await insert_user_async({"id": 9999, "login": dummy_user["username"], "role_id": 1})
+    await mark_user_logged_in_async(dummy_user["username"])
     return RedirectResponse(url="/gates")
 
 @root_router.get("/logout")
@@ -182,10 +218,9 @@ async def logout(request: Request):
     user = await get_user_from_session(request)
     if user and "username" in user:
         username = user["username"]
-        if is_user_logged_in(username):
-            mark_user_logged_out(username)
+        if await is_user_logged_in_async(username):
+            await mark_user_logged_out_async(username)
         request.session.clear()
-    await broadcast_user_overview()
     return RedirectResponse(url="/")
 
 @root_router.get("/removed")
@@ -208,7 +243,7 @@ async def get_session_username(request: Request):
 
 @root_router.get("/check-permission")
 async def check_permission_api(username: str, perm_name: str):
-    allowed = check_permission(username, perm_name)
+    allowed = await check_permission_async(username, perm_name)
     return JSONResponse(content={"allowed": allowed})
 
 # --------------S10 GROUP ENDPOINTS START-------------------
@@ -222,108 +257,182 @@ async def send_command(request: Request):
         gate = data.get("gate", "1")  # Default to gate 1 if not specified
         
         if command:
-            # Import and use MQTT client
-            from mqtt.mqtt_client import get_mqtt_client
-            mqtt_client = get_mqtt_client()
-            
-            # Publish command to specific gate
-            topic = f"jetson/{gate}/commands"
-            mqtt_client.client.publish(topic, json.dumps({"action": command}))
+            if ingestor_election.is_ingestor:
+                # Publish command to specific gate, in the payload encoding the gate uses
+                from mqtt.mqtt_client import get_mqtt_client
+                command_id = get_mqtt_client().publish_command(gate, command)
+            else:
+                # Only the ingestor worker is connected to the broker, it publishes the command for us
+                command_id = uuid.uuid4().hex
+                if not await notify_async(GATE_COMMANDS_CHANNEL, "command", {"gate": gate, "action": command, "command_id": command_id}):
+                    return JSONResponse(content={"status": "error", "message": "Command could not be forwarded"}, status_code=503)
             
             # Add to alerts system
-            from controllers.db_controller import add_alert
-            add_alert(f"Command sent to Gate {gate}: {command}", "info")
+            await add_alert_async(f"Command sent to Gate {gate}: {command}", "info")
             
-            return JSONResponse(content={"status": "sent", "gate": gate})
+            return JSONResponse(content={"status": "sent", "gate": gate, "command_id": command_id})
         else:
             return JSONResponse(content={"status": "error", "message": "No command provided"}, status_code=400)
     except Exception as e:
         print(f"Error sending command: {e}")
         return JSONResponse(content={"status": "error"}, status_code=500)
 
+@root_router.get("/commands/latency")
+async def get_command_latency():
+    """Per-gate round trip of commands, from publish to the gate's ack (kept by the ingestor worker)"""
+    mqtt_client = ingestor_client()
+    return JSONResponse(content={"gates": mqtt_client.get_command_latency() if mqtt_client else {}, **ingestor_info()})
+
 @root_router.get("/latest-capture")
-async def latest_capture():
-    """Get latest capture data from Jetson"""
-    try:
-        # Try to get from Jetson via reverse tunnel
-        import requests
-        response = requests.get("http://54.252.172.171:8080/latest-capture", timeout=5)
-        if response.status_code == 200:
-            return JSONResponse(content=response.json())
-        else:
-            # Fallback to placeholder data
-            return JSONResponse(content={
-                "capture": {
-                    "objects": [],
-                    "confidence": [],
-                    "timestamp": 0,
-                    "image_base64": "",
-                    "detections": []
-                }
-            })
-    except Exception as e:
-        print(f"Error getting latest capture: {e}")
-        # Fallback to placeholder data
-        return JSONResponse(content={
-            "capture": {
-                "objects": [],
-                "confidence": [],
-                "timestamp": 0,
-                "image_base64": "",
-                "detections": []
-            }
-        })
+async def latest_capture(gate: str = None):
+    """Latest capture of a gate (the one heard from most recently by default), shared by every browser for a moment"""
+    content = await gate_fetcher.get(gate_http_url(gate) + "/latest-capture")
+    return Response(content=content, media_type="application/json")
+
+@root_router.get("/stream/{gate_id}")
+async def stream(gate_id: str):
+    """Camera stream of a gate, relayed so every browser shares one connection to the gate"""
+    return StreamingResponse(stream_relay.watch(gate_http_url(gate_id) + "/stream"), media_type=STREAM_MEDIA_TYPE)
+
+@root_router.get("/stream-relay/stats")
+async def get_stream_relay_stats():
+    """Viewers, upstream connections and frames in, out and skipped per gate stream"""
+    return JSONResponse(content=stream_relay.get_stats())
+
+@root_router.get("/latest-capture/stats")
+async def get_latest_capture_stats():
+    """Cache hits, coalesced requests and upstream fetches of the gate HTTP proxy"""
+    return JSONResponse(content=gate_fetcher.get_stats())
+
+GATE_IMAGES = [
+    "/static/images/amur-leopard.jpg",
+    "/static/images/bongo-antelope.jpg", 
+    "/static/images/elephant.jpeg",
+    "/static/images/forest-background.jpg",
+    "/static/images/oranguton.jpg",
+    "/static/images/panda.jpg"
+]
+
+def gate_entry(gate_id, gate_info):
+    """A gate as the gates and streams pages show it, for /gates/api and the gate_state push"""
+    return {
+        "id": gate_id,
+        "status": gate_info.get("gate_status", "closed"),
+        "online_status": gate_info.get("status", "offline"),
+        # Gates 1 to 6 keep their picture, the others get one that stays the same across restarts
+        "image_url": GATE_IMAGES[(int(gate_id) - 1 if gate_id.isascii() and gate_id.isdigit() else zlib.crc32(gate_id.encode())) % len(GATE_IMAGES)],
+        "last_seen": gate_info.get("last_seen", 0)
+    }
 
 @root_router.get("/gates/api")
-async def get_gates_api():
-    """Get gates data as JSON - dynamically discovered via MQTT"""
-    try:
-        # Get discovered gates from MQTT client
-        from mqtt.mqtt_client import get_mqtt_client
-        mqtt_client = get_mqtt_client()
-        discovered_gates = mqtt_client.get_discovered_gates()
-        
-        # Create gates data from discovered gates
-        gates_data = []
-        gate_images = [
-            "/static/images/amur-leopard.jpg",
-            "/static/images/bongo-antelope.jpg", 
-            "/static/images/elephant.jpeg",
-            "/static/images/forest-background.jpg",
-            "/static/images/oranguton.jpg",
-            "/static/images/panda.jpg"
-        ]
-        
-        # Add discovered gates (up to 5)
-        for gate_id, gate_info in discovered_gates.items():
-            if len(gates_data) < 5:  # Limit to 5 gates
-                gate_data = {
-                    "id": gate_id,
-                    "status": gate_info.get("gate_status", "closed"),
-                    "online_status": gate_info.get("status", "offline"),
-                    "image_url": gate_images[int(gate_id) - 1] if gate_id.isdigit() and 1 <= int(gate_id) <= 6 else gate_images[0],
-                    "last_seen": gate_info.get("last_seen", 0)
-                }
-                gates_data.append(gate_data)
-        
-        # Sort by gate ID
-        gates_data.sort(key=lambda x: int(x["id"]) if x["id"].isdigit() else 999)
-        
-        return JSONResponse(content={"gates": gates_data})
-    except Exception as e:
-        print(f"Error getting gates data: {e}")
-        # Fallback to empty gates list
-        return JSONResponse(content={"gates": []})
+async def get_gates_api(request: Request, after: str = None, limit: int = GATES_PAGE_SIZE, status: str = None,
+                        online_status: str = None):
+    """
+    Get gates data as JSON - dynamically discovered via MQTT, one page at a time in gate order.
+    `after` returns the page after that gate id (pass the previous `next`), `status` and `online_status` keep only
+    the gates with that value. Answers 304 while the registry has not changed since the ETag the client sends.
+    """
+    # This worker's copy of the gate registry, read without a lock
+    snapshot = gate_registry.snapshot()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if snapshot.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    limit = max(1, min(limit, GATES_MAX_PAGE_SIZE))
+    gate_ids, next_gate, total = snapshot.page(limit, after, status, online_status)
+    return JSONResponse(content={
+        "gates": [gate_entry(gate_id, snapshot.gates[gate_id]) for gate_id in gate_ids],
+        "next": next_gate,
+        "total": total,
+        "version": snapshot.version
+    }, headers=headers)
+
+@root_router.get("/db/pool-stats")
+async def get_db_pool_stats():
+    """Size, waiting clients and wait times of the database connection pools"""
+    return JSONResponse(content=get_pool_stats())
+
+@root_router.get("/ingestion/stats")
+async def get_ingestion_stats():
+    """Throughput and backpressure counters of the MQTT to Postgres alert and detection ingestion"""
+    mqtt_client = ingestor_client()
+    return JSONResponse(content={**(mqtt_client.get_ingestion_stats() if mqtt_client else {}), **ingestor_info()})
+
+@root_router.get("/ws/stats")
+async def get_websocket_stats():
+    """Connected live-data sockets, their send queues and how many slow ones were closed"""
+    return JSONResponse(content=live_broadcaster.get_stats())
+
+@root_router.get("/users/cache-stats")
+async def get_user_overview_cache_stats():
+    """Hits, reloads and invalidations of the users page cache"""
+    return JSONResponse(content=user_overview_cache.get_stats())
+
+@root_router.get("/gates/events")
+async def get_gate_events(after: int = 0):
+    """Gate online/offline transitions after the given sequence number (kept by the ingestor worker)"""
+    mqtt_client = ingestor_client()
+    events = mqtt_client.get_gate_events(after) if mqtt_client else []
+    return JSONResponse(content={"events": events, "last_seq": events[-1]["seq"] if events else after, **ingestor_info()})
+
+@root_router.get("/workers/state")
+async def get_worker_state():
+    """Whether this worker is the MQTT ingestor, its gate registry copy and its notification listener"""
+    from controllers.db_notifications import get_notification_listener
+    return JSONResponse(content={
+        "election": ingestor_election.get_stats(),
+        "gate_registry": {"gates": len(gate_registry.snapshot()), "version": gate_registry.version},
+        "notifications": get_notification_listener().get_stats(),
+        "websockets": live_broadcaster.get_stats()["clients"]
+    })
+
+@root_router.get("/stats/detections")
+async def get_detection_stats(hours: int = 24, gate_no: int = None):
+    """Detections per hour, gate and species over the last `hours` hours, with per-species and overall totals"""
+    hours = max(1, min(hours, 24 * 366))
+    rows = await get_detection_rollups_async(datetime.now() - timedelta(hours=hours), gate_no)
+
+    hourly = []
+    species = {}
+    totals = {"detections": 0, "threats": 0, "endangered": 0, "threats_and_endangered": 0}
+    for bucket, row_gate, animal_name, detections, threats, endangered, both in rows:
+        hourly.append({
+            "bucket": bucket.isoformat(),
+            "gate_no": row_gate,
+            "animal_name": animal_name,
+            "detections": detections
+        })
+        species[animal_name] = species.get(animal_name, 0) + detections
+        totals["detections"] += detections
+        totals["threats"] += threats
+        totals["endangered"] += endangered
+        totals["threats_and_endangered"] += both
+
+    total = totals["detections"]
+    for key in ("threats", "endangered", "threats_and_endangered"):
+        totals[f"percent_{key}"] = round(totals[key] * 100 / total) if total else 0
+
+    return JSONResponse(content={
+        "hours": hours,
+        "gate_no": gate_no,
+        "hourly": hourly,
+        "species": [{"animal_name": name, "detections": count} for name, count in sorted(species.items(), key=lambda item: -item[1])],
+        "totals": totals
+    })
 
 @root_router.get("/alerts/api")
-async def get_alerts_api():
-    """Get alerts data as JSON"""
+async def get_alerts_api(after: int = None, before: int = None, limit: int = ALERTS_PAGE_SIZE):
+    """
+    Get alerts data as JSON, one page at a time.
+    `after` returns only the alerts newer than that alert_no (pass the previous `last_alert_no` to poll for new ones),
+    `before` returns the page older than that alert_no, neither returns the newest page.
+    """
+    limit = max(1, min(limit, ALERTS_MAX_PAGE_SIZE))
     try:
-        alert_data = get_alert_data()
-        return JSONResponse(content={"alerts": alert_data})
+        return JSONResponse(content=await get_alert_page(after, before, limit))
     except Exception as e:
         print(f"Error getting alerts data: {e}")
-        return JSONResponse(content={"alerts": []})
+        return JSONResponse(content={"alerts": [], "has_more": False, "last_alert_no": after or 0, "first_alert_no": before})
 
 # --------------S10 GROUP ENDPOINTS END-------------------
 
@@ -333,40 +442,85 @@ async def get_alerts_api():
 # ---------------------------------
 
 async def broadcast_data(event: str, data: dict):
-    disconnected_clients = []
+    # Only queues the event, every socket is sent to by its own task (see live_broadcast.py)
+    live_broadcaster.broadcast(event, data)
+
+def reload_gate_registry():
+    rows = get_gate_registry()
+    if rows is not None:
+        gate_registry.load(rows)
+    return rows is not None
+
+def handle_live_event(payload):
+    """
+    Callback of the live_events notifications, on the notification listener thread of every worker.
+    Gate states update this worker's registry, every event is pushed to this worker's sockets. Gate states are
+    shaped like the /gates/api entries so the pages can merge them as they are.
+    """
+    if payload is None:
+        # (Re)connected, gate changes may have been missed in between
+        reload_gate_registry()
+        return
 
-    for ws in list(websocket_state.keys()):
-        try:
-            if ws.application_state == WebSocketState.CONNECTED:
-                await ws.send_json({"event": event, "data": data})
-            else:
-                disconnected_clients.append(ws)
-        except Exception as e:
-            print(f"Failed to send to a client: {e}")
-            disconnected_clients.append(ws)
+    message = json.loads(payload)
+    event, data = message["event"], message["data"]
+    if event == "gate_registry_reset":
+        # A new ingestor was elected and marked every gate offline
+        if reload_gate_registry():
+            for gate_id, gate_info in gate_registry.snapshot().gates.items():
+                live_broadcaster.publish_threadsafe("gate_state", gate_entry(gate_id, gate_info))
+        return
+    if event == "kick_user":
+        if live_broadcaster.loop:
+            asyncio.run_coroutine_threadsafe(kick_user(data["username"], None), live_broadcaster.loop)
+        return
+    if event == "gate_address":
+        gate_registry.set_http_url(data["gate_id"], data["http_url"])
+        return
+    if event == "gate_state":
+        gate_registry.update(data["gate_id"], data)
+        data = gate_entry(data["gate_id"], data)
+    elif event == "capture":
+        # Queued before the event itself, so the pages it makes refresh get the new capture
+        gate_fetcher.invalidate_threadsafe(gate_http_url(data.get("gate_id")) + "/latest-capture")
+    live_broadcaster.publish_threadsafe(event, data)
+
+def handle_gate_command(payload):
+    """Callback of the gate_commands notifications: the ingestor publishes the commands other workers received"""
+    if payload is None or not ingestor_election.is_ingestor:
+        return
+    data = json.loads(payload)["data"]
+    from mqtt.mqtt_client import get_mqtt_client
+    get_mqtt_client().publish_command(data["gate"], data["action"], data["command_id"])
 
-    # Clean up dead connections
-    for ws in disconnected_clients:
-        websocket_state.pop(ws, None)
+def ingestor_client():
+    """The MQTT client if this worker is the ingestor, None on the other workers"""
+    if not ingestor_election.is_ingestor:
+        return None
+    from mqtt.mqtt_client import get_mqtt_client
+    return get_mqtt_client()
 
-def fetch_user_data():
-        return {
-            "user_data": get_user_data(),
-            "roles": get_all_roles()
-        }
+def ingestor_info():
+    return {"ingestor": ingestor_election.is_ingestor, "pid": os.getpid()}
 
-def fetch_alerts_data():
+async def fetch_user_data():
+    return await user_overview_cache.get()
+
+async def fetch_alerts_data():
     return {
-        "alert_data": get_alert_data()
+        "alert_data": await get_alert_data()
     }
 
 async def broadcast_alert_data():
-    alert_data = fetch_alerts_data()
+    alert_data = await fetch_alerts_data()
     await broadcast_data("alert_data", alert_data)
 
-async def broadcast_user_overview():
-    user_data = fetch_user_data()
-    await broadcast_data("user_overview", user_data)
+async def broadcast_user_overview(user_data: dict = None):
+    await broadcast_data("user_overview", user_data or await fetch_user_data())
+
+# Logins, logouts, role changes and removals are pushed by the user_overview_changed notification, which reaches
+# every worker, instead of a broadcast after each write (that would also serve the snapshot from before the write)
+user_overview_cache = UserOverviewCache(load_user_overview, on_change=broadcast_user_overview)
 
 # --------------------
 # WebSocket Functions
@@ -379,9 +533,9 @@ async def kick_user(username: str, current_user: str):
     for ws, state in list(websocket_state.items()):
         if state.get("username") == username:
             try:
-                # Send a redirect event only to the WebSocket corresponding to the user
-                await ws.send_json({"event": "redirect", "username": username, "url": "/removed"})
-                await ws.close()
+                # Send a redirect event only to the WebSocket corresponding to the user, then close it
+                live_broadcaster.send(ws, {"event": "redirect", "username": username, "url": "/removed"})
+                live_broadcaster.close(ws)
                 del websocket_state[ws]
                 print(f"User {username} has been kicked out and connection closed.")
             except Exception as e:
@@ -408,11 +562,11 @@ async def remove_selected_user(request: Request):
                 status_code=400
             )
         
-        remove_user(username_to_remove)
+        await remove_user_async(username_to_remove)
         print(f"User {username_to_remove} removed from database.")
 
-        await kick_user(username_to_remove, current_user)
-        await broadcast_user_overview()
+        # The user's sockets can be on any worker
+        await notify_async(LIVE_EVENTS_CHANNEL, "kick_user", {"username": username_to_remove})
         return JSONResponse({"message": f"User {username_to_remove} removed and kicked out!"})
     except Exception as e:
         print(f"Error removing user: {e}")
@@ -424,14 +578,14 @@ async def push_data_from_gate_to_db(gate_data: GateData):
     gate_status = gate_data.gate_status
     
     # Call the function to add gate data
-    add_gate(gate_no, gate_status)
+    await add_gate_async(gate_no, gate_status)
     
     return JSONResponse({"message": f"Gate {gate_no} status {gate_status} added successfully"})
 
 # add data to database for opening and closing gates
 @root_router.post("/update_gate_data")
 async def update_gate_data(payload: updateGateData):
-    update_gate_status(payload.gate_no, payload.new_status)
+    await update_gate_status_async(payload.gate_no, payload.new_status)
     return JSONResponse({"message": f"Gate {payload.gate_no} status {payload.new_status} updated successfully"})
 
 # -------------------
@@ -441,6 +595,7 @@ async def update_gate_data(payload: updateGateData):
 async def websocket_live_data(websocket: WebSocket):
     from controllers.websocket_events import event_registry 
     await websocket.accept()
+    live_broadcaster.register(websocket)
 
     # -------------------------------------
     # Send Up to Date Data to Web Socket
@@ -450,7 +605,7 @@ async def websocket_live_data(websocket: WebSocket):
     if alert_handler:
         result = await alert_handler(websocket, {})
         if result:
-            await websocket.send_json(result)
+            live_broadcaster.send(websocket, result)
 
     # ----------------------------------------------
     # Send Data to WebSocket After Event Recieved
@@ -465,9 +620,9 @@ async def websocket_live_data(websocket: WebSocket):
             if handler:
                 result = await handler(websocket, data)
                 if result:
-                    await websocket.send_json(result)
+                    live_broadcaster.send(websocket, result)
             else:
-                await websocket.send_json({
+                live_broadcaster.send(websocket, {
                     "event": "error",
                     "message": f"Unknown event: {event}"
                 })
@@ -479,6 +634,7 @@ async def websocket_live_data(websocket: WebSocket):
         pass
     finally:
         websocket_state.pop(websocket, None)
+        await live_broadcaster.unregister(websocket)
         try:
             if websocket.client_state == WebSocketState.CONNECTED:
                 await websocket.close()
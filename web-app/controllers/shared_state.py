@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Shared state for running the Web Application with several uvicorn workers
+One elected worker runs the MQTT client, every worker gets its events through Postgres LISTEN/NOTIFY
+"""
+
+import os
+import threading
+import time
+import logging
+
+import psycopg
+
+from controllers.db_controller import DATABASE_URL, publish_live_events, reset_gate_registry
+from mqtt.alert_ingestion import BatchIngestor
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock held by the worker that runs the MQTT client ("SG" + 1)
+INGESTOR_LOCK_KEY = int(os.getenv("INGESTOR_LOCK_KEY", "534701"))
+
+class IngestorElection:
+    """
+    Elects the one worker that runs the MQTT client, so every MQTT message is inserted once whatever the number
+    of workers.
+
+    The ingestor is the worker holding a session advisory lock on its own connection. Postgres releases the lock
+    when that connection goes away (the worker exits or crashes), and another worker takes over at its next
+    attempt, within `retry_interval` seconds. The holder checks its connection at the same interval and steps
+    down as soon as it fails, before anyone else can get the lock.
+
+    :param on_elected: Called when this worker becomes the ingestor, on the election thread
+    :param on_demoted: Called when it stops being the ingestor
+    """
+    def __init__(self, on_elected, on_demoted, retry_interval=5.0):
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.retry_interval = retry_interval
+        self.is_ingestor = False
+        self.stats = {"elected": 0, "demoted": 0, "errors": 0, "elected_at": None}
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout=self.retry_interval + 2)
+
+    def get_stats(self):
+        return dict(self.stats, pid=os.getpid(), is_ingestor=self.is_ingestor)
+
+    def _call(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in ingestor election callback: {e}")
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+                    while not self.stopping.is_set():
+                        if not self.is_ingestor:
+                            if conn.execute("SELECT pg_try_advisory_lock(%s);", (INGESTOR_LOCK_KEY,)).fetchone()[0]:
+                                self.is_ingestor = True
+                                self.stats["elected"] += 1
+                                self.stats["elected_at"] = time.time()
+                                logger.info(f"Worker {os.getpid()} is the MQTT ingestor")
+                                self._call(self.on_elected)
+                        else:
+                            # The lock lives as long as this connection
+                            conn.execute("SELECT 1;")
+                        self.stopping.wait(self.retry_interval)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Ingestor election connection failed: {e}")
+            if self.is_ingestor:
+                self.is_ingestor = False
+                self.stats["demoted"] += 1
+                logger.warning(f"Worker {os.getpid()} is no longer the MQTT ingestor")
+                self._call(self.on_demoted)
+            self.stopping.wait(self.retry_interval)
+
+class LiveEventPublisher(BatchIngestor):
+    """
+    Event sink of the MQTT client on the ingestor: sends its gate_state, capture and new_alerts events to every
+    worker as live_events notifications (see publish_live_events). Batched on a writer thread like the alerts, so
+    the MQTT thread never waits for Postgres; the short flush interval keeps the added latency to a few ms.
+    """
+    def __init__(self, batch_size=200, flush_interval=0.02, max_queue=10000, put_timeout=0.1, max_retries=3):
+        super().__init__(publish_live_events, batch_size, flush_interval, max_queue, put_timeout, max_retries)
+
+    def publish(self, event, data):
+        """Called on the MQTT and ingestion threads"""
+        if event == "gate_state":
+            # The liveness deadline is this process's monotonic clock, meaningless anywhere else
+            data = {key: value for key, value in data.items() if key != "deadline"}
+        return self.submit_row((event, data))
+
+# Global instances
+live_event_publisher = None
+
+def start_ingestor():
+    """on_elected: connect this worker's MQTT client to the broker and send its events to every worker"""
+    global live_event_publisher
+    from mqtt.mqtt_client import get_mqtt_client
+    if live_event_publisher is None:
+        live_event_publisher = LiveEventPublisher()
+    # The previous ingestor's view of the gates is gone with it, they come back online with their next message
+    reset_gate_registry()
+    mqtt_client = get_mqtt_client()
+    mqtt_client.set_event_sink(live_event_publisher.publish)
+    mqtt_client.start_mqtt()
+
+def stop_ingestor():
+    """on_demoted: another worker may be the ingestor already, stop receiving MQTT messages"""
+    from mqtt.mqtt_client import get_mqtt_client
+    get_mqtt_client().stop_mqtt()
+
+ingestor_election = IngestorElection(start_ingestor, stop_ingestor)
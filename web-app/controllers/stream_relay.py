@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Camera stream relay for the Web Application
+One upstream MJPEG connection per gate, whatever the number of browsers watching it
+"""
+
+import re
+import time
+import asyncio
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Boundary of the multipart stream sent to the browsers
+STREAM_BOUNDARY = "frame"
+STREAM_MEDIA_TYPE = f"multipart/x-mixed-replace; boundary={STREAM_BOUNDARY}"
+
+class MJPEGParser:
+    """
+    Splits a multipart/x-mixed-replace byte stream into its JPEG frames, fed with chunks as they arrive.
+
+    Parts are read by their Content-Length when they have one (the gates always send it), otherwise up to the next
+    boundary. Anything before the first boundary and any malformed part are skipped.
+    """
+    def __init__(self, boundary=STREAM_BOUNDARY, max_frame=8 * 1024 * 1024):
+        self.delimiter = b"--" + boundary.encode()
+        self.max_frame = max_frame
+        self.buffer = bytearray()
+
+    @staticmethod
+    def boundary_of(content_type, default=STREAM_BOUNDARY):
+        match = re.search(r'boundary="?([^";]+)"?', content_type or "")
+        return match.group(1) if match else default
+
+    def feed(self, chunk):
+        """:return: The frames completed by this chunk"""
+        self.buffer += chunk
+        frames = []
+        while True:
+            start = self.buffer.find(self.delimiter)
+            if start < 0:
+                # Keep what could be the beginning of a delimiter
+                del self.buffer[:max(0, len(self.buffer) - len(self.delimiter))]
+                return frames
+            headers_end = self.buffer.find(b"\r\n\r\n", start)
+            if headers_end < 0:
+                del self.buffer[:start]
+                return frames
+
+            body_start = headers_end + 4
+            match = re.search(rb"content-length:\s*(\d+)", bytes(self.buffer[start:headers_end]), re.IGNORECASE)
+            if match:
+                body_end = body_start + int(match.group(1))
+            else:
+                body_end = self.buffer.find(self.delimiter, body_start)
+                if body_end < 0:
+                    body_end = len(self.buffer) + 1  # incomplete
+                else:
+                    body_end -= 2  # the CRLF in front of the next delimiter
+
+            if body_end - body_start > self.max_frame:
+                logger.warning(f"Dropping a {body_end - body_start} bytes stream part")
+                del self.buffer[:body_start]
+                continue
+            if body_end > len(self.buffer):
+                del self.buffer[:start]
+                return frames
+            frames.append(bytes(self.buffer[body_start:body_end]))
+            del self.buffer[:body_end]
+
+def encode_part(frame):
+    """A frame as one part of the stream sent to the browsers"""
+    return (b"--" + STREAM_BOUNDARY.encode() + b"\r\nContent-Type: image/jpeg\r\nContent-Length: "
+            + str(len(frame)).encode() + b"\r\n\r\n" + frame + b"\r\n")
+
+class _Viewer:
+    """A browser watching a stream. Holds only the newest frame it has not sent yet."""
+    def __init__(self):
+        self.part = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, part):
+        if self.part is not None:
+            # Still sending an older one: that one is skipped, never queued
+            self.dropped += 1
+        self.part = part
+        self.ready.set()
+
+class _GateStream:
+    def __init__(self, url):
+        self.url = url
+        self.viewers = set()
+        self.task = None
+        self.close_handle = None
+        self.last_part = None
+        self.stats = {"upstream_connects": 0, "upstream_errors": 0, "bytes_in": 0, "frames_in": 0, "opened_at": None}
+
+class StreamRelay:
+    """
+    Relays each gate's MJPEG /stream to any number of browsers.
+
+    The upstream connection opens with the first viewer of a gate and closes `linger` seconds after the last one
+    leaves (a page reload does not reconnect to the gate). Each frame is parsed and framed once, every viewer is
+    sent the same bytes.
+
+    A viewer is only ever offered the newest frame: one that cannot keep up skips frames instead of building a
+    backlog, and never slows the gate or the other viewers down.
+
+    While viewers remain, a lost upstream is reopened with a backoff of 1 to `max_backoff` seconds; the viewers
+    keep the last frame meanwhile.
+
+    Runs on the event loop.
+
+    :param linger: Seconds the upstream stays open without viewers
+    :param timeout: Upstream connect and read timeout in seconds
+    """
+    def __init__(self, linger=1.0, timeout=10.0, max_backoff=10.0):
+        self.linger = linger
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.streams = {}  # {url: _GateStream}
+        self.client = None  # created on the event loop
+        self.stats = {"viewers_served": 0, "frames_out": 0, "frames_dropped": 0, "bytes_out": 0}
+
+    async def watch(self, url):
+        """
+        Async generator of the stream parts for one viewer of `url`, for a StreamingResponse.
+        The viewer leaves when the generator is closed (the browser went away).
+        """
+        stream = self.streams.get(url)
+        if stream is None:
+            stream = self.streams[url] = _GateStream(url)
+        viewer = _Viewer()
+        self._join(stream, viewer)
+        try:
+            while True:
+                await viewer.ready.wait()
+                viewer.ready.clear()
+                part, viewer.part = viewer.part, None
+                yield part
+                viewer.sent += 1
+                self.stats["frames_out"] += 1
+                self.stats["bytes_out"] += len(part)
+        finally:
+            self._leave(stream, viewer)
+
+    async def close(self):
+        for stream in list(self.streams.values()):
+            if stream.task:
+                stream.task.cancel()
+        self.streams.clear()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def get_stats(self):
+        gates = {}
+        for url, stream in self.streams.items():
+            gates[url] = dict(
+                stream.stats,
+                viewers=len(stream.viewers),
+                upstream_open=stream.task is not None and not stream.task.done()
+            )
+        dropped = sum(viewer.dropped for stream in self.streams.values() for viewer in stream.viewers)
+        return dict(self.stats, frames_dropped=self.stats["frames_dropped"] + dropped, gates=gates)
+
+    def _join(self, stream, viewer):
+        self.stats["viewers_served"] += 1
+        if stream.close_handle:
+            stream.close_handle.cancel()
+            stream.close_handle = None
+        stream.viewers.add(viewer)
+        if stream.last_part is not None:
+            viewer.offer(stream.last_part)
+        if stream.task is None or stream.task.done():
+            stream.task = asyncio.create_task(self._upstream(stream))
+
+    def _leave(self, stream, viewer):
+        stream.viewers.discard(viewer)
+        self.stats["frames_dropped"] += viewer.dropped
+        if not stream.viewers and stream.close_handle is None:
+            stream.close_handle = asyncio.get_running_loop().call_later(self.linger, self._close_idle, stream)
+
+    def _close_idle(self, stream):
+        stream.close_handle = None
+        if stream.viewers:
+            return
+        if stream.task:
+            stream.task.cancel()
+        if self.streams.get(stream.url) is stream:
+            del self.streams[stream.url]
+
+    async def _upstream(self, stream):
+        if self.client is None:
+            self.client = httpx.AsyncClient(timeout=self.timeout)
+        backoff = 1.0
+        while stream.viewers:
+            try:
+                async with self.client.stream("GET", stream.url) as response:
+                    response.raise_for_status()
+                    stream.stats["upstream_connects"] += 1
+                    stream.stats["opened_at"] = time.time()
+                    backoff = 1.0
+                    parser = MJPEGParser(MJPEGParser.boundary_of(response.headers.get("content-type")))
+                    async for chunk in response.aiter_raw():
+                        stream.stats["bytes_in"] += len(chunk)
+                        for frame in parser.feed(chunk):
+                            stream.stats["frames_in"] += 1
+                            stream.last_part = encode_part(frame)
+                            for viewer in stream.viewers:
+                                viewer.offer(stream.last_part)
+                logger.warning(f"Stream {stream.url} ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stream.stats["upstream_errors"] += 1
+                logger.warning(f"Stream {stream.url} failed: {e!r}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+# Global instance
+stream_relay = StreamRelay()
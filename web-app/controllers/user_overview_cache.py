@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+User overview cache for the Web Application
+Serves the users page data from memory, reloaded on the user_overview_changed notification
+"""
+
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserOverviewCache:
+    """
+    Read-through cache of what the users page shows: the user_overview rows and the role names.
+
+    `invalidate` is subscribed to the user_overview_changed notification (see user_schema.sql). Every worker has
+    its own listener, so each one hears about a committed change once, reloads once and pushes the new snapshot to
+    its own sockets through `on_change`. Notifications arriving while a reload is running are folded into one more
+    reload, never one per notification.
+
+    Page views, websocket events and broadcasts in between are served the cached snapshot.
+
+    :param loader: Coroutine function returning {"user_data": [...], "roles": [...]}, or None if it failed
+    :param on_change: Coroutine function called with the snapshot after a notification-driven reload
+    """
+    def __init__(self, loader, on_change=None):
+        self.loader = loader
+        self.on_change = on_change
+        self.version = 0            # bumped by every invalidation
+        self.snapshot = None
+        self.snapshot_version = -1  # version the snapshot was loaded at
+        self.lock = None            # created on the event loop, asyncio primitives bind to the loop on Python 3.9
+        self.loop = None
+        self.refresh_pending = False
+        self.state_lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "failed_loads": 0, "invalidations": 0, "pushes": 0}
+
+    def attach(self, loop):
+        """Event loop the notification-driven reloads run on, set when the app starts"""
+        self.loop = loop
+        self.lock = None
+
+    async def get(self):
+        """Current snapshot, loaded if a change was notified since the last load"""
+        if self.snapshot_version == self.version:
+            self.stats["hits"] += 1
+            return self.snapshot
+
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            # Loaded by someone else while this one was waiting
+            if self.snapshot_version == self.version:
+                self.stats["hits"] += 1
+                return self.snapshot
+
+            # A notification during the query leaves the snapshot tagged with the older version, so it is reloaded
+            version = self.version
+            snapshot = await self.loader()
+            if snapshot is None:
+                self.stats["failed_loads"] += 1
+                return self.snapshot or {"user_data": [], "roles": []}
+            self.snapshot, self.snapshot_version = snapshot, version
+            self.stats["loads"] += 1
+            return snapshot
+
+    def invalidate(self, _payload=None):
+        """Drop the snapshot and schedule a reload and push. Called on the notification listener thread."""
+        with self.state_lock:
+            self.version += 1
+            self.stats["invalidations"] += 1
+            if self.refresh_pending or self.loop is None or self.loop.is_closed():
+                return
+            self.refresh_pending = True
+        self.loop.call_soon_threadsafe(lambda: asyncio.create_task(self._refresh()))
+
+    def get_stats(self):
+        return dict(self.stats, version=self.version, fresh=self.snapshot_version == self.version)
+
+    async def _refresh(self):
+        with self.state_lock:
+            self.refresh_pending = False
+        snapshot = await self.get()
+        if self.on_change:
+            try:
+                await self.on_change(snapshot)
+                self.stats["pushes"] += 1
+            except Exception as e:
+                logger.error(f"Error pushing the user overview: {e}")
@@ -1,11 +1,100 @@
 -- Add a table for animals potentially detected by gate
+-- Partitioned by month so old detections can be dropped a whole partition at a time (see the retention
+-- functions below). The primary key has to include the partition key.
 CREATE TABLE IF NOT EXISTS detected_animals (
-    animal_id SERIAL PRIMARY KEY,
+    animal_id SERIAL,
+    gate_no INTEGER, -- NULL when the gate is unknown
     animal_type VARCHAR(255) NOT NULL,
     animal_name VARCHAR(255) NOT NULL,
     is_endangered BOOLEAN NOT NULL,
     is_threat BOOLEAN NOT NULL,
-    time_stamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    confidence REAL, -- best confidence of the model for this detection
+    capture_id BIGINT, -- capture the detection came from, see /latest-capture on the gate
+    time_stamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (animal_id, time_stamp)
+) PARTITION BY RANGE (time_stamp);
+
+-- Rows arrive in time order, so a BRIN index on time stays tiny and still skips most of each partition
+CREATE INDEX IF NOT EXISTS detected_animals_time_stamp_brin ON detected_animals USING BRIN (time_stamp);
+
+-- Catches rows outside every monthly partition (e.g. a gate with a wrong clock) instead of rejecting them.
+-- create_detection_partitions() moves them out when their month gets a partition.
+CREATE TABLE IF NOT EXISTS detected_animals_default PARTITION OF detected_animals DEFAULT;
+
+-- Metadata of every species the gates can detect. The web-app caches this table and reloads it on the
+-- species_changed notification, names the models report that are not in here are not stored as detections.
+CREATE TABLE IF NOT EXISTS species (
+    animal_name VARCHAR(255) PRIMARY KEY,
+    animal_type VARCHAR(255) NOT NULL,
+    is_endangered BOOLEAN NOT NULL DEFAULT FALSE,
+    is_threat BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE OR REPLACE FUNCTION trigger_notify_species_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('species_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS species_changed ON species;
+CREATE TRIGGER species_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON species
+FOR EACH STATEMENT
+EXECUTE FUNCTION trigger_notify_species_changed();
+
+INSERT INTO species (animal_name, animal_type, is_endangered, is_threat)
+VALUES
+    -- Animal classes of the COCO model (yolov5s)
+    ('Bird', 'Bird', FALSE, FALSE),
+    ('Cat', 'Mammal', FALSE, FALSE),
+    ('Dog', 'Mammal', FALSE, FALSE),
+    ('Horse', 'Mammal', FALSE, FALSE),
+    ('Sheep', 'Mammal', FALSE, FALSE),
+    ('Cow', 'Mammal', FALSE, FALSE),
+    ('Elephant', 'Mammal', TRUE, FALSE),
+    ('Bear', 'Mammal', FALSE, TRUE),
+    ('Zebra', 'Mammal', FALSE, FALSE),
+    ('Giraffe', 'Mammal', FALSE, FALSE),
+    -- Classes of the marsupial model (marsupial16s)
+    ('Swamp Wallaby', 'Mammal', FALSE, FALSE),
+    ('Common Brushtail Possum', 'Mammal', FALSE, FALSE),
+    ('Eastern Grey Kangaroo', 'Mammal', FALSE, FALSE),
+    ('Common Wombat', 'Mammal', FALSE, FALSE),
+    ('Red-necked Wallaby', 'Mammal', FALSE, FALSE),
+    ('Rattus sp.', 'Mammal', FALSE, FALSE),
+    ('Red Fox', 'Mammal', FALSE, TRUE),
+    ('Superb Lyrebird', 'Bird', FALSE, FALSE),
+    ('Australian Brush-turkey', 'Bird', FALSE, FALSE),
+    ('Fallow Deer', 'Mammal', FALSE, FALSE),
+    ('Long-nosed Bandicoot', 'Mammal', FALSE, FALSE),
+    ('Short-eared Brushtail Possum', 'Mammal', FALSE, FALSE),
+    ('Euro', 'Mammal', FALSE, FALSE),
+    ('White-winged Chough', 'Bird', FALSE, FALSE),
+    ('Pig', 'Mammal', FALSE, TRUE),
+    ('Red-necked Pademelon', 'Mammal', FALSE, FALSE),
+    -- Species of the mock data below
+    ('Amur Leopard', 'Mammal', TRUE, TRUE),
+    ('Black Rhino', 'Mammal', TRUE, FALSE),
+    ('Orangutan', 'Mammal', TRUE, FALSE),
+    ('Giant Panda', 'Mammal', TRUE, FALSE),
+    ('Asian Elephant', 'Mammal', TRUE, FALSE),
+    ('Fox', 'Mammal', FALSE, FALSE),
+    ('Snow Leopard', 'Mammal', TRUE, TRUE)
+ON CONFLICT (animal_name) DO NOTHING;
+
+-- Hourly detections per gate and species, kept up to date by the detected_animals triggers.
+-- gate_no 0 stands for detections without a gate. Rollups outlive the raw partitions, the stats read from here.
+CREATE TABLE IF NOT EXISTS detections_hourly (
+    bucket TIMESTAMP NOT NULL,
+    gate_no INTEGER NOT NULL,
+    animal_name VARCHAR(255) NOT NULL,
+    detections BIGINT NOT NULL DEFAULT 0,
+    threats BIGINT NOT NULL DEFAULT 0,
+    endangered BIGINT NOT NULL DEFAULT 0,
+    threats_and_endangered BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, gate_no, animal_name)
 );
 
 -- Creating some predictable data for alerts
@@ -19,6 +108,10 @@ CREATE TABLE IF NOT EXISTS alerts (
     date_and_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Alerts are paged by keyset on alert_no, which the primary key index already covers.
+-- Time range queries use this one.
+CREATE INDEX IF NOT EXISTS alerts_date_and_time_idx ON alerts (date_and_time);
+
 -- Mock data for testing alerts
 INSERT INTO alerts (alert_desc, alert_level)
 VALUES
@@ -39,40 +132,23 @@ CREATE TABLE IF NOT EXISTS gates (
     gate_no_closes BIGINT DEFAULT 0
 );
 
+-- Gates discovered over MQTT as the elected ingestor worker last saw them (see shared_state.py). Every web-app
+-- worker keeps a copy in memory, loaded from here and kept current by the live_events notifications.
+CREATE TABLE IF NOT EXISTS gate_registry (
+    gate_id VARCHAR(64) PRIMARY KEY,
+    status VARCHAR(16) NOT NULL DEFAULT 'offline',      -- online or offline
+    gate_status VARCHAR(32) NOT NULL DEFAULT 'unknown', -- what the gate last reported (open, closed, ...)
+    last_seen DOUBLE PRECISION NOT NULL DEFAULT 0,      -- unix time of the last status change
+    http_url VARCHAR(255),                              -- the gate's HTTP server, NULL for the shared reverse tunnel
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Table for the histogram about the animals (Animals vs Count)
 CREATE TABLE IF NOT EXISTS animal_name_vs_count (
     animal_name VARCHAR(255) PRIMARY KEY,
     animal_count BIGINT NOT NULL DEFAULT 0
 );
--- Function that counts the animal_name inside detected_animals table
-CREATE OR REPLACE FUNCTION upsert_animal_name_vs_count()
-RETURNS void AS $$
-BEGIN
-    -- Loop through aggregated data and upsert
-    INSERT INTO animal_name_vs_count (animal_name, animal_count)
-    SELECT
-        animal_name,
-        COUNT(*) AS animal_count
-    FROM detected_animals
-    GROUP BY animal_name
-    ON CONFLICT (animal_name)
-    DO UPDATE SET animal_count = EXCLUDED.animal_count;
-END;
-$$ LANGUAGE plpgsql;
--- Trigger Function which will update the animal_name_vs_count when a new animal gets inserted into
--- detected_animals
-CREATE OR REPLACE FUNCTION trigger_update_animal_count()
-RETURNS TRIGGER AS $$
-BEGIN
-    PERFORM upsert_animal_name_vs_count();
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
 
-CREATE TRIGGER update_animal_count_trigger
-AFTER INSERT ON detected_animals
-FOR EACH STATEMENT
-EXECUTE FUNCTION trigger_update_animal_count();
 -- Table showing count of total animals detected, threats and endangered and both a threat and endangered
 -- Make a table called var_stats table...
 -- Make key value table called var_stats where it stores stats about total animals detected, total threats, total endangered, and total threats and endangered
@@ -84,60 +160,397 @@ CREATE TABLE IF NOT EXISTS var_stats (
     value BIGINT NOT NULL DEFAULT 0
 );
 
-CREATE OR REPLACE FUNCTION refresh_var_stats()
+-- animal_name_vs_count, var_stats and detections_hourly are maintained incrementally. Every INSERT, UPDATE or
+-- DELETE statement on detected_animals aggregates only the rows it touched (its transition tables) and adds the
+-- difference to the counters, so the cost of an insert no longer grows with the size of the table.
+-- backfill_detection_stats() rebuilds them from scratch, check_detection_stats() reports any drift.
+
+-- Recompute the percentages from the counters, O(1)
+CREATE OR REPLACE FUNCTION refresh_var_stats_percentages()
 RETURNS void AS $$
 DECLARE
     total_count BIGINT;
     threat_count BIGINT;
-    threat_count_percent NUMERIC;
     endangered_count BIGINT;
-    endangered_count_percent NUMERIC;
     both_count BIGINT;
-    both_count_percent NUMERIC;
 BEGIN
-    SELECT COUNT(*) INTO total_count from detected_animals;
-    SELECT COUNT(*) INTO threat_count FROM detected_animals WHERE is_threat;
-    SELECT COUNT(*) INTO endangered_count FROM detected_animals WHERE is_endangered;
-    SELECT COUNT(*) INTO both_count FROM detected_animals WHERE is_threat AND is_endangered;
-
-    IF total_count > 0 THEN
-        threat_count_percent := (threat_count::NUMERIC / total_count) * 100;
-        endangered_count_percent := (endangered_count::NUMERIC / total_count) * 100;
-        both_count_percent := (both_count::NUMERIC / total_count) * 100;
-    ELSE
-        threat_count_percent := 0;
-        endangered_count_percent := 0;
-        both_count_percent := 0;
+    SELECT
+        COALESCE(MAX(value) FILTER (WHERE key = 'total_animals'), 0),
+        COALESCE(MAX(value) FILTER (WHERE key = 'total_threats'), 0),
+        COALESCE(MAX(value) FILTER (WHERE key = 'total_endangered'), 0),
+        COALESCE(MAX(value) FILTER (WHERE key = 'total_threats_and_endangered'), 0)
+    INTO total_count, threat_count, endangered_count, both_count
+    FROM var_stats;
+
+    INSERT INTO var_stats (key, value) VALUES
+        ('percent_threats', CASE WHEN total_count > 0 THEN ((threat_count::NUMERIC / total_count) * 100)::BIGINT ELSE 0 END),
+        ('percent_endangered', CASE WHEN total_count > 0 THEN ((endangered_count::NUMERIC / total_count) * 100)::BIGINT ELSE 0 END),
+        ('percent_both', CASE WHEN total_count > 0 THEN ((both_count::NUMERIC / total_count) * 100)::BIGINT ELSE 0 END)
+    ON CONFLICT (key)
+    DO UPDATE SET value = EXCLUDED.value;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Add a difference to the var_stats counters (negative for deleted rows)
+CREATE OR REPLACE FUNCTION apply_var_stats_delta(total_delta BIGINT, threat_delta BIGINT, endangered_delta BIGINT, both_delta BIGINT)
+RETURNS void AS $$
+BEGIN
+    IF total_delta = 0 THEN
+        RETURN;
     END IF;
 
-    -- Upsert values
     INSERT INTO var_stats (key, value) VALUES
+        ('total_animals', total_delta),
+        ('total_threats', threat_delta),
+        ('total_endangered', endangered_delta),
+        ('total_threats_and_endangered', both_delta)
+    ON CONFLICT (key)
+    DO UPDATE SET value = var_stats.value + EXCLUDED.value;
+
+    PERFORM refresh_var_stats_percentages();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger function shared by the INSERT, UPDATE and DELETE triggers. The inserted rows are visible as new_rows,
+-- the deleted ones as old_rows (an UPDATE has both). Names are locked in a fixed order so concurrent
+-- statements cannot deadlock on animal_name_vs_count.
+CREATE OR REPLACE FUNCTION trigger_apply_detection_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO animal_name_vs_count (animal_name, animal_count)
+        SELECT animal_name, COUNT(*)
+        FROM new_rows
+        GROUP BY animal_name
+        ORDER BY animal_name
+        ON CONFLICT (animal_name)
+        DO UPDATE SET animal_count = animal_name_vs_count.animal_count + EXCLUDED.animal_count;
+
+        PERFORM apply_var_stats_delta(
+            COUNT(*),
+            COUNT(*) FILTER (WHERE is_threat),
+            COUNT(*) FILTER (WHERE is_endangered),
+            COUNT(*) FILTER (WHERE is_threat AND is_endangered)
+        ) FROM new_rows;
+
+        INSERT INTO detections_hourly (bucket, gate_no, animal_name, detections, threats, endangered, threats_and_endangered)
+        SELECT date_trunc('hour', time_stamp), COALESCE(gate_no, 0), animal_name,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE is_threat),
+               COUNT(*) FILTER (WHERE is_endangered),
+               COUNT(*) FILTER (WHERE is_threat AND is_endangered)
+        FROM new_rows
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (bucket, gate_no, animal_name)
+        DO UPDATE SET detections = detections_hourly.detections + EXCLUDED.detections,
+                      threats = detections_hourly.threats + EXCLUDED.threats,
+                      endangered = detections_hourly.endangered + EXCLUDED.endangered,
+                      threats_and_endangered = detections_hourly.threats_and_endangered + EXCLUDED.threats_and_endangered;
+    END IF;
+
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE animal_name_vs_count AS counts
+        SET animal_count = counts.animal_count - removed.animal_count
+        FROM (
+            SELECT animal_name, COUNT(*) AS animal_count
+            FROM old_rows
+            GROUP BY animal_name
+        ) AS removed
+        WHERE counts.animal_name = removed.animal_name;
+
+        DELETE FROM animal_name_vs_count
+        WHERE animal_count <= 0 AND animal_name IN (SELECT animal_name FROM old_rows);
+
+        PERFORM apply_var_stats_delta(
+            -COUNT(*),
+            -COUNT(*) FILTER (WHERE is_threat),
+            -COUNT(*) FILTER (WHERE is_endangered),
+            -COUNT(*) FILTER (WHERE is_threat AND is_endangered)
+        ) FROM old_rows;
+
+        UPDATE detections_hourly AS hourly
+        SET detections = hourly.detections - removed.detections,
+            threats = hourly.threats - removed.threats,
+            endangered = hourly.endangered - removed.endangered,
+            threats_and_endangered = hourly.threats_and_endangered - removed.threats_and_endangered
+        FROM (
+            SELECT date_trunc('hour', time_stamp) AS bucket, COALESCE(gate_no, 0) AS gate_no, animal_name,
+                   COUNT(*) AS detections,
+                   COUNT(*) FILTER (WHERE is_threat) AS threats,
+                   COUNT(*) FILTER (WHERE is_endangered) AS endangered,
+                   COUNT(*) FILTER (WHERE is_threat AND is_endangered) AS threats_and_endangered
+            FROM old_rows
+            GROUP BY 1, 2, 3
+        ) AS removed
+        WHERE hourly.bucket = removed.bucket AND hourly.gate_no = removed.gate_no AND hourly.animal_name = removed.animal_name;
+
+        DELETE FROM detections_hourly
+        WHERE detections <= 0 AND bucket IN (SELECT date_trunc('hour', time_stamp) FROM old_rows);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuild animal_name_vs_count and var_stats from detected_animals. This is the only full scan left, for
+-- backfilling an existing database and for repairing drift. Writers are blocked while it runs, readers are not.
+CREATE OR REPLACE FUNCTION backfill_detection_stats()
+RETURNS void AS $$
+BEGIN
+    LOCK TABLE detected_animals IN SHARE MODE;
+
+    DELETE FROM animal_name_vs_count;
+    INSERT INTO animal_name_vs_count (animal_name, animal_count)
+    SELECT animal_name, COUNT(*)
+    FROM detected_animals
+    GROUP BY animal_name;
+
+    INSERT INTO var_stats (key, value)
+    SELECT key, value
+    FROM (
+        SELECT
+            COUNT(*) AS total_count,
+            COUNT(*) FILTER (WHERE is_threat) AS threat_count,
+            COUNT(*) FILTER (WHERE is_endangered) AS endangered_count,
+            COUNT(*) FILTER (WHERE is_threat AND is_endangered) AS both_count
+        FROM detected_animals
+    ) AS totals,
+    LATERAL (VALUES
         ('total_animals', total_count),
         ('total_threats', threat_count),
         ('total_endangered', endangered_count),
-        ('total_threats_and_endangered', both_count),
-        ('percent_threats', threat_count_percent::BIGINT),
-        ('percent_endangered', endangered_count_percent::BIGINT),
-        ('percent_both', both_count_percent::BIGINT)
+        ('total_threats_and_endangered', both_count)
+    ) AS counts (key, value)
     ON CONFLICT (key)
     DO UPDATE SET value = EXCLUDED.value;
+
+    PERFORM refresh_var_stats_percentages();
+
+    -- Rollups of dropped partitions are kept as they are
+    DELETE FROM detections_hourly AS hourly
+    USING detection_live_ranges() AS live
+    WHERE hourly.bucket >= live.range_start AND hourly.bucket < live.range_end;
+    INSERT INTO detections_hourly (bucket, gate_no, animal_name, detections, threats, endangered, threats_and_endangered)
+    SELECT date_trunc('hour', time_stamp), COALESCE(gate_no, 0), animal_name,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE is_threat),
+           COUNT(*) FILTER (WHERE is_endangered),
+           COUNT(*) FILTER (WHERE is_threat AND is_endangered)
+    FROM detected_animals
+    GROUP BY 1, 2, 3;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Compare the maintained counters with a fresh count, one row per counter that drifted (none when consistent)
+CREATE OR REPLACE FUNCTION check_detection_stats()
+RETURNS TABLE (stat TEXT, stored BIGINT, actual BIGINT) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT 'animal_name_vs_count:' || COALESCE(counts.animal_name, fresh.animal_name)::TEXT,
+           COALESCE(counts.animal_count, 0),
+           COALESCE(fresh.animal_count, 0)
+    FROM animal_name_vs_count AS counts
+    FULL OUTER JOIN (
+        SELECT animal_name, COUNT(*) AS animal_count
+        FROM detected_animals
+        GROUP BY animal_name
+    ) AS fresh ON fresh.animal_name = counts.animal_name
+    WHERE COALESCE(counts.animal_count, 0) <> COALESCE(fresh.animal_count, 0);
+
+    RETURN QUERY
+    SELECT 'var_stats:' || fresh.key,
+           COALESCE(stats.value, 0),
+           fresh.value
+    FROM (
+        SELECT
+            COUNT(*) AS total_count,
+            COUNT(*) FILTER (WHERE is_threat) AS threat_count,
+            COUNT(*) FILTER (WHERE is_endangered) AS endangered_count,
+            COUNT(*) FILTER (WHERE is_threat AND is_endangered) AS both_count
+        FROM detected_animals
+    ) AS totals,
+    LATERAL (VALUES
+        ('total_animals', total_count),
+        ('total_threats', threat_count),
+        ('total_endangered', endangered_count),
+        ('total_threats_and_endangered', both_count)
+    ) AS fresh (key, value)
+    LEFT JOIN var_stats AS stats ON stats.key = fresh.key
+    WHERE COALESCE(stats.value, 0) <> fresh.value;
+
+    RETURN QUERY
+    SELECT 'detections_hourly:' || COALESCE(hourly.bucket, fresh.bucket)::TEXT
+               || ':' || COALESCE(hourly.gate_no, fresh.gate_no)::TEXT
+               || ':' || COALESCE(hourly.animal_name, fresh.animal_name)::TEXT,
+           COALESCE(hourly.detections, 0),
+           COALESCE(fresh.detections, 0)
+    FROM (
+        SELECT * FROM detections_hourly
+        WHERE EXISTS (SELECT 1 FROM detection_live_ranges() AS live WHERE bucket >= live.range_start AND bucket < live.range_end)
+    ) AS hourly
+    FULL OUTER JOIN (
+        SELECT date_trunc('hour', time_stamp) AS bucket, COALESCE(gate_no, 0) AS gate_no, animal_name, COUNT(*) AS detections
+        FROM detected_animals
+        GROUP BY 1, 2, 3
+    ) AS fresh ON fresh.bucket = hourly.bucket AND fresh.gate_no = hourly.gate_no AND fresh.animal_name = hourly.animal_name
+    WHERE COALESCE(hourly.detections, 0) <> COALESCE(fresh.detections, 0);
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger function to refresh stats
-CREATE OR REPLACE FUNCTION trigger_refresh_var_stats()
+-- A TRUNCATE has no transition table, start the counters over instead
+CREATE OR REPLACE FUNCTION trigger_reset_detection_stats()
 RETURNS TRIGGER AS $$
 BEGIN
-    PERFORM refresh_var_stats();
-    RETURN NEW;
+    PERFORM backfill_detection_stats();
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger on insert into detected_animals
-CREATE TRIGGER refresh_var_stats_after_insert
+-- Monthly partitions are named detected_animals_YYYY_MM
+CREATE OR REPLACE FUNCTION detection_partition_month(partition_name TEXT)
+RETURNS TIMESTAMP AS $$
+    SELECT to_timestamp(substring(partition_name FROM '^detected_animals_(\d{4}_\d{2})$'), 'YYYY_MM')::TIMESTAMP;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Create the partitions of this month and the next `months_ahead` months. Rows of those months that ended up in
+-- the default partition are moved into the new partition before it is attached.
+CREATE OR REPLACE FUNCTION create_detection_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('detected_animals_partitions'));
+
+    FOR i IN 0..months_ahead LOOP
+        month_start := date_trunc('month', LOCALTIMESTAMP) + make_interval(months => i);
+        partition_name := 'detected_animals_' || to_char(month_start, 'YYYY_MM');
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+
+        EXECUTE format('CREATE TABLE %I (LIKE detected_animals INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+        -- A plain DML on a partition does not fire the statement triggers of detected_animals, so the move leaves the stats alone
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM detected_animals_default WHERE time_stamp >= %L AND time_stamp < %L RETURNING *)
+             INSERT INTO %I SELECT * FROM moved',
+            month_start, month_start + INTERVAL '1 month', partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE detected_animals ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, month_start, month_start + INTERVAL '1 month'
+        );
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Time ranges still backed by raw data: every monthly partition, plus the hours of the rows in the default
+-- partition. Rollups outside these ranges belong to dropped partitions.
+CREATE OR REPLACE FUNCTION detection_live_ranges()
+RETURNS TABLE (range_start TIMESTAMP, range_end TIMESTAMP) AS $$
+    SELECT detection_partition_month(child.relname), detection_partition_month(child.relname) + INTERVAL '1 month'
+    FROM pg_inherits
+    JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = 'detected_animals'::regclass
+      AND detection_partition_month(child.relname) IS NOT NULL
+    UNION ALL
+    SELECT DISTINCT date_trunc('hour', time_stamp), date_trunc('hour', time_stamp) + INTERVAL '1 hour'
+    FROM detected_animals_default;
+$$ LANGUAGE sql STABLE;
+
+-- Drop the monthly partitions older than `keep_months` full months, and the rollups older than `keep_rollup_months`
+-- (never fewer months than the raw data). Dropping a partition is O(1) in the number of rows it holds: its share
+-- of animal_name_vs_count and var_stats is taken from the hourly rollups instead of scanning it.
+CREATE OR REPLACE FUNCTION drop_expired_detection_partitions(keep_months INTEGER, keep_rollup_months INTEGER DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    cutoff TIMESTAMP := date_trunc('month', LOCALTIMESTAMP) - make_interval(months => keep_months);
+    expired RECORD;
+    dropped INTEGER := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('detected_animals_partitions'));
+
+    FOR expired IN
+        SELECT child.relname AS partition_name, detection_partition_month(child.relname) AS month_start
+        FROM pg_inherits
+        JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'detected_animals'::regclass
+          AND detection_partition_month(child.relname) < cutoff
+        ORDER BY 2
+    LOOP
+        UPDATE animal_name_vs_count AS counts
+        SET animal_count = counts.animal_count - removed.detections
+        FROM (
+            SELECT animal_name, SUM(detections) AS detections
+            FROM detections_hourly
+            WHERE bucket >= expired.month_start AND bucket < expired.month_start + INTERVAL '1 month'
+            GROUP BY animal_name
+        ) AS removed
+        WHERE counts.animal_name = removed.animal_name;
+        DELETE FROM animal_name_vs_count WHERE animal_count <= 0;
+
+        PERFORM apply_var_stats_delta(
+            -COALESCE(SUM(detections), 0)::BIGINT,
+            -COALESCE(SUM(threats), 0)::BIGINT,
+            -COALESCE(SUM(endangered), 0)::BIGINT,
+            -COALESCE(SUM(threats_and_endangered), 0)::BIGINT
+        )
+        FROM detections_hourly
+        WHERE bucket >= expired.month_start AND bucket < expired.month_start + INTERVAL '1 month';
+
+        EXECUTE format('DROP TABLE %I', expired.partition_name);
+        dropped := dropped + 1;
+    END LOOP;
+
+    -- Rollups still backed by raw rows (the default partition can hold old ones) stay
+    IF keep_rollup_months IS NOT NULL THEN
+        DELETE FROM detections_hourly
+        WHERE bucket < date_trunc('month', LOCALTIMESTAMP) - make_interval(months => GREATEST(keep_rollup_months, keep_months))
+          AND NOT EXISTS (SELECT 1 FROM detection_live_ranges() AS live WHERE bucket >= live.range_start AND bucket < live.range_end);
+    END IF;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Replaces the statement triggers that recounted the whole table on every insert
+DROP TRIGGER IF EXISTS update_animal_count_trigger ON detected_animals;
+DROP TRIGGER IF EXISTS refresh_var_stats_after_insert ON detected_animals;
+DROP FUNCTION IF EXISTS trigger_update_animal_count();
+DROP FUNCTION IF EXISTS trigger_refresh_var_stats();
+DROP FUNCTION IF EXISTS upsert_animal_name_vs_count();
+DROP FUNCTION IF EXISTS refresh_var_stats();
+
+DROP TRIGGER IF EXISTS detection_stats_after_insert ON detected_animals;
+CREATE TRIGGER detection_stats_after_insert
 AFTER INSERT ON detected_animals
+REFERENCING NEW TABLE AS new_rows
 FOR EACH STATEMENT
-EXECUTE FUNCTION trigger_refresh_var_stats();
+EXECUTE FUNCTION trigger_apply_detection_stats();
+
+DROP TRIGGER IF EXISTS detection_stats_after_update ON detected_animals;
+CREATE TRIGGER detection_stats_after_update
+AFTER UPDATE ON detected_animals
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION trigger_apply_detection_stats();
+
+DROP TRIGGER IF EXISTS detection_stats_after_delete ON detected_animals;
+CREATE TRIGGER detection_stats_after_delete
+AFTER DELETE ON detected_animals
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION trigger_apply_detection_stats();
+
+DROP TRIGGER IF EXISTS detection_stats_after_truncate ON detected_animals;
+CREATE TRIGGER detection_stats_after_truncate
+AFTER TRUNCATE ON detected_animals
+FOR EACH STATEMENT
+EXECUTE FUNCTION trigger_reset_detection_stats();
+
+-- Partitions for this month and the next few, the web-app keeps creating them ahead of time
+SELECT create_detection_partitions(3);
 
 -- Provide some mock data to show what animals are potentially detected
 INSERT INTO detected_animals (animal_type, animal_name, is_endangered, is_threat)
@@ -179,3 +179,27 @@ FOR EACH ROW
 WHEN (OLD.role_id IS DISTINCT FROM NEW.role_id)
 EXECUTE FUNCTION update_user_overview_role();
 
+
+-- The web-app caches user_overview and the role names for the users page and reloads them on the
+-- user_overview_changed notification. The user triggers above all end up writing user_overview, logins and
+-- logouts update it directly, so watching user_overview and roles covers every change. Statement triggers, and
+-- Postgres folds identical notifications of one transaction together, so a change is a single notification.
+CREATE OR REPLACE FUNCTION trigger_notify_user_overview_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('user_overview_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_overview_changed ON user_overview;
+CREATE TRIGGER user_overview_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON user_overview
+FOR EACH STATEMENT
+EXECUTE FUNCTION trigger_notify_user_overview_changed();
+
+DROP TRIGGER IF EXISTS roles_changed ON roles;
+CREATE TRIGGER roles_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON roles
+FOR EACH STATEMENT
+EXECUTE FUNCTION trigger_notify_user_overview_changed();
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Alert ingestion for the Web Application
+Decouples the MQTT network thread from Postgres with a bounded queue and a batching writer
+(BatchIngestor is also used for the detections, see detection_ingestion.py)
+"""
+
+import queue
+import threading
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class BatchIngestor:
+    """
+    Bounded queue between `on_message` and a table.
+
+    The MQTT thread only enqueues rows. A single writer thread hands them to `writer` once `batch_size` rows are
+    waiting or `flush_interval` seconds have passed. Because there is one queue and one writer, rows reach the table
+    in the order they were received, so the rows of each gate stay ordered.
+
+    When the queue is full, `submit_row` waits up to `put_timeout` seconds (slowing the MQTT loop down, which is the
+    backpressure) and then drops the row. Both cases are counted.
+
+    :param writer: Function writing a list of rows in one go, returns True on success
+    :param batch_size: Flush as soon as this many rows are waiting
+    :param flush_interval: Flush at least this often, in seconds
+    :param max_queue: Maximum number of rows waiting for the writer
+    :param put_timeout: Maximum time `submit_row` waits for room in the queue, in seconds
+    :param max_retries: Flush attempts before the rows of a failed batch go to `on_failure`
+    :param on_failure: Function called with every row that could not be written
+    :param on_written: Function called with the rows of every batch once it is written, on the writer thread
+    """
+    def __init__(self, writer, batch_size=500, flush_interval=0.5, max_queue=10000, put_timeout=0.5, max_retries=3, on_failure=None, on_written=None):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.on_failure = on_failure
+        self.on_written = on_written
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "dropped": 0,
+            "failed": 0,
+            "retries": 0,
+            "blocked_puts": 0,
+            "blocked_seconds": 0.0,
+            "max_queue_depth": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": 0.0
+        }
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.flushed = threading.Condition(self.lock)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit_row(self, row):
+        """
+        Queue a row for the database. Called from the MQTT thread.
+
+        :return: True if queued, False if dropped because the queue stayed full
+        """
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            started = time.monotonic()
+            try:
+                self.queue.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                with self.lock:
+                    self.stats["dropped"] += 1
+                    self.stats["blocked_seconds"] += time.monotonic() - started
+                logger.warning(f"{type(self).__name__} queue full, dropped: {row}")
+                return False
+            with self.lock:
+                self.stats["blocked_puts"] += 1
+                self.stats["blocked_seconds"] += time.monotonic() - started
+
+        with self.lock:
+            self.stats["submitted"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue.qsize())
+        return True
+
+    def get_stats(self):
+        """Throughput and backpressure counters of the ingestion stage"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["queue_capacity"] = self.queue.maxsize
+        stats["rows_per_second"] = stats["written"] / max(time.monotonic() - self.started, 1e-9)
+        return stats
+
+    def wait_until_flushed(self, timeout=None):
+        """Block until every submitted row has been written or given up on (used by the benchmark)"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.flushed:
+            while self.stats["written"] + self.stats["failed"] < self.stats["submitted"]:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.flushed.wait(remaining)
+        return True
+
+    def stop(self):
+        """Flush what is left and stop the writer"""
+        self.running = False
+        self.thread.join(timeout=self.flush_interval * 2 + 5)
+
+    def _run(self):
+        batch = []
+        batch_started = None
+        while self.running or batch or not self.queue.empty():
+            # Wait for the next row, but never past the flush deadline of the current batch
+            if batch_started is not None:
+                timeout = max(0.0, batch_started + self.flush_interval - time.monotonic())
+            else:
+                timeout = self.flush_interval
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+                if batch_started is None:
+                    batch_started = time.monotonic()
+                # Take whatever else is already waiting without blocking
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() - batch_started >= self.flush_interval or not self.running):
+                self._flush(batch)
+                batch = []
+                batch_started = None
+
+    def _flush(self, rows):
+        for attempt in range(self.max_retries):
+            started = time.perf_counter()
+            if self.writer(rows):
+                with self.flushed:
+                    self.stats["written"] += len(rows)
+                    self.stats["batches"] += 1
+                    self.stats["last_batch_size"] = len(rows)
+                    self.stats["last_flush_ms"] = (time.perf_counter() - started) * 1000.0
+                    self.flushed.notify_all()
+                if self.on_written:
+                    try:
+                        self.on_written(rows)
+                    except Exception as e:
+                        logger.error(f"Error in {type(self).__name__} on_written: {e}")
+                return
+            with self.lock:
+                self.stats["retries"] += 1
+            time.sleep(min(2 ** attempt * 0.1, 2.0))
+
+        logger.error(f"{type(self).__name__} giving up on {len(rows)} rows after {self.max_retries} attempts")
+        with self.flushed:
+            self.stats["failed"] += len(rows)
+            self.flushed.notify_all()
+        if self.on_failure:
+            for row in rows:
+                self.on_failure(row)
+
+class AlertIngestor(BatchIngestor):
+    """
+    Batches alerts into the alerts table with COPY.
+
+    :param on_failure: Function called with (alert_desc, alert_level) for every alert that could not be written
+    :param on_written: Function called with the rows of every batch once it is written
+    """
+    def __init__(self, batch_size=500, flush_interval=0.5, max_queue=10000, put_timeout=0.5, max_retries=3, on_failure=None, on_written=None):
+        failed = (lambda row: on_failure(row[0], row[1])) if on_failure else None
+        super().__init__(self._write, batch_size, flush_interval, max_queue, put_timeout, max_retries, failed, on_written)
+
+    def submit(self, alert_desc, alert_level="info"):
+        """
+        Queue an alert for the database. Called from the MQTT thread.
+
+        :return: True if queued, False if dropped because the queue stayed full
+        """
+        # The row keeps the time it was received, not the time it was flushed
+        return self.submit_row((alert_desc, alert_level, datetime.now()))
+
+    @staticmethod
+    def _write(rows):
+        from controllers.db_controller import add_alerts
+        return add_alerts(rows)
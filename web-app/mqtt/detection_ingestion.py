@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Detection ingestion for the Web Application
+Turns detection messages into detected_animals rows, resolving species metadata from an in-memory cache
+"""
+
+import math
+import threading
+import time
+import logging
+from datetime import datetime
+
+from mqtt.alert_ingestion import BatchIngestor
+
+logger = logging.getLogger(__name__)
+
+class SpeciesCache:
+    """
+    Species metadata (animal_type, is_endangered, is_threat) keyed by lower-case name, so the model's "dog" finds
+    the "Dog" row.
+
+    The whole species table is loaded on first use and reloaded when it changes (see `reload`, called on the
+    species_changed notification), so a lookup never touches the database. Names that are not in the table are
+    not species (a person, a car) and count as misses.
+
+    :param loader: Function returning every species row as (animal_name, animal_type, is_endangered, is_threat),
+                   or None if the table could not be read
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self.species = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.unknown = set()
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0, "failed_reloads": 0, "last_reload": None}
+
+    def reload(self, _payload=None):
+        """Load the species table again, keeping the previous contents if that fails"""
+        rows = self.loader()
+        with self.lock:
+            if rows is None:
+                self.stats["failed_reloads"] += 1
+                return False
+            # Swapped in one go, lookups on the MQTT thread see either the old or the new table
+            self.species = {
+                name.lower(): {"animal_name": name, "animal_type": animal_type, "is_endangered": is_endangered, "is_threat": is_threat}
+                for name, animal_type, is_endangered, is_threat in rows
+            }
+            self.loaded = True
+            self.unknown = set()
+            self.stats["reloads"] += 1
+            self.stats["last_reload"] = time.time()
+        logger.info(f"Species metadata loaded: {len(rows)} species")
+        return True
+
+    def lookup(self, name):
+        """Metadata of a species, or None if the name is not a known species"""
+        if not self.loaded:
+            self.reload()
+        entry = self.species.get(name.lower())
+        with self.lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                self.unknown.add(name)
+            else:
+                self.stats["hits"] += 1
+        return entry
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["species"] = len(self.species)
+            stats["unknown_names"] = sorted(self.unknown)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+def _as_timestamp(value, default):
+    """`value` as a POSIX timestamp, or `default` if it is missing or not a time datetime can represent"""
+    try:
+        timestamp = float(value)
+        datetime.fromtimestamp(timestamp)
+        return timestamp
+    except (TypeError, ValueError, OverflowError, OSError):
+        return default
+
+def _as_confidence(value):
+    """`value` as a finite float, or None"""
+    try:
+        confidence = float(value)
+    except (TypeError, ValueError):
+        return None
+    return confidence if math.isfinite(confidence) else None
+
+class DetectionIngestor(BatchIngestor):
+    """
+    Batches detections into detected_animals with COPY, one row per object of a detection message. An aggregated
+    summary gives one row per class for the whole window, with its best confidence and the time it was first seen.
+    Objects that are not a known species are left out.
+
+    :param species_cache: SpeciesCache used to fill in animal_type, is_endangered and is_threat
+    """
+    def __init__(self, species_cache, batch_size=500, flush_interval=1.0, max_queue=10000, put_timeout=0.5, max_retries=3):
+        super().__init__(self._write, batch_size, flush_interval, max_queue, put_timeout, max_retries)
+        self.species = species_cache
+
+    def submit_detection(self, gate_id, detection):
+        """
+        Queue the rows of a detection message. Called from the MQTT thread.
+
+        :return: Number of rows queued
+        """
+        gate_no = int(gate_id) if str(gate_id).isascii() and str(gate_id).isdigit() else None
+        capture_id = detection.get("capture_id")
+        # Gates send whatever they like, so times that are not a usable timestamp fall back to the arrival time
+        timestamp = _as_timestamp(detection.get("timestamp"), time.time())
+
+        classes = detection.get("classes")
+        if isinstance(classes, dict) and classes:
+            seen = [(name, _as_confidence(entry.get("max_conf")), _as_timestamp(entry.get("first_seen"), timestamp))
+                    for name, entry in classes.items() if isinstance(entry, dict)]
+        else:
+            objects = detection.get("objects")
+            confidence = detection.get("confidence")
+            objects = objects if isinstance(objects, list) else []
+            confidence = confidence if isinstance(confidence, list) else []
+            seen = [(name, _as_confidence(confidence[i]) if i < len(confidence) else None, timestamp) for i, name in enumerate(objects)]
+
+        queued = 0
+        for name, conf, seen_at in seen:
+            if not isinstance(name, str):
+                continue
+            species = self.species.lookup(name)
+            if species is None:
+                continue
+            row = (gate_no, species["animal_type"], species["animal_name"], species["is_endangered"], species["is_threat"],
+                   conf, capture_id, datetime.fromtimestamp(seen_at))
+            if self.submit_row(row):
+                queued += 1
+        return queued
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["species_cache"] = self.species.get_stats()
+        return stats
+
+    @staticmethod
+    def _write(rows):
+        from controllers.db_controller import add_detections
+        return add_detections(rows)
+
+def load_species():
+    from controllers.db_controller import get_all_species
+    return get_all_species()
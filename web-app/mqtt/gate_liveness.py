@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Gate liveness tracking for the Web Application
+Flips gates offline when their heartbeat deadline passes, using an expiry heap
+"""
+
+import heapq
+import threading
+import time
+import logging
+from collections import deque
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+class GateLivenessTracker:
+    """
+    Tracks the online/offline state of every gate from the messages it sends.
+
+    Each message pushes the gate's new deadline on a min-heap. A single timer thread sleeps until the earliest
+    deadline and flips the gate offline exactly then, so nothing has to scan the gates on request. Entries of gates
+    that were seen again since are stale and skipped when they come off the heap.
+
+    Gate records are never modified in place, they are replaced, so a snapshot is a shallow copy that stays
+    consistent while the MQTT thread keeps updating the tracker.
+    """
+    def __init__(self, timeout=30, max_events=1000):
+        self.timeout = timeout
+        self.gates = {}  # {gate_id: {"status": "online/offline", "last_seen": timestamp, "gate_status": "open/closed", "deadline": monotonic}}
+        self.heap = []   # [(deadline, gate_id)]
+        self.condition = threading.Condition()
+        self.version = 0
+        self.snapshot_cache = (None, MappingProxyType({}))
+
+        # Online/offline transitions, oldest dropped first
+        self.events = deque(maxlen=max_events)
+        self.event_seq = 0
+        self.listeners = []
+
+        self.running = True
+        self.thread = threading.Thread(target=self._expire_loop, daemon=True)
+        self.thread.start()
+
+    def add_listener(self, listener):
+        """Register a function called with (gate_id, status, timestamp) on every online/offline transition"""
+        self.listeners.append(listener)
+
+    def seen(self, gate_id, gate_status=None):
+        """Record a message from a gate, which keeps it online for another `timeout` seconds"""
+        now = time.time()
+        deadline = time.monotonic() + self.timeout
+        transition = None
+        with self.condition:
+            record = self.gates.get(gate_id)
+            if record is None:
+                record = {"status": "offline", "last_seen": now, "gate_status": "unknown", "deadline": deadline}
+            if record["status"] == "offline":
+                transition = self._record_event(gate_id, "online", now)
+            self.gates[gate_id] = dict(
+                record,
+                status="online",
+                last_seen=now,
+                deadline=deadline,
+                gate_status=gate_status if gate_status is not None else record["gate_status"]
+            )
+            self.version += 1
+
+            # Only wake the timer thread if this deadline is now the earliest one
+            if not self.heap or deadline < self.heap[0][0]:
+                self.condition.notify()
+            heapq.heappush(self.heap, (deadline, gate_id))
+
+        if transition:
+            self._notify(transition)
+
+    def get(self, gate_id):
+        """Current record of a gate, or None if it has never been seen"""
+        return self.gates.get(gate_id)
+
+    def snapshot(self):
+        """
+        Read-only view of every gate, consistent at a single point in time.
+        The copy is only rebuilt when something changed since the previous snapshot.
+        """
+        with self.condition:
+            version, snapshot = self.snapshot_cache
+            if version != self.version:
+                snapshot = MappingProxyType(dict(self.gates))
+                self.snapshot_cache = (self.version, snapshot)
+            return snapshot
+
+    def events_since(self, seq=0):
+        """Transition events with a sequence number greater than `seq`"""
+        with self.condition:
+            return [event for event in self.events if event["seq"] > seq]
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout=2)
+
+    def _record_event(self, gate_id, status, timestamp):
+        self.event_seq += 1
+        event = {"seq": self.event_seq, "gate_id": gate_id, "status": status, "timestamp": timestamp}
+        self.events.append(event)
+        return event
+
+    def _notify(self, event):
+        for listener in self.listeners:
+            try:
+                listener(event["gate_id"], event["status"], event["timestamp"])
+            except Exception as e:
+                logger.error(f"Error in gate liveness listener: {e}")
+
+    def _expire_loop(self):
+        while True:
+            expired = []
+            with self.condition:
+                if not self.running:
+                    return
+                now = time.monotonic()
+                while self.heap and self.heap[0][0] <= now:
+                    deadline, gate_id = heapq.heappop(self.heap)
+                    record = self.gates.get(gate_id)
+                    # Stale entry: the gate has been seen again since this deadline was pushed
+                    if record is None or record["deadline"] != deadline or record["status"] == "offline":
+                        continue
+                    self.gates[gate_id] = dict(record, status="offline")
+                    self.version += 1
+                    expired.append(self._record_event(gate_id, "offline", time.time()))
+
+                if not expired:
+                    self.condition.wait(self.heap[0][0] - now if self.heap else None)
+
+            for event in expired:
+                self._notify(event)
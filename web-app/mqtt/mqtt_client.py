@@ -5,16 +5,171 @@ Handles MQTT communication with Jetson Nano
 """
 
 import paho.mqtt.client as mqtt
+import os
 import json
 import time
 import threading
+import struct
+import uuid
+from collections import deque
 from datetime import datetime
 import logging
 
+from mqtt.gate_liveness import GateLivenessTracker
+from mqtt.alert_ingestion import AlertIngestor
+from mqtt.detection_ingestion import SpeciesCache, DetectionIngestor, load_species
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# --------------COMPACT PAYLOAD DECODING--------------
+# Decoders for the versioned binary layout produced by the Jetson client (see mqtt_jetson_client.py for the layout).
+# Payloads whose first byte is not the magic byte are treated as JSON, so JSON-only gates keep working.
+PAYLOAD_MAGIC    = 0xA5
+PAYLOAD_VERSION  = 1
+BINARY_ENCODING  = "sg1"
+MSG_HEARTBEAT    = 1
+MSG_DETECTION    = 2
+MSG_STATUS       = 3
+MSG_COMMAND      = 4
+MSG_STATUS_BATCH = 5
+MSG_ACK          = 6
+MSG_DETECTION_SUMMARY = 7
+SUPPORTED_ENCODINGS = ["json", BINARY_ENCODING]
+
+class _PayloadReader:
+    def __init__(self, payload):
+        self.payload = payload
+        self.offset = 0
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.payload, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values if len(values) > 1 else values[0]
+
+    def string(self):
+        length = self.unpack('>B')
+        value = self.payload[self.offset:self.offset + length].decode('utf-8')
+        self.offset += length
+        return value
+
+    def objects(self):
+        names, confidences = [], []
+        for _ in range(self.unpack('>B')):
+            names.append(self.string())
+            confidences.append(self.unpack('>H') / 10000.0)
+        return names, confidences
+
+def _read_status_body(reader):
+    status = {"timestamp": reader.unpack('>d'), "status": reader.string(), "detection_context": None}
+    if reader.unpack('>B'):
+        timestamp = reader.unpack('>d')
+        objects, confidence = reader.objects()
+        capture_id = reader.unpack('>I')
+        status["detection_context"] = {
+            "timestamp": timestamp,
+            "objects": objects,
+            "confidence": confidence,
+            "capture_id": capture_id or None
+        }
+    return status
+
+def decode_payload(payload):
+    """
+    Decode a jetson/<gate>/* payload, either binary or JSON.
+
+    :return: Tuple of (message dictionary, encoding name)
+    """
+    if not payload or payload[0] != PAYLOAD_MAGIC:
+        message = json.loads(payload.decode())
+        if not isinstance(message, dict):
+            raise ValueError(f"Expected a JSON object, got {type(message).__name__}")
+        return message, "json"
+
+    reader = _PayloadReader(payload)
+    _, version, msg_type = reader.unpack('>BBB')
+    if version > PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported payload schema version {version}")
+
+    if msg_type == MSG_HEARTBEAT:
+        message = {"timestamp": reader.unpack('>d')}
+    elif msg_type == MSG_DETECTION:
+        timestamp = reader.unpack('>d')
+        objects, confidence = reader.objects()
+        capture_id = reader.unpack('>I')
+        message = {"timestamp": timestamp, "objects": objects, "confidence": confidence, "capture_id": capture_id or None}
+    elif msg_type == MSG_STATUS:
+        message = _read_status_body(reader)
+    elif msg_type == MSG_STATUS_BATCH:
+        message = {"batch": [_read_status_body(reader) for _ in range(reader.unpack('>B'))]}
+    elif msg_type == MSG_ACK:
+        received, applied, completed = reader.unpack('>ddd')
+        message = {
+            "received": received,
+            "applied": applied or None,
+            "completed": completed or None,
+            "command_id": reader.string(),
+            "action": reader.string(),
+            "result": reader.string()
+        }
+    elif msg_type == MSG_DETECTION_SUMMARY:
+        timestamp, first_seen, last_seen, frames = reader.unpack('>dddH')
+        reason = reader.string()
+        capture_id = reader.unpack('>I')
+        classes = {}
+        for _ in range(reader.unpack('>B')):
+            name = reader.string()
+            count, max_conf, mean_conf, class_first, class_last = reader.unpack('>HHHdd')
+            classes[name] = {
+                "count": count,
+                "max_conf": max_conf / 10000.0,
+                "mean_conf": mean_conf / 10000.0,
+                "first_seen": class_first,
+                "last_seen": class_last
+            }
+        message = {
+            "objects": list(classes),
+            "confidence": [entry["max_conf"] for entry in classes.values()],
+            "timestamp": timestamp,
+            "capture_id": capture_id or None,
+            "first_seen": first_seen,
+            "last_seen": last_seen,
+            "frames": frames,
+            "reason": reason,
+            "classes": classes
+        }
+    else:
+        raise ValueError(f"Unknown payload message type {msg_type}")
+    return message, BINARY_ENCODING
+
+def encode_command(action, command_id=None, binary=False):
+    """Encode a command for jetson/<gate>/commands in the encoding the gate speaks."""
+    if not binary:
+        command = {"action": action}
+        if command_id:
+            command["command_id"] = command_id
+        return json.dumps(command)
+
+    def pack_str(value):
+        data = str(value or "").encode('utf-8')[:255]
+        return struct.pack('>B', len(data)) + data
+
+    return (struct.pack('>BBBd', PAYLOAD_MAGIC, PAYLOAD_VERSION, MSG_COMMAND, time.time())
+            + pack_str(action) + pack_str(command_id))
+# --------------COMPACT PAYLOAD DECODING END--------------
+
+def _percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of samples, 0.0 when empty. The same formula as src/main/perf_stats.py, which
+    the gate and the benchmarks use; the web app's image does not contain src/main, so it keeps its own copy
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = int(round((pct / 100.0) * (len(ordered) - 1)))
+    return ordered[max(0, min(rank, len(ordered) - 1))]
+
 class WebAppMQTTClient:
     def __init__(self, broker_host="localhost", broker_port=1883, client_id="web_app"):
         self.broker_host = broker_host
@@ -23,11 +178,33 @@ class WebAppMQTTClient:
         self.client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION1, client_id=client_id)
         self.connected = False
         self.alerts = []
+
+        # Function called with (event, data) for the live dashboard, on the MQTT and writer threads (see set_event_sink)
+        self.event_sink = None
+
+        # Alerts are written to Postgres in batches by a writer thread, never on the MQTT network thread.
+        # Rows that cannot be written end up in the in-memory alerts list
+        self.ingestor = AlertIngestor(on_failure=self.add_alert, on_written=self.handle_alerts_written)
+
+        # Detections are also stored as structured detected_animals rows. Species metadata comes from a cache that
+        # is reloaded when the species table changes
+        self.species = SpeciesCache(load_species)
+        self.detections = DetectionIngestor(self.species)
+        from controllers.db_notifications import get_notification_listener
+        get_notification_listener().subscribe("species_changed", self.species.reload)
         
         # --------------S10 GATE DISCOVERY--------------
-        self.discovered_gates = {}  # {gate_id: {"status": "online/offline", "last_seen": timestamp, "gate_status": "open/closed"}}
         self.gate_timeout = 30  # seconds - gate considered offline if no heartbeat for 30s
+        self.liveness = GateLivenessTracker(timeout=self.gate_timeout)
+        self.liveness.add_listener(self.handle_gate_transition)
+        self.gate_encodings = {}  # {gate_id: "json" | "sg1"} encoding of the last message received from each gate
         # --------------S10 GATE DISCOVERY END--------------
+
+        # Command round trips: commands waiting for an ack and the latest round-trip samples of each gate
+        self.command_timeout = 30  # seconds - commands without an ack after this are counted as timed out
+        self.pending_commands = {}  # {command_id: {"gate_id", "action", "sent"}}
+        self.command_latency = {}  # {gate_id: {"rtt": deque, "apply": deque, "complete": deque, "acked", "timed_out", "results"}}
+        self.command_lock = threading.Lock()
         
         # Setup MQTT callbacks
         self.client.on_connect = self.on_connect
@@ -35,6 +212,27 @@ class WebAppMQTTClient:
         self.client.on_message = self.on_message
         
         # MQTT client only - no FastAPI endpoints
+
+    def set_event_sink(self, sink):
+        """
+        Push gate_state, capture and new_alerts events to `sink(event, data)`. It is called on the MQTT thread,
+        so it must only hand the event over (the web app passes it to the event loop with call_soon_threadsafe).
+        """
+        self.event_sink = sink
+
+    def emit(self, event, data):
+        sink = self.event_sink
+        if sink is None:
+            return
+        try:
+            sink(event, data)
+        except Exception as e:
+            logger.error(f"Error publishing {event} event: {e}")
+
+    def emit_gate_state(self, gate_id):
+        record = self.liveness.get(gate_id)
+        if record is not None:
+            self.emit("gate_state", dict(record, gate_id=gate_id))
         
     def on_connect(self, client, userdata, flags, rc):
         """Callback for when the client connects to the broker"""
@@ -47,7 +245,11 @@ class WebAppMQTTClient:
             client.subscribe("jetson/+/status")  # Per-gate status topics
             client.subscribe("jetson/+/detection")  # Per-gate detection topics
             client.subscribe("jetson/+/heartbeat")  # Per-gate heartbeat topics
+            client.subscribe("jetson/+/acks", qos=1)  # Per-gate command acknowledgements
             # --------------S10 GATE DISCOVERY END--------------
+
+            # Advertise the payload encodings we can decode so gates can switch to the compact binary format
+            client.publish("webapp/capabilities", json.dumps({"encodings": SUPPORTED_ENCODINGS}), qos=1, retain=True)
             
         else:
             logger.error(f"Failed to connect to MQTT broker. Return code: {rc}")
@@ -60,80 +262,178 @@ class WebAppMQTTClient:
     def on_message(self, client, userdata, msg):
         """Callback for when a message is received"""
         try:
-            payload = json.loads(msg.payload.decode())
+            payload, encoding = decode_payload(msg.payload)
             logger.info(f"Received message on topic {msg.topic}: {payload}")
+
+            if msg.topic.startswith("jetson/"):
+                self.gate_encodings[msg.topic.split("/")[1]] = encoding
             
             # --------------S10 GATE DISCOVERY--------------
             # Handle per-gate message types only
             if msg.topic.startswith("jetson/") and msg.topic.endswith("/status"):
                 gate_id = msg.topic.split("/")[1]
-                self.handle_per_gate_status(gate_id, payload)
+                # Gates micro-batch status updates as {"batch": [...]}
+                for status in payload.get("batch", [payload]):
+                    self.handle_per_gate_status(gate_id, status)
             elif msg.topic.startswith("jetson/") and msg.topic.endswith("/detection"):
                 gate_id = msg.topic.split("/")[1]
                 self.handle_per_gate_detection(gate_id, payload)
             elif msg.topic.startswith("jetson/") and msg.topic.endswith("/heartbeat"):
                 gate_id = msg.topic.split("/")[1]
                 self.handle_gate_heartbeat(gate_id, payload)
+            elif msg.topic.startswith("jetson/") and msg.topic.endswith("/acks"):
+                gate_id = msg.topic.split("/")[1]
+                self.handle_command_ack(gate_id, payload)
             # --------------S10 GATE DISCOVERY END--------------
                 
-        except json.JSONDecodeError:
-            logger.warning(f"Received non-JSON message on topic {msg.topic}: {msg.payload.decode()}")
+        except (json.JSONDecodeError, UnicodeDecodeError, struct.error, ValueError) as e:
+            logger.warning(f"Received undecodable message on topic {msg.topic}: {e}")
+        except Exception:
+            # A malformed message must not take down the network loop thread
+            logger.exception(f"Failed to handle message on topic {msg.topic}")
             
     
     # --------------S10 GATE DISCOVERY--------------
     def handle_per_gate_status(self, gate_id, status):
         """Handle per-gate status updates"""
-        current_time = time.time()
-        
-        # Update discovered gates
-        if gate_id not in self.discovered_gates:
-            self.discovered_gates[gate_id] = {"status": "online", "last_seen": current_time, "gate_status": "unknown"}
-        
-        self.discovered_gates[gate_id]["status"] = "online"
-        self.discovered_gates[gate_id]["last_seen"] = current_time
-        self.discovered_gates[gate_id]["gate_status"] = status.get("status", "unknown")
+        # Any message keeps the gate online
+        self.liveness.seen(gate_id, gate_status=status.get("status", "unknown"))
+        self.emit_gate_state(gate_id)
         
         # Add status alert
-        try:
-            from controllers.db_controller import add_alert
-            add_alert(f"Gate {gate_id} status: {status.get('status', 'unknown')}", "info")
-        except Exception as e:
-            logger.error(f"Error adding gate status alert to database: {e}")
-            self.add_alert(f"Gate {gate_id} status: {status.get('status', 'unknown')}", "info")
+        self.ingestor.submit(f"Gate {gate_id} status: {status.get('status', 'unknown')}", "info")
     
     def handle_per_gate_detection(self, gate_id, detection):
         """Handle per-gate detection updates"""
         objects = detection.get("objects", [])
+        objects = [str(name) for name in objects] if isinstance(objects, list) else []
+        # Aggregated windows carry how many times each class was seen
+        classes = detection.get("classes")
+        if isinstance(classes, dict):
+            counts = {name: entry.get("count") for name, entry in classes.items() if isinstance(entry, dict)}
+            objects = [f"{name} x{counts[name]}" if isinstance(counts.get(name), int) and counts[name] > 1 else name for name in objects]
         if objects:
-            try:
-                from controllers.db_controller import add_alert
-                add_alert(f"Gate {gate_id}: Animal detected: {', '.join(objects)}", "warning")
-            except Exception as e:
-                logger.error(f"Error adding detection alert to database: {e}")
-                self.add_alert(f"Gate {gate_id}: Animal detected: {', '.join(objects)}", "warning")
+            self.ingestor.submit(f"Gate {gate_id}: Animal detected: {', '.join(objects)}", "warning")
+        self.detections.submit_detection(gate_id, detection)
+        self.emit("capture", {
+            "gate_id": gate_id,
+            "capture_id": detection.get("capture_id"),
+            "timestamp": detection.get("timestamp"),
+            "objects": detection.get("objects", [])
+        })
     
     def handle_gate_heartbeat(self, gate_id, heartbeat):
         """Handle gate heartbeat to track online/offline status"""
-        current_time = time.time()
-        
-        if gate_id not in self.discovered_gates:
-            self.discovered_gates[gate_id] = {"status": "online", "last_seen": current_time, "gate_status": "unknown"}
-        
-        self.discovered_gates[gate_id]["status"] = "online"
-        self.discovered_gates[gate_id]["last_seen"] = current_time
+        self.liveness.seen(gate_id)
+
+    def handle_gate_transition(self, gate_id, status, timestamp):
+        """Called by the liveness tracker when a gate comes online or misses its heartbeat deadline"""
+        level = "info" if status == "online" else "warning"
+        logger.info(f"Gate {gate_id} is {status}")
+        self.ingestor.submit(f"Gate {gate_id} is {status}", level)
+        self.emit_gate_state(gate_id)
+
+    def handle_alerts_written(self, rows):
+        """Tell the alerts pages to fetch what was just written, once per batch"""
+        self.emit("new_alerts", {"count": len(rows)})
+
+    def get_ingestion_stats(self):
+        """Throughput and backpressure counters of the alert and detection ingestion queues"""
+        return {
+            "alerts": self.ingestor.get_stats(),
+            "detections": self.detections.get_stats()
+        }
     
     def get_discovered_gates(self):
-        """Get list of discovered gates with their current status"""
-        current_time = time.time()
-        
-        # Check for offline gates
-        for gate_id, gate_info in self.discovered_gates.items():
-            if current_time - gate_info["last_seen"] > self.gate_timeout:
-                gate_info["status"] = "offline"
-        
-        return self.discovered_gates
+        """Get a consistent read-only snapshot of discovered gates with their current status"""
+        return self.liveness.snapshot()
+
+    def get_gate_events(self, after=0):
+        """Online/offline transitions with a sequence number greater than `after`"""
+        return self.liveness.events_since(after)
     # --------------S10 GATE DISCOVERY END--------------
         
+    def publish_command(self, gate_id, action, command_id=None):
+        """
+        Publish a command to a gate, binary if the gate talks binary and JSON otherwise.
+        The gate acknowledges it on jetson/<gate>/acks, which closes the round trip.
+
+        :return: The command_id used to match the ack
+        """
+        gate_id = str(gate_id)
+        command_id = command_id or uuid.uuid4().hex
+        binary = self.gate_encodings.get(gate_id) == BINARY_ENCODING
+        payload = encode_command(action, command_id, binary=binary)
+        with self.command_lock:
+            self.expire_pending_commands()
+            self.pending_commands[command_id] = {"gate_id": gate_id, "action": action, "sent": time.time()}
+        self.client.publish(f"jetson/{gate_id}/commands", payload, qos=1)
+        return command_id
+
+    def _gate_latency(self, gate_id):
+        if gate_id not in self.command_latency:
+            self.command_latency[gate_id] = {
+                "rtt": deque(maxlen=500),
+                "apply": deque(maxlen=500),
+                "complete": deque(maxlen=500),
+                "acked": 0,
+                "timed_out": 0,
+                "results": {}
+            }
+        return self.command_latency[gate_id]
+
+    def expire_pending_commands(self):
+        """Count commands that were never acknowledged. Must be called while holding command_lock."""
+        cutoff = time.time() - self.command_timeout
+        for command_id in [cid for cid, pending in self.pending_commands.items() if pending["sent"] < cutoff]:
+            pending = self.pending_commands.pop(command_id)
+            self._gate_latency(pending["gate_id"])["timed_out"] += 1
+            logger.warning(f"Command {pending['action']} to gate {pending['gate_id']} was not acknowledged")
+
+    def handle_command_ack(self, gate_id, ack):
+        """
+        Close the round trip of an acknowledged command.
+        Round trip is measured on this clock; the apply and complete stages use the gate's own timestamps,
+        relative to when the gate received the command, so clock skew between the two does not matter.
+        """
+        now = time.time()
+        with self.command_lock:
+            pending = self.pending_commands.pop(ack.get("command_id"), None)
+            if pending is None:
+                # Duplicate ack, or a command sent before a restart of the web app
+                return
+            stats = self._gate_latency(gate_id)
+            stats["acked"] += 1
+            result = ack.get("result", "unknown")
+            stats["results"][result] = stats["results"].get(result, 0) + 1
+            stats["rtt"].append(now - pending["sent"])
+            received = ack.get("received")
+            if received and ack.get("applied"):
+                stats["apply"].append(ack["applied"] - received)
+            if received and ack.get("completed"):
+                stats["complete"].append(ack["completed"] - received)
+        logger.info(f"Gate {gate_id} acknowledged {pending['action']} ({result}) in {(now - pending['sent']) * 1000.0:.0f} ms")
+
+    def get_command_latency(self):
+        """Per-gate command round-trip statistics in milliseconds"""
+        with self.command_lock:
+            self.expire_pending_commands()
+            latency = {}
+            for gate_id, stats in self.command_latency.items():
+                rtt = list(stats["rtt"])
+                latency[gate_id] = {
+                    "acked": stats["acked"],
+                    "timed_out": stats["timed_out"],
+                    "pending": sum(1 for pending in self.pending_commands.values() if pending["gate_id"] == gate_id),
+                    "results": dict(stats["results"]),
+                    "rtt_p50_ms": _percentile(rtt, 50) * 1000.0,
+                    "rtt_p95_ms": _percentile(rtt, 95) * 1000.0,
+                    "rtt_max_ms": max(rtt) * 1000.0 if rtt else 0.0,
+                    "apply_p50_ms": _percentile(list(stats["apply"]), 50) * 1000.0,
+                    "complete_p50_ms": _percentile(list(stats["complete"]), 50) * 1000.0
+                }
+            return latency
+        
     def add_alert(self, message, level="info"):
         """Add alert to alerts list"""
         alert = {
@@ -159,20 +459,32 @@ class WebAppMQTTClient:
             logger.error(f"Failed to start MQTT client: {e}")
             
         
+    def stop_mqtt(self):
+        """Disconnect from the broker but keep the ingestion queues running, start_mqtt connects again"""
+        logger.info("Disconnecting from MQTT broker...")
+        self.client.loop_stop()
+        self.client.disconnect()
+
     def stop(self):
         """Stop MQTT client and cleanup"""
         logger.info("Stopping MQTT client...")
         self.client.loop_stop()
         self.client.disconnect()
+        self.liveness.stop()
+        self.ingestor.stop()
+        self.detections.stop()
 
 # Global instance
 mqtt_client = None
 
 def get_mqtt_client():
-    """Get the global MQTT client instance"""
+    """Get the global MQTT client instance, connected to MQTT_BROKER_HOST:MQTT_BROKER_PORT (localhost:1883)"""
     global mqtt_client
     if mqtt_client is None:
-        mqtt_client = WebAppMQTTClient()
+        mqtt_client = WebAppMQTTClient(
+            broker_host=os.getenv("MQTT_BROKER_HOST", "localhost"),
+            broker_port=int(os.getenv("MQTT_BROKER_PORT", "1883"))
+        )
     return mqtt_client
 
 def main():
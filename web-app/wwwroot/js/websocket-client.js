@@ -1,23 +1,40 @@
 window.availableRoles = []
 
-// Check if there's already an existing WebSocket connection
-if (!window.socket) {
+const page = document.body.dataset.page;
+
+// Delay before reconnecting after the connection drops, doubled after every attempt
+const RECONNECT_MIN_DELAY = 1000;
+const RECONNECT_MAX_DELAY = 30000;
+let reconnectDelay = RECONNECT_MIN_DELAY;
+let reconnecting = false;
+let redirecting = false;
+
+function connectLiveData() {
     // Create a WebSocket connection to the server's live-data route
     /** @type {WebSocket} */    
     window.socket = new WebSocket('ws://' + window.location.host + '/ws/live-data');
-} else {
-    console.log("WebSocket connection already exists.");
+    setupWebSocketHandlers(window.socket);
 }
 
-const socket = window.socket;
-const page = document.body.dataset.page;
-
-if (socket) {
-    setupWebSocketHandlers(socket);
+// Check if there's already an existing WebSocket connection
+if (!window.socket) {
+    connectLiveData();
+} else {
+    console.log("WebSocket connection already exists.");
 }
 
 function setupWebSocketHandlers(socket) {
     socket.onopen = function () {
+        reconnectDelay = RECONNECT_MIN_DELAY;
+
+        // Events are only pushed while connected, catch up on anything missed while disconnected
+        if (reconnecting && (page === "gates" || page === "streams")) {
+            loadGateStates();
+        }
+        if (reconnecting && page === "stats") {
+            updateLatestCapture();
+        }
+
         fetch("/get-session-username")
             .then(res => res.json())
             .then(data => {
@@ -61,6 +78,7 @@ function setupWebSocketHandlers(socket) {
                     // Check if the session username matches the removed user's username
                     if (sessionData.username === data.username) {
                         console.log('Redirecting to:', data.url);
+                        redirecting = true;
                         window.location.href = data.url;  // Redirect the specific window for the removed user
                     }
                 })
@@ -72,10 +90,30 @@ function setupWebSocketHandlers(socket) {
         if (data.event === "alert_data" && page === "alerts") {
             updateAlertsTable(data.data.alert_data)
         }
+
+        // Pushed by the server as MQTT messages arrive
+        if (data.event === "new_alerts" && page === "alerts") {
+            loadAlerts();
+        }
+
+        if (data.event === "gate_state" && (page === "gates" || page === "streams")) {
+            updateGateState(data.data);
+        }
+
+        if (data.event === "capture" && page === "stats") {
+            updateLatestCapture(data.data.gate_id);
+        }
     };
 
-    socket.onclose = function () {
-        console.log('WebSocket connection closed');
+    socket.onclose = function (event) {
+        console.log('WebSocket connection closed', event.code);
+        if (redirecting) {
+            return;
+        }
+        // Also the way back after the server closed us for being too slow (1013)
+        reconnecting = true;
+        setTimeout(connectLiveData, reconnectDelay);
+        reconnectDelay = Math.min(reconnectDelay * 2, RECONNECT_MAX_DELAY);
     };
 
     socket.onerror = function (error) {